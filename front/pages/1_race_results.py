@@ -9,6 +9,7 @@ import streamlit as st
 from sklearn.pipeline import Pipeline
 from scraper.scraper import LiveTrailScraper
 from results.results import Results
+from results.times import parse_seconds, seconds_to_time
 from ai.features import Features
 from ai.xgboost import XGBoostRegressorModel
 from database.models import Event
@@ -58,6 +59,19 @@ def get_results(event, year, race):
     return raw_results, control_points, rs, race_info, waves
 
 
+def get_cached_results(event, year, race):
+    '''
+        get_results, reusing the last race built in this session so repeated
+        objective lookups do not re-download and re-process it.
+    '''
+    key = (event, year, race)
+    cached = st.session_state.get('results_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, get_results(event, year, race))
+        st.session_state.results_cache = cached
+    return cached[1]
+
+
 def apply_interpolation_markers(df, mask, marker: str = '*'):
     '''
     Append ``marker`` to every cell of ``df`` whose corresponding entry in
@@ -167,12 +181,12 @@ def main():
                 if not os.path.exists(folder_path):
                     os.makedirs(folder_path)
                 file_path = os.path.join(folder_path, f'{event}_{race}_{year}.png')
-                raw_results, control_points, rs, race_info, waves = get_results(event, year, race)
+                raw_results, control_points, rs, race_info, waves = get_cached_results(event, year, race)
                 rs.plot_control_points(rs.get_stats(), xrotate=True, inverty=True, save_path=file_path)
                 data = {
-                    'times': rs.get_hours().map(rs.format_time_over24h),
+                    'times': rs.get_hours(over24h=True),
                     'hours': rs.get_hours().map(rs.format_hourtime_over24h),
-                    'real_times': rs.get_real_times().map(rs.format_time_over24h),
+                    'real_times': rs.get_real_times(over24h=True),
                     'paces': rs.paces,
                     'event': event,
                     'year': year,
@@ -238,7 +252,7 @@ def main():
                     year = st.session_state.year
                     race = st.session_state.race
 
-                    raw_results, control_points, rs, race_info, waves = get_results(event, year, race)
+                    raw_results, control_points, rs, race_info, waves = get_cached_results(event, year, race)
                     objective_position = rs.get_closest_time_to_objective(input_time)
 
                     rs.set_objective(objective_position)
@@ -289,8 +303,7 @@ def main():
                                 rgs.model = joblib.load(cfg.model_path)
                                 prediction = rgs.predict(data, format='time')
                                 data['Prediction'] = prediction
-                                results_cum = pd.concat([prediction,pd.Series([Features.get_seconds(x) for x in prediction.values],name='PRED CUMUL')],axis=1)
-                                total_time = Features.format_time(float(results_cum.iloc[:-1]['PRED CUMUL'].values.sum()))
+                                total_time = seconds_to_time(float(parse_seconds(prediction.values)[:-1].sum()))
                                 data.loc[data['dist_total'] == data['dist_segment'], 'Prediction'] = total_time
                             st.write(data.drop(columns=['dist_total', 'elevation_pos_total', 'elevation_neg_total']))
                             st.caption(
@@ -27,6 +27,7 @@ if not require_auth(DB_PATH):
 
 # Backfill the user_results table for databases that predate this feature.
 Database.ensure_user_results_table(DB_PATH)
+Database.ensure_indexes(DB_PATH)
 
 
 SEARCH_COLUMNS = [
@@ -40,7 +41,9 @@ MY_RESULTS_COLUMNS = ["Train", "event_code"] + SEARCH_COLUMNS
 
 def fetch_results(surname, first_name=None):
     '''
-    Search the shared results table by surname (or "surname, name").
+    Search the shared results table by surname (or "surname, name"). A
+    surname alone matches the surnames starting with it, which the
+    idx_results_surname index serves.
     '''
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -57,14 +60,14 @@ def fetch_results(surname, first_name=None):
                          AND races.event_id = results.event_id
     """
     if first_name is None and ',' not in surname:
-        cursor.execute(base_query + " WHERE LOWER(results.surname) LIKE ?",
-                       ('%' + surname.lower() + '%',))
+        cursor.execute(base_query + " WHERE results.surname LIKE ?",
+                       (surname.strip() + '%',))
     else:
         if ',' in surname:
             surname, first_name = [part.strip() for part in surname.split(",")]
         cursor.execute(
-            base_query + " WHERE LOWER(results.surname) LIKE ? AND LOWER(results.name) LIKE ?",
-            (surname.lower(), first_name.lower()),
+            base_query + " WHERE results.surname LIKE ? AND results.name LIKE ?",
+            (surname, first_name),
         )
 
     rows = cursor.fetchall()
@@ -0,0 +1,138 @@
+"""Benchmark of the results and timing points ingestion.
+
+Saves a synthetic race (``--runners`` x ``--control-points``) as a results
+CSV and loads it end to end into an empty database, the way the loaders
+do: ``read_csv``, then ``insert_into_results`` and
+``insert_into_timing_points`` in one transaction. It is run twice, with
+the loaders of the ``--baseline`` revision (by default the repository's
+first commit: one ``Results`` built from a DataFrame, ``iterrows()`` and
+one ``cursor.execute`` per row) and with the current ones (vectorized
+parameter rows written with chunked ``executemany``), and rows/second are
+printed for each.
+
+The baseline tree is exported with ``git archive`` and each version runs
+in its own interpreter, so both import their own ``src``.
+
+Usage::
+
+    python scripts/benchmark_ingestion.py --runners 2000 --control-points 30
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEPARTURE = '2023-09-01 06:00:00'
+
+
+def synthetic_race(runners: int, control_points: int, seed=0) -> pd.DataFrame:
+    '''
+        Results table as the scraper saves it: every runner leaves at
+        06:00:00 and passes the control points at clock times (wrapping
+        past midnight).
+    '''
+    rng = np.random.default_rng(seed)
+    seconds = 6 * 3600 + np.cumsum(np.hstack([np.zeros((runners, 1)),
+                                              rng.uniform(600, 3600, (runners, control_points - 1))]), axis=1)
+    seconds = seconds[np.argsort(seconds[:, -1])].astype(int) % (24 * 3600)
+    clock = np.char.add(np.char.add(np.char.zfill((seconds // 3600).astype(str), 2), ':'),
+                        np.char.add(np.char.add(np.char.zfill((seconds % 3600 // 60).astype(str), 2), ':'),
+                                    np.char.zfill((seconds % 60).astype(str), 2)))
+    df = pd.DataFrame({'n': np.arange(1, runners + 1), 'doss': np.arange(1, runners + 1),
+                       'nom': 'Surname', 'prenom': 'Name', 'cat': 'SE H'})
+    for j in range(control_points):
+        df[str(j)] = clock[:, j]
+    return df
+
+
+def export_tree(revision: str, destination: str) -> str:
+    '''
+        ``src`` of ``revision`` extracted under ``destination``.
+    '''
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision, 'src'], cwd=REPO_ROOT,
+                             check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination)
+    return os.path.join(destination, 'src')
+
+
+def load(src: str, csv_path: str, control_points: int, repeat: int) -> dict:
+    '''
+        Best of ``repeat`` load times of the race with the loaders of ``src``.
+    '''
+    sys.path.insert(0, src)
+    from database.create_db import Database
+    from database.loader_LiveTrail import CSV_to_DB_results, CSV_to_DB_timing_points
+
+    timings = {'results': [], 'timing_points': []}
+    for k in range(repeat):
+        db_path = os.path.join(os.path.dirname(csv_path), f'benchmark_{k}.db')
+        Database.create_database(path=db_path)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("INSERT INTO events (event_id, code, name, year) VALUES (1, 'bench', 'Bench', '2023')")
+            conn.execute("INSERT INTO races (race_id, event_id, departure_datetime) VALUES ('race', 1, ?)",
+                         (DEPARTURE,))
+            conn.executemany("INSERT INTO control_points (event_id, race_id, code, name, distance, elevation_pos, "
+                             "elevation_neg) VALUES (1, 'race', ?, ?, ?, ?, ?)",
+                             [(str(j), f'CP {j}', 5.0 * j, 300 * j, -300 * j) for j in range(control_points)])
+        for loader, insert in [('results', lambda cursor: CSV_to_DB_results.insert_into_results(
+                                    cursor, 'race', 1, CSV_to_DB_results.fetch_departure_date_time(cursor, 'race', 1),
+                                    CSV_to_DB_results.read_csv(csv_path))),
+                               ('timing_points', lambda cursor: CSV_to_DB_timing_points.insert_into_timing_points(
+                                    cursor, 'race', 1, DEPARTURE, CSV_to_DB_timing_points.read_csv(csv_path)))]:
+            start = time.perf_counter()
+            with conn:
+                insert(conn.cursor())
+            timings[loader].append(time.perf_counter() - start)
+        rows = {loader: conn.execute(f'SELECT COUNT(*) FROM {loader}').fetchone()[0] for loader in timings}
+        conn.close()
+        os.remove(db_path)
+    return {loader: (rows[loader], min(times)) for loader, times in timings.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark results and timing points ingestion.')
+    parser.add_argument('--runners', type=int, default=2000)
+    parser.add_argument('--control-points', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3, help='Best of REPEAT runs.')
+    parser.add_argument('--baseline', default=None,
+                        help="Revision of the 'before' loaders (default: the first commit).")
+    parser.add_argument('--worker', nargs=2, metavar=('SRC', 'CSV'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(load(*args.worker, args.control_points, args.repeat)))
+        return
+
+    baseline = args.baseline or subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=REPO_ROOT,
+                                               check=True, capture_output=True, text=True).stdout.split()[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'bench_race_2023.csv')
+        synthetic_race(args.runners, args.control_points).to_csv(csv_path, index=False)
+        print(f'{args.runners} runners x {args.control_points} control points (best of {args.repeat}), '
+              f'read_csv + insert')
+        for name, src in [(f'baseline {baseline[:8]}', export_tree(baseline, os.path.join(tmp, 'baseline'))),
+                          ('current', str(REPO_ROOT / 'src'))]:
+            output = subprocess.run([sys.executable, __file__, '--worker', src, csv_path,
+                                     '--control-points', str(args.control_points), '--repeat', str(args.repeat)],
+                                    cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+            for loader, (n_rows, best) in json.loads(output.splitlines()[-1]).items():
+                print(f'{name:<18} {loader:<14} {n_rows:>8} rows {best:8.3f}s {n_rows / best:>12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import sqlite3
 import pandas as pd
-import datetime as dt
 from database.create_db import Database
+from results.times import time_to_seconds, seconds_to_time
 
 
 class Features:
@@ -69,9 +69,8 @@ class Features:
 
     @staticmethod
     def get_seconds(time: str) -> int:
-        h, m, s = map(int, time.split(':'))
-        return h * 3600 + m * 60 + s
+        return time_to_seconds(time)
 
     @staticmethod
     def format_time(seconds: int) -> str:
-       return str(dt.timedelta(seconds=(seconds))).split('.')[0]
+        return seconds_to_time(seconds)
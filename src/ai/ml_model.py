@@ -3,6 +3,7 @@ from abc import ABC, abstractmethod
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from ai.features import Features
+from results.times import parse_seconds
 import sqlite3
 
 logger = logging.getLogger(__name__)
@@ -25,7 +26,7 @@ class MLModel(ABC):
             self.target_column = None
         else:
             if pd.api.types.is_string_dtype(df[target_column]):
-                self.df[target_column] = self.df[target_column].apply(lambda x: Features.get_seconds(x))
+                self.df[target_column] = parse_seconds(self.df[target_column])
             self.target_column = target_column
         self.model = None
 
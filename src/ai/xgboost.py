@@ -9,6 +9,7 @@ from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.exceptions import DataConversionWarning
 from sklearn.pipeline import Pipeline
 from ai.ml_model import MLModel
+from results.times import format_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -109,7 +110,7 @@ class XGBoostRegressorModel(MLModel):
             logger.debug('Dropping %s from data...', self.target_column)
             X = X.drop(self.target_column, axis='columns')
         if format == 'time':
-            return pd.Series([self.format_time(x) for x in self.model.predict(X)],
+            return pd.Series(format_seconds(self.model.predict(X)),
                              name='PREDICTION')
         return self.model.predict(X)
     
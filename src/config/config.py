@@ -16,11 +16,26 @@ class AppConfig:
     db_filename: str = "events.db"
     model_filename: str = "model.pkl"
     log_level: str = "INFO"
+    scraper_cache_filename: str = "scraper_cache.db"  # empty disables the cache
+    scraper_cache_only: bool = False
+    # LiveTrail pacing (requests per second per host): +increase after each
+    # healthy response, *decrease after a 429/5xx/timeout, within the bounds
+    scraper_min_rate: float = 0.1
+    scraper_max_rate: float = 2.0
+    scraper_rate_increase: float = 0.02
+    scraper_rate_decrease: float = 0.5
+    results_format: str = "csv"  # "csv" (one file per race) or "npy" (one NumPy store per event-year)
 
     @property
     def db_path(self) -> str:
         return os.path.join(self.data_dir_path, self.db_filename)
 
+    @property
+    def scraper_cache_path(self) -> str | None:
+        if not self.scraper_cache_filename:
+            return None
+        return os.path.join(self.data_dir_path, self.scraper_cache_filename)
+
     @property
     def model_path(self) -> str:
         return os.path.join(self.data_dir_path, self.model_filename)
@@ -38,6 +53,13 @@ class AppConfig:
             db_filename=os.environ.get("DB_FILENAME", "events.db"),
             model_filename=os.environ.get("MODEL_FILENAME", "model.pkl"),
             log_level=os.environ.get("LOG_LEVEL", "INFO"),
+            scraper_cache_filename=os.environ.get("SCRAPER_CACHE_FILENAME", "scraper_cache.db"),
+            scraper_cache_only=os.environ.get("SCRAPER_CACHE_ONLY", "").lower() in ("1", "true", "yes"),
+            scraper_min_rate=float(os.environ.get("SCRAPER_MIN_RATE", 0.1)),
+            scraper_max_rate=float(os.environ.get("SCRAPER_MAX_RATE", 2.0)),
+            scraper_rate_increase=float(os.environ.get("SCRAPER_RATE_INCREASE", 0.02)),
+            scraper_rate_decrease=float(os.environ.get("SCRAPER_RATE_DECREASE", 0.5)),
+            results_format=os.environ.get("RESULTS_FORMAT", "csv"),
         )
         setup_logging(config.log_level)
         logger.info(
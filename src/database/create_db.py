@@ -5,6 +5,8 @@ import os
 import logging
 import sqlite3
 import bcrypt
+from contextlib import contextmanager
+from itertools import islice
 from sqlite3 import Connection, Cursor
 
 logger = logging.getLogger(__name__)
@@ -12,15 +14,38 @@ logger = logging.getLogger(__name__)
 VALID_TABLES = frozenset({
     'users', 'events', 'races', 'results',
     'control_points', 'timing_points', 'features',
-    'user_results'
+    'user_results', 'backfill_progress'
 })
 
+# Rows bound per executemany call by Database.insert_many
+BULK_CHUNK_SIZE = 10_000
+# Page cache of the connections opened during Database.bulk_load
+BULK_CACHE_SIZE_MIB = 256
+
+# Indexes of the hot lookups, {name: (table, columns)}, created by
+# Database.ensure_indexes. Indexed columns come first, the others make the
+# index covering for the loaders' lookups.
+INDEXES = {
+    # fetch_race_event_ids (CSV loaders)
+    'idx_races_results_filepath': ('races', 'results_filepath, race_id, event_id, departure_datetime'),
+    # Event.get_id_from_code_year, Event.get_event_id_from_database
+    'idx_events_code_year': ('events', 'code, year, name'),
+    # fetch_control_points, Race.load_control_points
+    'idx_control_points_race': ('control_points', 'race_id, event_id'),
+    # timing points of a runner, clean_race
+    'idx_timing_points_race_bib': ('timing_points', 'race_id, event_id, bib'),
+    # surname search (LIKE is case-insensitive, so is the index)
+    'idx_results_surname': ('results', 'surname COLLATE NOCASE, name COLLATE NOCASE'),
+}
+
 
 class Database:
     '''
         SQLite3 Database for storing locally racing data.
     '''
     path: str = 'events.db'
+    # {real path of a database: (connection settings, connection) of its active bulk_load}
+    _bulk_loads: dict = {}
 
     @classmethod
     def create_database(cls, path=None) -> 'Database':
@@ -152,6 +177,20 @@ class Database:
             )
         ''')
 
+        # Create backfill_progress table: category backfill checkpoint, one row per
+        # bib already asked to coureur.php (status 'updated', 'no_category' or 'failed').
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_progress (
+                event_id INTEGER,
+                race_id TEXT,
+                bib TEXT,
+                status TEXT NOT NULL,
+                PRIMARY KEY (event_id, race_id, bib),
+                FOREIGN KEY (event_id) REFERENCES events(event_id),
+                FOREIGN KEY (race_id) REFERENCES races(race_id)
+            )
+        ''')
+
         # Create model_input table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS features (
@@ -175,6 +214,8 @@ class Database:
             )
         ''')
 
+        cls._create_indexes(cursor)
+
         # Commit changes and close connection
         conn.commit()
         conn.close()
@@ -184,60 +225,230 @@ class Database:
         return cls
 
     @classmethod
-    def ensure_cat_backfill_column(cls, path=None) -> None:
+    def ensure_cat_backfill_column(cls, path=None, conn: Connection = None) -> None:
         '''
             Idempotent migration: add races.cat_needs_backfill if it is missing.
 
             Older DBs predate the scraped-category-gap feature; SQLite does not
             support `ADD COLUMN IF NOT EXISTS`, so inspect pragma first.
+            Runs through ``conn`` when given (committing it).
         '''
         if path:
             cls.path = path
         try:
-            conn = sqlite3.connect(cls.path)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(races)")
-            existing = {row[1] for row in cursor.fetchall()}
-            if 'cat_needs_backfill' not in existing:
-                cursor.execute(
-                    "ALTER TABLE races ADD COLUMN "
-                    "cat_needs_backfill INTEGER NOT NULL DEFAULT 0"
-                )
-                conn.commit()
-                logger.info("Added races.cat_needs_backfill column")
-            conn.close()
+            with cls.session(cls.path, conn) as session:
+                cursor = session.cursor()
+                cursor.execute("PRAGMA table_info(races)")
+                existing = {row[1] for row in cursor.fetchall()}
+                if 'cat_needs_backfill' not in existing:
+                    cursor.execute(
+                        "ALTER TABLE races ADD COLUMN "
+                        "cat_needs_backfill INTEGER NOT NULL DEFAULT 0"
+                    )
+                    session.commit()
+                    logger.info("Added races.cat_needs_backfill column")
         except sqlite3.Error as e:
             logger.error("Error ensuring cat_needs_backfill column: %s", e)
 
     @classmethod
-    def ensure_user_results_table(cls, path=None) -> None:
+    def ensure_user_results_table(cls, path=None, conn: Connection = None) -> None:
         '''
             Idempotent migration for existing DBs that predate the user_results table.
+            Runs through ``conn`` when given (committing it).
         '''
         if path:
             cls.path = path
         try:
-            conn = sqlite3.connect(cls.path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_results (
-                    user_id INTEGER,
-                    event_id INTEGER,
-                    race_id TEXT,
-                    bib TEXT,
-                    include_in_training INTEGER NOT NULL DEFAULT 1,
-                    added_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, event_id, race_id, bib),
-                    FOREIGN KEY (user_id) REFERENCES users(user_id),
-                    FOREIGN KEY (event_id) REFERENCES events(event_id),
-                    FOREIGN KEY (race_id) REFERENCES races(race_id)
-                )
-            ''')
-            conn.commit()
-            conn.close()
+            with cls.session(cls.path, conn) as session:
+                cursor = session.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS user_results (
+                        user_id INTEGER,
+                        event_id INTEGER,
+                        race_id TEXT,
+                        bib TEXT,
+                        include_in_training INTEGER NOT NULL DEFAULT 1,
+                        added_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (user_id, event_id, race_id, bib),
+                        FOREIGN KEY (user_id) REFERENCES users(user_id),
+                        FOREIGN KEY (event_id) REFERENCES events(event_id),
+                        FOREIGN KEY (race_id) REFERENCES races(race_id)
+                    )
+                ''')
+                session.commit()
         except sqlite3.Error as e:
             logger.error("Error ensuring user_results table: %s", e)
 
+    @classmethod
+    def ensure_backfill_progress_table(cls, path=None, conn: Connection = None) -> None:
+        '''
+            Idempotent migration for existing DBs that predate the backfill_progress table.
+            Runs through ``conn`` when given (committing it).
+        '''
+        if path:
+            cls.path = path
+        try:
+            with cls.session(cls.path, conn) as session:
+                cursor = session.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS backfill_progress (
+                        event_id INTEGER,
+                        race_id TEXT,
+                        bib TEXT,
+                        status TEXT NOT NULL,
+                        PRIMARY KEY (event_id, race_id, bib),
+                        FOREIGN KEY (event_id) REFERENCES events(event_id),
+                        FOREIGN KEY (race_id) REFERENCES races(race_id)
+                    )
+                ''')
+                session.commit()
+        except sqlite3.Error as e:
+            logger.error("Error ensuring backfill_progress table: %s", e)
+
+    @staticmethod
+    def _create_indexes(cursor: Cursor) -> None:
+        for name, (table, columns) in INDEXES.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+    @classmethod
+    def ensure_indexes(cls, path=None, conn: Connection = None) -> None:
+        '''
+            Idempotent migration: create the INDEXES missing from the database.
+            Runs through ``conn`` when given (committing it).
+        '''
+        if path:
+            cls.path = path
+        try:
+            with cls.session(cls.path, conn) as session:
+                cls._create_indexes(session.cursor())
+                session.commit()
+        except sqlite3.Error as e:
+            logger.error("Error ensuring indexes: %s", e)
+
+    @classmethod
+    def _bulk_load_of(cls, path=None) -> tuple[dict, Connection] | None:
+        return cls._bulk_loads.get(os.path.realpath(path if path else cls.path))
+
+    @classmethod
+    def connect(cls, path=None, timeout=3600) -> Connection:
+        '''
+            SQLite connection to the database, set up for bulk loading while
+            a bulk_load of this database is active.
+        '''
+        conn = sqlite3.connect(path if path else cls.path, timeout=timeout)
+        bulk_load = cls._bulk_load_of(path)
+        for name, value in (bulk_load[0] if bulk_load else {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    @classmethod
+    @contextmanager
+    def session(cls, path=None, conn: Connection = None, timeout=3600):
+        '''
+            ``conn`` if given, left open for the caller, otherwise a new
+            ``connect`` connection closed on exit. Commits are left to the
+            caller in both cases.
+        '''
+        if conn is not None:
+            yield conn
+            return
+        conn = cls.connect(path, timeout=timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @classmethod
+    @contextmanager
+    def bulk_load(cls, path=None, cache_size_mib=BULK_CACHE_SIZE_MIB, drop_indexes=False):
+        '''
+            Context for loading large amounts of data into the database at
+            ``path``: it switches to WAL and the connections to it opened
+            with ``connect`` meanwhile use synchronous=NORMAL and a
+            ``cache_size_mib`` page cache. Yields such a connection, left
+            open until the end of the load, for the caller to load through
+            (committed on exit, rolled back if the block raises).
+            With ``drop_indexes`` the indexes created with CREATE INDEX are
+            dropped and rebuilt once at the end (constraint indexes such as
+            UNIQUE ones are kept). On exit the managed INDEXES are ensured,
+            the journal mode is restored and ANALYZE refreshes the query
+            planner statistics. Nested bulk loads of the same database run
+            within the outermost one and yield its connection; other
+            databases are not affected.
+        '''
+        cls.create_database(path)
+        key = os.path.realpath(cls.path)
+        if key in cls._bulk_loads:
+            yield cls._bulk_loads[key][1]
+            return
+        conn = sqlite3.connect(cls.path, timeout=3600)
+        journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        conn.execute('PRAGMA journal_mode = WAL')
+        pragmas = {'synchronous': 'NORMAL', 'cache_size': -cache_size_mib * 1024, 'temp_store': 'MEMORY'}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        cls._bulk_loads[key] = (pragmas, conn)
+        indexes = []
+        if drop_indexes:
+            indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX "{name}"')
+            conn.commit()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            del cls._bulk_loads[key]
+            try:
+                for _, sql in indexes:
+                    conn.execute(sql)
+                cls._create_indexes(conn.cursor())
+                conn.commit()
+                conn.execute('ANALYZE')
+                conn.commit()
+                try:
+                    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+                except sqlite3.OperationalError as e:
+                    logger.warning("Could not restore %s journal mode: %s", journal_mode, e)
+            finally:
+                conn.close()
+
+    @staticmethod
+    @contextmanager
+    def savepoint(cursor: Cursor, name: str = 'bulk'):
+        '''
+            Run the block within SAVEPOINT ``name``: if it raises, what it
+            wrote is rolled back (the rest of the caller's transaction is
+            kept) and the exception propagates. When no transaction is
+            open, the savepoint is one and is committed on success.
+        '''
+        cursor.execute(f'SAVEPOINT {name}')
+        try:
+            yield
+        except BaseException:
+            cursor.execute(f'ROLLBACK TO {name}')
+            cursor.execute(f'RELEASE {name}')
+            raise
+        cursor.execute(f'RELEASE {name}')
+
+    @staticmethod
+    def insert_many(cursor: Cursor, sql: str, rows, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        '''
+            executemany ``sql`` over the iterable ``rows`` in chunks of
+            ``chunk_size`` (the caller's transaction is not committed).
+            Returns the number of rows written.
+        '''
+        rows = iter(rows)
+        count = 0
+        while chunk := list(islice(rows, chunk_size)):
+            cursor.executemany(sql, chunk)
+            count += len(chunk)
+        return count
+
     @classmethod
     def empty_all_tables(cls, path=None):
         '''
@@ -3,38 +3,34 @@ Module to load the features table with data present in the DB
 '''
 import os
 import json
-import sqlite3
 import argparse
+from sqlite3 import Connection
 from database.create_db import Database
 from database.loader_LiveTrail import db_LiveTrail_loader
 
 
-def empty_features(db_path):
+def empty_features(db_path, conn: Connection = None):
     '''
     Function to empty the table features
     '''
     db: Database = Database.create_database(path=db_path)
-    conn = sqlite3.connect(db.path)
-    try:
-        with conn:
-            cursor = conn.cursor()
+    with Database.session(db.path, conn) as session:
+        with session:
+            cursor = session.cursor()
             cursor.execute('''
                 DELETE FROM features
             ''')
-            conn.commit()
-    finally:
-        conn.close()
+            session.commit()
 
-def clean_spurious(db_path):
+def clean_spurious(db_path, conn: Connection = None):
     '''
     Function to Remove the spourious segments from the table features,
     If the first CP is departure, there is this record added, so we clean them.
     '''
     db: Database = Database.create_database(path=db_path)
-    conn = sqlite3.connect(db.path)
-    try:
-        with conn:
-            cursor = conn.cursor()
+    with Database.session(db.path, conn) as session:
+        with session:
+            cursor = session.cursor()
             cursor.execute('''
                 DELETE FROM features
                 WHERE
@@ -44,30 +40,40 @@ def clean_spurious(db_path):
                     elevation_neg_segment = 0 AND
                     elevation_neg_cumul = 0
             ''')
-            conn.commit()
-    finally:
-        conn.close()
+            session.commit()
 
 
-def load_features(db_path: str, clean: bool = False, update: dict = None):
+def load_features(db_path: str, clean: bool = False, update: dict = None, conn: Connection = None):
     '''
     Function to load the features table from the timing_points
     Args:
         path (str): Path to SQLite3 DB.
         clean (bool): If True, the tables will be emtied before execution.
         update (dict): If specified, dict containing the list of files to use.
+        conn (Connection): If specified, connection to use instead of new ones.
     '''
 
     if clean:
-        empty_features(db_path)
+        empty_features(db_path, conn)
 
     db: Database = Database.create_database(path=db_path)
-    conn = sqlite3.connect(db.path, timeout=36000)  # 10h timeout
-    try:
-        with conn:
-            cursor = conn.cursor()
+    with Database.session(db.path, conn, timeout=36000) as session:  # 10h timeout
+        with session:
+            cursor = session.cursor()
             cursor.execute('''
-                WITH ParsedTimes AS (
+                WITH Passages AS (
+                -- 'H:MM:SS' with any number of hours, split on the first ':' so
+                -- that times of 100h and more are parsed. Unparseable passages
+                -- ('nan') count as 0.
+                SELECT
+                    timing_point_id,
+                    CAST(SUBSTR(time, 1, INSTR(time, ':') - 1) AS INTEGER) * 3600
+                        + CAST(SUBSTR(time, INSTR(time, ':') + 1, 2) AS INTEGER) * 60
+                        + CAST(SUBSTR(time, INSTR(time, ':') + 4, 2) AS INTEGER) AS time_in_seconds
+                FROM
+                    timing_points
+            ),
+            ParsedTimes AS (
                 SELECT
                     tp.race_id,
                     tp.event_id,
@@ -82,11 +88,12 @@ def load_features(db_path: str, clean: bool = False, update: dict = None):
                     cp.elevation_pos - LAG(cp.elevation_pos, 1, 0) OVER (PARTITION BY tp.race_id, tp.event_id, tp.bib ORDER BY cp.control_point_id) AS elevation_pos_segment,
                     cp.elevation_neg - LAG(cp.elevation_neg, 1, 0) OVER (PARTITION BY tp.race_id, tp.event_id, tp.bib ORDER BY cp.control_point_id) AS elevation_neg_segment,
                     cp.distance - LAG(cp.distance, 1, 0) OVER (PARTITION BY tp.race_id, tp.event_id, tp.bib ORDER BY cp.control_point_id) AS dist_segment,
-                    -- only way to be able to work with >24h times
-                    (SUBSTR(tp.time, 1, 2) * 3600) + (SUBSTR(tp.time, 4, 2) * 60) + SUBSTR(tp.time, 7, 2) AS time_in_seconds,
-                    LAG((SUBSTR(tp.time, 1, 2) * 3600) + (SUBSTR(tp.time, 4, 2) * 60) + SUBSTR(tp.time, 7, 2), 1, 0) OVER (PARTITION BY tp.race_id, tp.event_id, tp.bib ORDER BY cp.control_point_id) AS prev_time_in_seconds
+                    p.time_in_seconds,
+                    LAG(p.time_in_seconds, 1, 0) OVER (PARTITION BY tp.race_id, tp.event_id, tp.bib ORDER BY cp.control_point_id) AS prev_time_in_seconds
                 FROM
                     timing_points tp
+                JOIN
+                    Passages p ON p.timing_point_id = tp.timing_point_id
                 JOIN
                     control_points cp ON tp.control_point_id = cp.control_point_id
             ),
@@ -193,11 +200,9 @@ def load_features(db_path: str, clean: bool = False, update: dict = None):
                 event_id,
                 bib
         ''')
-            conn.commit()
-    finally:
-        conn.close()
+            session.commit()
 
-    clean_spurious(db.path)
+    clean_spurious(db.path, conn)
 
 
 if __name__ == "__main__":
@@ -222,4 +227,5 @@ if __name__ == "__main__":
         from config import get_config
         path = get_config().db_path
 
-    load_features(db_path=path, clean=clean)
+    with Database.bulk_load(path) as conn:
+        load_features(db_path=path, clean=clean, conn=conn)
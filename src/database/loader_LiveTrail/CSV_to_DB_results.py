@@ -4,18 +4,25 @@ import logging
 import sqlite3
 import argparse
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from config import get_config
+from scraper import storage
+from scraper.manifest import DownloadManifest
 from database.models import Event
 from database.create_db import Database
 from database.loader_LiveTrail import db_LiveTrail_loader
+from database.loader_LiveTrail.pipeline import parse_and_write
+from results.times import parse_seconds, elapsed_clock_seconds, format_over24h
 
 logger = logging.getLogger(__name__)
 
+RESULTS_INSERT = """INSERT INTO results (race_id, event_id, position, bib, surname, name, full_category, time)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
 
 # Function to connect to SQLite database
 def connect_to_db(db_file):
-    conn = sqlite3.connect(db_file, timeout=3600)
+    conn = Database.connect(db_file, timeout=3600)
     return conn
 
 # Function to fetch race_id and event_id from races table
@@ -74,50 +81,37 @@ def fetch_departure_date_time(cursor, race_id, event_id) -> datetime | None:
     return None
 
 
+def results_rows(race_id, event_id, departure_time, data) -> list[tuple]:
+    '''
+    Rows of the results table for a race read with read_csv, times made
+    relative to ``departure_time`` when known.
+    '''
+    if departure_time is not None:
+        # Finish clock times are in finish order: every time the clock goes
+        # back a midnight was crossed (to take into account >24h races)
+        departure = departure_time.hour * 3600 + departure_time.minute * 60 + departure_time.second
+        elapsed = elapsed_clock_seconds(parse_seconds([row[-1] for row in data]), start=departure)
+        return [(race_id, event_id, *row[:5], row[-1] if time_str is None else time_str)
+                for row, time_str in zip(data, format_over24h(elapsed, na=None).tolist())]
+    return [(race_id, event_id, *row) for row in data]
+
+
 # Function to insert data into results table
 def insert_into_results(cursor, race_id, event_id, departure_time, data):
-
-    if departure_time is not None:
-        previous_time = departure_time  # to take into account >24h races
-        for row in data:
-            # Parse the time from the row
-            time_str = row[-1]
-            if time_str != '' and time_str is not None:
-                time = datetime.strptime(time_str, '%H:%M:%S')
-                time = time.replace(year=departure_time.year, month=departure_time.month, day=departure_time.day)
-                # time_difference = str((time - departure_time).total_seconds())
-                time_difference = calculate_time_difference(time, previous_time)
-                time = previous_time + time_difference
-                time_str = format_timedelta(calculate_time_difference(time, departure_time))
-                previous_time = time
-            cursor.execute("""INSERT INTO results (race_id, event_id, position, bib, surname, name, full_category, time)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", (race_id, event_id, *row[:5], time_str,))
-    else:
-        for row in data:
-            cursor.execute("""INSERT INTO results (race_id, event_id, position, bib, surname, name, full_category, time)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", (race_id, event_id, *row,))
-
-
-# Function to calculate time difference and handle cases where it exceeds 24 hours
-def calculate_time_difference(time, previous_time):
-    # Check if the time is before the previous time
-    if time < previous_time:
-        # Add 24 hours to the time difference
-        time = time + timedelta(days=1)
-        return calculate_time_difference(time, previous_time)
-    else:
-        # Calculate the time difference
-        return time - previous_time
+    Database.insert_many(cursor, RESULTS_INSERT, results_rows(race_id, event_id, departure_time, data))
 
 
-# Function to format timedelta as HH:MM:SS
-def format_timedelta(td):
-    # Extract days, hours, minutes, and seconds
-    days = td.days
-    hours, remainder = divmod(td.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    # Format as HH:MM:SS
-    return f"{days * 24 + hours:02d}:{minutes:02d}:{seconds:02d}"
+def parse_results(task):
+    '''
+    Results rows of the race of a main task (name, file_path, race_id,
+    event_id, departure_time), None if its times cannot be parsed. Runs
+    in the parsing processes.
+    '''
+    _, file_path, race_id, event_id, departure_time = task
+    try:
+        return results_rows(race_id, event_id, departure_time, read_csv(file_path))
+    except ValueError:
+        return None
 
 
 def update_category(cursor, event_id):
@@ -181,6 +175,12 @@ def compute_category_rankings(cursor, event_id):
 
 # Function to read CSV file
 def read_csv(file_path):
+    if not os.path.exists(file_path):
+        # Race stored in its event-year store: only the needed columns are read
+        store, race = storage.archived(file_path)
+        names = store.column_names(race)
+        columns = store.strings(race, names[:5] + names[-1:])
+        return [list(row) for row in zip(*(values.tolist() for values in columns))]
     with open(file_path, newline='', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile)
         next(reader)  # Skip header
@@ -216,7 +216,8 @@ def update_DNFs(cursor):
 
 # Main function
 def main(path: str = None, data_path: str = None, clean: bool = False,
-         skip: str = None, update: dict = None, force_update: bool = False):
+         skip: str = None, update: dict = None, force_update: bool = False,
+         changed_only: bool = False, workers: int = 1, conn: sqlite3.Connection = None):
     '''
     Args:
         path (str): Path to SQLite3 DB.
@@ -224,6 +225,13 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
         clean (bool): If True, the tables will be emtied before execution.
         skip (str): If specified, path for the file containing the list of (event, year) to skip
         update (dict): If specified, dict containing the list of files to use.
+        changed_only (bool): If True, races already loaded in their current
+            downloaded version (see DownloadManifest) are skipped and the
+            others are cleaned before being reloaded.
+        workers (int): Number of processes parsing the CSV files, the
+            database is written by the calling thread only.
+        conn (sqlite3.Connection): If specified, connection used for the
+            whole run (left open), otherwise one is opened to ``path``.
     '''
     cfg = get_config()
     if not path:
@@ -232,11 +240,11 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
         data_path = os.path.join(cfg.data_dir_path, 'csv')
 
     db: Database = Database.create_database(path=path)
+    db_connection = conn if conn is not None else connect_to_db(db.path)
+    cursor = db_connection.cursor()
 
     if clean:
-        db_connection = connect_to_db(db.path)
         with db_connection:
-            cursor = db_connection.cursor()
             clean_table(cursor)
             logger.info('Results table emptied')
 
@@ -250,50 +258,55 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
     elif update:
         years = update
         folders = list(years.keys())
-    logger.info("Inserting data into Results table.")
-    # Iterate through folders
-    for folder in folders:
-        #  print(f"folder: {folder}")
-        folder_path = os.path.join(data_path, folder)
-        if os.path.isdir(folder_path):
-            # Iterate through CSV files in the folder
-            for file in os.listdir(folder_path):
-                if file.endswith('.csv'):
-                    if skip or update:
-                        if not any(file.endswith(f'{year}.csv') for year in years[folder]):
+    manifest = DownloadManifest(data_path)
+    loaded = manifest.loaded('results') if changed_only else set()
+
+    def tasks():
+        for folder in folders:
+            folder_path = os.path.join(data_path, folder)
+            if os.path.isdir(folder_path):
+                # Iterate through CSV files in the folder
+                for file in storage.list_results(folder_path):
+                    if file.endswith('.csv'):
+                        if skip or update:
+                            if not any(file.endswith(f'{year}.csv') for year in years[folder]):
+                                continue
+                        name = f'csv/{folder}/{file}'
+                        if name in loaded:
                             continue
-                    file_path = os.path.join(folder_path, file)
-                    db_connection = connect_to_db(db.path)
-                    with db_connection:
-                        cursor = db_connection.cursor()
-                        race_event_ids = fetch_race_event_ids(cursor, f'csv/{folder}/{file}')
+                        race_event_ids = fetch_race_event_ids(cursor, name)
                         if race_event_ids:
                             race_id, event_id = race_event_ids
-                            logger.info('Inserting data into %s. %s, %s', event_id, folder, race_id)
                             departure_time = fetch_departure_date_time(cursor, race_id, event_id)
-                            # Read CSV file
-                            csv_data = read_csv(file_path)
-                            # Insert data into results table
-                            try:
-                                if force_update:
-                                    clean_race(cursor, event_id, race_id)
-                                insert_into_results(cursor, race_id, event_id, departure_time, csv_data)
-                            except sqlite3.IntegrityError:
-                                pass
-                            except ValueError:
-                                pass
-                            update_category(cursor, event_id)
-                        db_connection.commit()
-                    db_connection.close()
-
-    db_connection = connect_to_db(db.path)
+                            yield name, os.path.join(folder_path, file), race_id, event_id, departure_time
+
+    def write(task, rows):
+        # Each race is written atomically and marked as loaded once committed
+        name, _, race_id, event_id, _ = task
+        logger.info('Inserting data into %s. %s', event_id, name)
+        committed = False
+        with db_connection:
+            if rows is not None:
+                try:
+                    with Database.savepoint(cursor, 'race'):
+                        if force_update or changed_only:
+                            clean_race(cursor, event_id, race_id)
+                        Database.insert_many(cursor, RESULTS_INSERT, rows)
+                    committed = True
+                except sqlite3.IntegrityError as e:
+                    logger.warning("FAILED IntegrityError: %s %s %s", race_id, event_id, e)
+            update_category(cursor, event_id)
+        if committed:
+            manifest.mark_loaded('results', [name])
+
+    logger.info("Inserting data into Results table.")
+    parse_and_write(tasks(), parse_results, write, workers=workers)
+
     with db_connection:
-        cursor = db_connection.cursor()
         event_ids = fetch_all_event_ids(cursor)
 
     for event_id in event_ids:
         with db_connection:
-            cursor = db_connection.cursor()
             if update:
                 if check_event_id_in_list(cursor, event_id, years):
                     compute_category_rankings(cursor, event_id)
@@ -301,8 +314,9 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
                 compute_category_rankings(cursor, event_id)
 
     with db_connection:
-        cursor = db_connection.cursor()
         update_DNFs(cursor)
+    if conn is None:
+        db_connection.close()
 
 
 if __name__ == "__main__":
@@ -312,6 +326,8 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--data-path', default=None, help='CSV files path.')
     parser.add_argument('-c', '--clean', action='store_true', help='Remove all data from table before execution.')
     parser.add_argument('-f', '--force-update', action='store_true', help='Remove all data from specified tables in "years" before execution.')
+    parser.add_argument('--changed-only', action='store_true', help='Only load races new or changed since they were last loaded.')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='Processes parsing the CSV files.')
     group.add_argument('-s', '--skip', default=None, help='Filepath to list of events and years to ignore during update. db_LiveTrail_loader.py generates this list as update.txt')
     group.add_argument('-u', '--update', type=str, default=None, help='dict in "years" format containing the list of events and years to update or path for the file containing the list.')
 
@@ -329,4 +345,6 @@ if __name__ == "__main__":
             update = json.loads(args.update)
         except json.JSONDecodeError:
             update = db_LiveTrail_loader.parse_events_years_txt_file(os.path.join(os.getcwd(), args.update))
-    main(path=path, data_path=data_path, clean=clean, skip=skip, update=update, force_update=force_update)
+    with Database.bulk_load(path if path else get_config().db_path) as conn:
+        main(path=path, data_path=data_path, clean=clean, skip=skip, update=update, force_update=force_update,
+             changed_only=args.changed_only, workers=args.workers, conn=conn)
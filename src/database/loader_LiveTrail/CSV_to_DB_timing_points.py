@@ -4,16 +4,25 @@ import json
 import logging
 import sqlite3
 import argparse
-import pandas as pd
+from itertools import repeat
 from config import get_config
+from scraper import storage
+from scraper.manifest import DownloadManifest
 from database.models import Event
 from database.create_db import Database
 from database.loader_LiveTrail import db_LiveTrail_loader
+from database.loader_LiveTrail.pipeline import parse_and_write
 from datetime import datetime
-from results.results import Results
+import numpy as np
+from results.batch import ResultsBatch
 
 logger = logging.getLogger(__name__)
 
+TIMING_POINTS_INSERT = """
+    INSERT INTO timing_points (control_point_id, race_id, event_id, bib, time)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
 
 def generate_done_file(data, path):
     # Open the output file in write mode
@@ -26,7 +35,7 @@ def generate_done_file(data, path):
 
 # Function to connect to SQLite database
 def connect_to_db(db_file):
-    conn = sqlite3.connect(db_file, timeout=3600)
+    conn = Database.connect(db_file, timeout=3600)
     return conn
 
 
@@ -67,9 +76,14 @@ def fetch_control_points(cursor, race_id, event_id):
     return control_points, control_points_names, control_points_ids
 
 
-# Function to insert data into results table
-def insert_into_timing_points(cursor, race_id, event_id, departure_datetime, data):
-    cps, cps_names, cps_ids = fetch_control_points(cursor, race_id, event_id)
+def prepare_timing_points(control_points, race_id, event_id, departure_datetime, data):
+    '''
+    Control points (as returned by fetch_control_points) and Results
+    arguments of a race read from its CSV. Returns (cps_ids,
+    (control_points, times, offset, start_day, waves)), the latter being a
+    ResultsBatch race.
+    '''
+    cps, cps_names, cps_ids = control_points
 
     if all(all(elem == '' for elem in sublist[1]) for sublist in data):
         # all rows are empty
@@ -99,38 +113,137 @@ def insert_into_timing_points(cursor, race_id, event_id, departure_datetime, dat
         del cps[key_to_delete]
         del cps_names[key_to_delete]
         waves = False
-    # Only Finishers are inserted since Results class filters out
-    try:
-        rs = Results(control_points=cps, times=pd.DataFrame([v[1] for v in data], columns=list(cps.keys())), offset=departure,
-                 clean_days=False, start_day=weekday, waves=waves)
-    except TypeError as e:
-        if "argument of type 'NAType' is not iterable" in str(e):
-            logger.warning("FAILED RACE (Interpolating times failed): %s %s", race_id, event_id)
-        elif "object of type 'NoneType' has no len()" in str(e):
-            logger.warning("FAILED CANCELLED RACE: %s %s", race_id, event_id)
-        logger.warning("FAILED TypeError: %s %s %s", race_id, event_id, e)
-        raise ValueError from e
-    except ZeroDivisionError as e:
-        # Solved
-        logger.warning("FAILED ZeroDivisionError: %s %s", race_id, event_id)
-        raise ValueError from e
-    except IndexError as e:
-        if 'single positional indexer is out-of-bounds' in str(e):
-            logger.warning("FAILED CANCELLED RACE: %s %s", race_id, event_id)
-        elif 'list index out of range' in str(e):
-            logger.warning("FAILED RACE (1 single participant): %s %s", race_id, event_id)
-        raise ValueError from e
-    for bib, times in zip([v[0] for v in data],
-                          [v[1] for v in rs.get_real_times().map(rs.format_time_over24h).iterrows()]):
-        for control_point_id, time in zip(cps_ids.values(), times):
-            cursor.execute("""
-                INSERT INTO timing_points (control_point_id, race_id, event_id, bib, time)
-                VALUES (?, ?, ?, ?, ?)
-            """, (control_point_id, race_id, event_id, bib, time))
+    return cps_ids, (cps, [v[1] for v in data], departure, weekday, waves)
+
+
+def timing_points_rows(race_id, event_id, control_point_ids, bibs, times) -> list[tuple]:
+    '''
+    Rows of the timing_points table for ``times``, a runners x control
+    points matrix of formatted times, for ``bibs`` and
+    ``control_point_ids``. The rows are laid out in one vectorized step
+    (runner-major, like the matrix).
+    '''
+    times = np.asarray(times, dtype=object)
+    n_runners, n_cps = min(len(bibs), len(times)), len(control_point_ids)
+    if n_runners == 0 or n_cps == 0:
+        return []
+    times = times[:n_runners, :n_cps]
+    return list(zip(np.tile(np.asarray(control_point_ids, dtype=object), n_runners).tolist(),
+                    repeat(race_id), repeat(event_id),
+                    np.repeat(np.asarray(bibs[:n_runners], dtype=object), n_cps).tolist(),
+                    times.ravel().tolist()))
+
+
+def write_timing_points(cursor, race_id, event_id, control_point_ids, bibs, times):
+    '''
+    Insert the timing_points_rows of a race with executemany.
+    '''
+    Database.insert_many(cursor, TIMING_POINTS_INSERT,
+                         timing_points_rows(race_id, event_id, control_point_ids, bibs, times))
+
+
+# Function to insert data into results table
+def insert_into_timing_points(cursor, race_id, event_id, departure_datetime, data):
+    insert_races_into_timing_points(cursor, [(race_id, event_id, departure_datetime, data)], raise_errors=True)
+
+
+def races_timing_points_rows(races, raise_errors=False) -> dict[int, list[tuple]]:
+    '''
+    Timing points rows of several races, given as (race_id, event_id,
+    departure_datetime, data, control_points) tuples with control_points
+    as returned by fetch_control_points, computing all their times
+    together with a ResultsBatch. Returns {index of the race: rows},
+    failing races are logged and left out (ValueError when
+    ``raise_errors``).
+    '''
+    prepared = []
+    for k, (race_id, event_id, departure_datetime, data, control_points) in enumerate(races):
+        try:
+            prepared.append((k, race_id, event_id, data, *prepare_timing_points(control_points, race_id, event_id,
+                                                                                departure_datetime, data)))
+        except ValueError:
+            if raise_errors:
+                raise
+    batch = ResultsBatch([race for *_, race in prepared])
+    times = batch.get_real_times(over24h=True)
+    rows = {}
+    for i, (k, race_id, event_id, data, cps_ids, _) in enumerate(prepared):
+        if i in batch.errors:
+            logger.warning("FAILED %s: %s %s %s", type(batch.errors[i]).__name__, race_id, event_id,
+                           batch.errors[i])
+            if raise_errors:
+                raise ValueError from batch.errors[i]
+            continue
+        # Only Finishers are inserted since the batch filters out DNFs;
+        # rows maps them back to their CSV line (and bib)
+        rows[k] = timing_points_rows(race_id, event_id, [cps_ids[c] for c in batch.columns[i]],
+                                     [data[row][0] for row in batch.rows[i]], times[i])
+    return rows
+
+
+def insert_races_into_timing_points(cursor, races, raise_errors=False):
+    '''
+    Insert the timing points of several races, given as (race_id, event_id,
+    departure_datetime, data) tuples (see races_timing_points_rows).
+    Failing races are logged and skipped (ValueError when
+    ``raise_errors``); returns the number of races inserted.
+    '''
+    rows = races_timing_points_rows([(race_id, event_id, departure_datetime, data,
+                                      fetch_control_points(cursor, race_id, event_id))
+                                     for race_id, event_id, departure_datetime, data in races], raise_errors)
+    return write_races_timing_points(cursor, rows.values(), raise_errors)
+
+
+def write_races_timing_points(cursor, races_rows, raise_errors=False):
+    '''
+    Insert the rows of each race, each race in its own savepoint: races
+    breaking a constraint are rolled back and skipped
+    (sqlite3.IntegrityError when ``raise_errors``). Returns the number of
+    races inserted.
+    '''
+    inserted = 0
+    for rows in races_rows:
+        try:
+            with Database.savepoint(cursor, 'race'):
+                Database.insert_many(cursor, TIMING_POINTS_INSERT, rows)
+            inserted += 1
+        except sqlite3.IntegrityError:
+            if raise_errors:
+                raise
+    return inserted
+
+
+def parse_timing_points(task):
+    '''
+    Timing points rows of the races of a main task (folder, [(name,
+    file_path, race_id, event_id, departure_datetime, control_points)]),
+    as {index of the race: rows}. Races with an empty CSV are logged and
+    left out. Runs in the parsing processes.
+    '''
+    _, races = task
+    parsed = []
+    for k, (_, file_path, race_id, event_id, departure_datetime, control_points) in enumerate(races):
+        csv_data = read_csv(file_path)
+        if len(csv_data) > 0:
+            parsed.append((k, (race_id, event_id, departure_datetime, csv_data, control_points)))
+        else:
+            logger.warning("FAILED Empty CSV: %s %s", race_id, event_id)
+    rows = races_timing_points_rows([race for _, race in parsed])
+    return {parsed[j][0]: race_rows for j, race_rows in rows.items()}
 
 
 # Function to read CSV file
 def read_csv(file_path):
+    if not os.path.exists(file_path):
+        # Race stored in its event-year store: its columns are views of the
+        # memory-mapped cells, read straight into the rows
+        store, race = storage.archived(file_path)
+        columns = store.strings(race)
+        if not columns:
+            return []
+        bibs = columns[1].tolist()
+        times = zip(*(values.tolist() for values in columns[5:])) if len(columns) > 5 else ([] for _ in bibs)
+        return [[bib, list(row)] for bib, row in zip(bibs, times)]
     with open(file_path, newline='', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile)
         next(reader)  # Skip header
@@ -156,7 +269,8 @@ def clean_race(cursor, event_id, race_id):
 
 
 def main(path: str = None, data_path: str = None, clean: bool = False,
-         skip: str = None, update: dict = None, force_update: bool = False):
+         skip: str = None, update: dict = None, force_update: bool = False,
+         changed_only: bool = False, workers: int = 1, conn: sqlite3.Connection = None):
     '''
     Args:
         path (str): Path to SQLite3 DB.
@@ -164,6 +278,13 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
         clean (bool): If True, the tables will be emtied before execution.
         skip (str): If specified, path for the file containing the list of (event, year) to skip
         update (dict): If specified, dict containing the list of files to use.
+        changed_only (bool): If True, races already loaded in their current
+            downloaded version (see DownloadManifest) are skipped and the
+            others are cleaned before being reloaded.
+        workers (int): Number of processes parsing the CSV files, the
+            database is written by the calling thread only.
+        conn (sqlite3.Connection): If specified, connection used for the
+            whole run (left open), otherwise one is opened to ``path``.
     '''
     try:
         cfg = get_config()
@@ -173,13 +294,12 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
             data_path = os.path.join(cfg.data_dir_path, 'csv')
 
         db: Database = Database.create_database(path=path)
+        db_connection = conn if conn is not None else connect_to_db(db.path)
+        cursor = db_connection.cursor()
 
         if clean:
-            db_connection = connect_to_db(db.path)
             with db_connection:
-                cursor = db_connection.cursor()
                 clean_table(cursor)
-                db_connection.commit()
                 logger.info('timing_points table emptied')
 
         folders = os.listdir(data_path)
@@ -194,45 +314,58 @@ def main(path: str = None, data_path: str = None, clean: bool = False,
             years = update
             folders = list(years.keys())
             db_LiveTrail_loader.save_years_to_txt('updated_events_years.txt', years)
-        logger.info("Inserting data into Timing Points table.")
-        # Iterate through folders
+        manifest = DownloadManifest(data_path)
+        loaded = manifest.loaded('timing_points') if changed_only else set()
         parsed_data = {}
-        for folder in folders:
-            folder_path = os.path.join(data_path, folder)
-            if os.path.isdir(folder_path):
-                parsed_data[folder] = []
-                # Iterate through CSV files in the folder
-                for file in os.listdir(folder_path):
-                    if file.endswith('.csv'):
-                        if skip or update:
-                            if not any(file.endswith(f'{year}.csv') for year in years[folder]):
+
+        def tasks():
+            for folder in folders:
+                folder_path = os.path.join(data_path, folder)
+                if os.path.isdir(folder_path):
+                    parsed_data[folder] = []
+                    # Races of the event (folder) are parsed and written together
+                    races = []
+                    # Iterate through CSV files in the folder
+                    for file in storage.list_results(folder_path):
+                        if file.endswith('.csv'):
+                            if skip or update:
+                                if not any(file.endswith(f'{year}.csv') for year in years[folder]):
+                                    continue
+                            name = f'csv/{folder}/{file}'
+                            if name in loaded:
                                 continue
-                        file_path = os.path.join(folder_path, file)
-                        # Fetch race_id and event_id from races table
-                        parsed_data[folder].append(file[-8:-4])
-                        db_connection = connect_to_db(db.path)
-                        with db_connection:
-                            cursor = db_connection.cursor()
-                            race_event_ids = fetch_race_event_ids(cursor, f'csv/{folder}/{file}')
+                            parsed_data[folder].append(file[-8:-4])
+                            # Fetch race_id and event_id from races table
+                            race_event_ids = fetch_race_event_ids(cursor, name)
                             if race_event_ids:
                                 race_id, event_id, departure_datetime = race_event_ids
-                                logger.info('Inserting data into %s. %s, %s', event_id, folder, race_id)
-                                # Read CSV file
-                                csv_data = read_csv(file_path)
-                                # Insert data into timing_points table
-                                try:
-                                    if len(csv_data) > 0:
-                                        if force_update:
-                                            clean_race(cursor, event_id, race_id)
-                                        insert_into_timing_points(cursor, race_id, event_id, departure_datetime, csv_data)
-                                    else:
-                                        logger.warning("FAILED Empty CSV: %s %s", race_id, event_id)
-                                except sqlite3.IntegrityError:
-                                    pass
-                                except ValueError:
-                                    pass
-                            db_connection.commit()
-                        db_connection.close()
+                                races.append((name, os.path.join(folder_path, file), race_id, event_id,
+                                              departure_datetime, fetch_control_points(cursor, race_id, event_id)))
+                    yield folder, races
+
+        def write(task, rows):
+            # Each race is written atomically, only committed races are marked as loaded
+            folder, races = task
+            committed = []
+            with db_connection:
+                for k, race_rows in rows.items():
+                    name, _, race_id, event_id, *_ = races[k]
+                    logger.info('Inserting data into %s. %s, %s', event_id, folder, race_id)
+                    try:
+                        with Database.savepoint(cursor, 'race'):
+                            if force_update or changed_only:
+                                clean_race(cursor, event_id, race_id)
+                            Database.insert_many(cursor, TIMING_POINTS_INSERT, race_rows)
+                    except sqlite3.IntegrityError as e:
+                        logger.warning("FAILED IntegrityError: %s %s %s", race_id, event_id, e)
+                        continue
+                    committed.append(name)
+            manifest.mark_loaded('timing_points', committed)
+
+        logger.info("Inserting data into Timing Points table.")
+        parse_and_write(tasks(), parse_timing_points, write, workers=workers)
+        if conn is None:
+            db_connection.close()
     except Exception as e:
         logger.exception("Error in timing points loader")
         # save progress to be able to use it with --skip option after
@@ -245,6 +378,8 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--data-path', default=None, help='CSV files path.')
     parser.add_argument('-c', '--clean', action='store_true', help='Remove all data from table before execution.')
     parser.add_argument('-f', '--force-update', action='store_true', help='Remove all data from specified tables in "years" before execution.')
+    parser.add_argument('--changed-only', action='store_true', help='Only load races new or changed since they were last loaded.')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='Processes parsing the CSV files.')
     group.add_argument('-s', '--skip', default=None, help='Filepath to list of events and years to ignore during update. db_LiveTrail_loader.py generates this list as update.txt')
     group.add_argument('-u', '--update', type=str, default=None, help='dict in "years" format containing the list of events and years to update or path for the file containing the list.')
 
@@ -263,4 +398,6 @@ if __name__ == "__main__":
         except json.JSONDecodeError:
             update = db_LiveTrail_loader.parse_events_years_txt_file(os.path.join(os.getcwd(), args.update))
 
-    main(path=path, data_path=data_path, clean=clean, skip=skip, update=update, force_update=force_update)
+    with Database.bulk_load(path if path else get_config().db_path) as conn:
+        main(path=path, data_path=data_path, clean=clean, skip=skip, update=update, force_update=force_update,
+             changed_only=args.changed_only, workers=args.workers, conn=conn)
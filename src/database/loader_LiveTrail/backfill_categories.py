@@ -14,15 +14,19 @@ Detection: for every race in the DB, count rows with NULL/empty
 ``races.cat_needs_backfill = 1``; the flag persists so future loader runs
 know to re-apply the backfill when they see new data for that race.
 
-Backfill: for every flagged race, fetch ``coureur.php`` per empty-cat bib,
-update ``results.sex_category`` directly (H → Male, F → Female) and
-``results.full_category`` when ``descat`` is available, then recompute
-category rankings for the race.
+Backfill: for every flagged race, fetch ``coureur.php`` per empty-cat bib on
+a small thread pool, update ``results.sex_category`` directly (H → Male,
+F → Female) and ``results.full_category`` when ``descat`` is available, then
+recompute category rankings for the race. Every bib asked is checkpointed in
+``backfill_progress`` with the updates, in batches, so an interrupted run
+picks up where it stopped.
 """
 import argparse
 import logging
 import os
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 
 from config import get_config
@@ -37,6 +41,11 @@ logger = logging.getLogger(__name__)
 # to catch both without snagging UTMB-style races whose baseline is <0.5%.
 DEFAULT_EMPTY_CAT_THRESHOLD = 0.10
 
+# Concurrent coureur.php requests (they still share the scraper's rate limit)
+# and bibs written + checkpointed per transaction.
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 50
+
 _SEX_MAP = {'F': 'Female', 'H': 'Male', 'M': 'Male'}
 
 
@@ -61,13 +70,14 @@ def _full_category_from_identity(identity: dict) -> str | None:
     return f"{descat} {suffix}".strip()
 
 
-def _open(db_path: str) -> sqlite3.Connection:
-    return sqlite3.connect(db_path, timeout=30)
+def _open(db_path: str, conn: sqlite3.Connection | None = None):
+    return Database.session(db_path, conn, timeout=30)
 
 
 def detect_races_needing_backfill(
     db_path: str,
     threshold: float = DEFAULT_EMPTY_CAT_THRESHOLD,
+    conn: sqlite3.Connection | None = None,
 ) -> list[tuple[int, str, float]]:
     """Scan every race and flag those exceeding the empty-cat ratio.
 
@@ -75,9 +85,8 @@ def detect_races_needing_backfill(
     newly flagged this run (rows that were already flagged are not returned
     again, so the caller can log only the deltas).
     """
-    Database.ensure_cat_backfill_column(db_path)
-    conn = _open(db_path)
-    try:
+    with _open(db_path, conn) as conn:
+        Database.ensure_cat_backfill_column(db_path, conn)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT r.event_id, r.race_id, r.cat_needs_backfill,
@@ -104,21 +113,19 @@ def detect_races_needing_backfill(
                 newly_flagged.append((event_id, race_id, ratio))
         conn.commit()
         return newly_flagged
-    finally:
-        conn.close()
 
 
 def list_flagged_races(
     db_path: str,
     event_ids: Iterable[int] | None = None,
+    conn: sqlite3.Connection | None = None,
 ) -> list[tuple[int, str, str, str]]:
     """Return ``(event_id, race_id, event_code, year)`` for flagged races.
 
     Optionally restrict to a subset of ``event_ids`` so loaders can process
     only what they just touched during an ``--update`` run.
     """
-    conn = _open(db_path)
-    try:
+    with _open(db_path, conn) as conn:
         cursor = conn.cursor()
         params: list = []
         query = '''
@@ -136,8 +143,67 @@ def list_flagged_races(
         query += ' ORDER BY e.year DESC, e.code, r.race_id'
         cursor.execute(query, params)
         return cursor.fetchall()
-    finally:
-        conn.close()
+
+
+def pending_bibs(
+    db_path: str,
+    event_id: int,
+    race_id: str,
+    retry_failed: bool = False,
+    conn: sqlite3.Connection | None = None,
+) -> list[str]:
+    """Empty-cat bibs of the race not checkpointed yet.
+
+    Bibs in ``backfill_progress`` were already asked to ``coureur.php`` by a
+    previous (possibly interrupted) run and are skipped — including those
+    whose identity carried no usable category, which would otherwise be
+    re-fetched on every run. ``retry_failed`` asks again for the bibs whose
+    request failed.
+    """
+    with _open(db_path, conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT res.bib FROM results res
+            LEFT JOIN backfill_progress bp
+                ON bp.event_id = res.event_id AND bp.race_id = res.race_id
+               AND bp.bib = res.bib
+            WHERE res.event_id = ? AND res.race_id = ?
+              AND (res.full_category IS NULL OR res.full_category = '')
+              AND (bp.status IS NULL OR (? AND bp.status = 'failed'))
+            ''',
+            (event_id, race_id, retry_failed),
+        )
+        return [row[0] for row in cursor.fetchall() if row[0]]
+
+
+def _write_batch(db_path: str, event_id: int, race_id: str, batch: list[tuple],
+                 conn: sqlite3.Connection | None = None) -> None:
+    """Apply a batch of ``(bib, status, sex_cat, full_cat)`` and checkpoint it.
+
+    The category updates and their checkpoint rows are committed together,
+    so a resumed run never skips a bib whose update was lost.
+    """
+    with _open(db_path, conn) as conn:
+        cursor = conn.cursor()
+        # COALESCE keeps any non-null existing value we may not want to
+        # overwrite if the result row has been partially populated.
+        cursor.executemany(
+            '''
+            UPDATE results
+            SET sex_category = COALESCE(?, sex_category),
+                full_category = COALESCE(NULLIF(?, ''), full_category)
+            WHERE event_id = ? AND race_id = ? AND bib = ?
+            ''',
+            [(sex_cat, full_cat, event_id, race_id, bib)
+             for bib, status, sex_cat, full_cat in batch if status == 'updated'],
+        )
+        cursor.executemany(
+            "INSERT OR REPLACE INTO backfill_progress (event_id, race_id, bib, status) "
+            "VALUES (?, ?, ?, ?)",
+            [(event_id, race_id, bib, status) for bib, status, _, _ in batch],
+        )
+        conn.commit()
 
 
 def backfill_race(
@@ -147,60 +213,58 @@ def backfill_race(
     race_id: str,
     event_code: str,
     year: str,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    retry_failed: bool = False,
+    conn: sqlite3.Connection | None = None,
 ) -> tuple[int, int]:
-    """Fetch per-runner identity for every empty-cat bib in the race.
+    """Fetch per-runner identity for every pending empty-cat bib in the race.
+
+    ``workers`` threads share the scraper's rate limit (each with its own
+    scraper copy, sessions are not thread-safe). Results are written and
+    checkpointed ``batch_size`` bibs at a time, so an interrupted run
+    resumes at the first bib not written. The database is only used from
+    the calling thread, through ``conn`` when given.
 
     Returns ``(attempted, updated)`` so the caller can log progress.
     """
-    conn = _open(db_path)
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
-            SELECT bib FROM results
-            WHERE event_id = ? AND race_id = ?
-              AND (full_category IS NULL OR full_category = '')
-            ''',
-            (event_id, race_id),
-        )
-        bibs = [row[0] for row in cursor.fetchall()]
-    finally:
-        conn.close()
+    Database.ensure_backfill_progress_table(db_path, conn)
+    bibs = pending_bibs(db_path, event_id, race_id, retry_failed=retry_failed, conn=conn)
+    local = threading.local()
+
+    def fetch_identity(bib):
+        if not hasattr(local, 'scraper'):
+            local.scraper = scraper._for_event_year(event_code, year)
+        return local.scraper.get_runner_identity(event_code, year, bib)
 
     attempted = 0
     updated = 0
-    for bib in bibs:
-        if not bib:
-            continue
-        attempted += 1
-        identity = scraper.get_runner_identity(event_code, year, bib)
-        if identity is None:
-            continue
-        sex_cat = _sex_category_from_sx(identity.get('sx', ''))
-        full_cat = _full_category_from_identity(identity)
-        if sex_cat is None and full_cat is None:
-            continue
-        conn = _open(db_path)
+    batch = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
         try:
-            cursor = conn.cursor()
-            # COALESCE keeps any non-null existing value we may not want to
-            # overwrite if the result row has been partially populated.
-            cursor.execute(
-                '''
-                UPDATE results
-                SET sex_category = COALESCE(?, sex_category),
-                    full_category = COALESCE(NULLIF(?, ''), full_category)
-                WHERE event_id = ? AND race_id = ? AND bib = ?
-                ''',
-                (sex_cat, full_cat, event_id, race_id, bib),
-            )
-            conn.commit()
+            for bib, identity in zip(bibs, executor.map(fetch_identity, bibs)):
+                attempted += 1
+                sex_cat = full_cat = None
+                if identity is None:
+                    status = 'failed'
+                else:
+                    sex_cat = _sex_category_from_sx(identity.get('sx', ''))
+                    full_cat = _full_category_from_identity(identity)
+                    status = 'no_category' if sex_cat is None and full_cat is None else 'updated'
+                updated += status == 'updated'
+                batch.append((bib, status, sex_cat, full_cat))
+                if len(batch) >= batch_size:
+                    _write_batch(db_path, event_id, race_id, batch, conn)
+                    batch = []
         finally:
-            conn.close()
-        updated += 1
-
-    if updated:
-        _recompute_cat_rankings_for_race(db_path, event_id, race_id)
+            # Keep what was fetched before an interruption
+            if batch:
+                _write_batch(db_path, event_id, race_id, batch, conn)
+            executor.shutdown(cancel_futures=True)
+
+    # Always: the updates of a run interrupted before its recompute are
+    # checkpointed, so the resumed run may update nothing itself
+    _recompute_cat_rankings_for_race(db_path, event_id, race_id, conn)
     logger.info(
         "Backfilled %s %s %s: attempted=%d updated=%d",
         event_code, year, race_id, attempted, updated,
@@ -208,14 +272,14 @@ def backfill_race(
     return attempted, updated
 
 
-def _recompute_cat_rankings_for_race(db_path: str, event_id: int, race_id: str) -> None:
+def _recompute_cat_rankings_for_race(db_path: str, event_id: int, race_id: str,
+                                     conn: sqlite3.Connection | None = None) -> None:
     """Recompute cat_position / full_cat_position for a single race.
 
     Mirrors ``CSV_to_DB_results.compute_category_rankings`` but scoped to one
     race so we don't re-rank the whole event every time we backfill a race.
     """
-    conn = _open(db_path)
-    try:
+    with _open(db_path, conn) as conn:
         cursor = conn.cursor()
         cursor.execute(
             '''
@@ -243,29 +307,38 @@ def _recompute_cat_rankings_for_race(db_path: str, event_id: int, race_id: str)
             (event_id, race_id, event_id, race_id),
         )
         conn.commit()
-    finally:
-        conn.close()
 
 
 def backfill_all(
     db_path: str,
     event_ids: Iterable[int] | None = None,
     threshold: float = DEFAULT_EMPTY_CAT_THRESHOLD,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    retry_failed: bool = False,
+    metrics_path: str | None = None,
+    conn: sqlite3.Connection | None = None,
 ) -> None:
     """Detect + backfill every flagged race.
 
     Call with ``event_ids`` to restrict the run (used by the loader to touch
     only what it just updated). Call with no filter for the one-shot.
+    Re-running after an interruption resumes from the checkpoint.
+    The scraper's metrics are written as JSON to ``metrics_path``
+    (backfill_scraper_metrics.json in the data folder by default).
+    With ``conn``, the detection, the updates and the checkpoints go
+    through it instead of connections of their own.
     """
-    Database.ensure_cat_backfill_column(db_path)
-    newly = detect_races_needing_backfill(db_path, threshold=threshold)
+    Database.ensure_cat_backfill_column(db_path, conn)
+    Database.ensure_backfill_progress_table(db_path, conn)
+    newly = detect_races_needing_backfill(db_path, threshold=threshold, conn=conn)
     for event_id, race_id, ratio in newly:
         logger.info(
             "Flagged for backfill: event_id=%s race_id=%s empty_ratio=%.1f%%",
             event_id, race_id, ratio * 100,
         )
 
-    flagged = list_flagged_races(db_path, event_ids=event_ids)
+    flagged = list_flagged_races(db_path, event_ids=event_ids, conn=conn)
     if not flagged:
         logger.info("No flagged races to backfill.")
         return
@@ -275,10 +348,15 @@ def backfill_all(
     for event_id, race_id, event_code, year in flagged:
         _, updated = backfill_race(
             scraper, db_path, event_id, race_id, event_code, year,
+            workers=workers, batch_size=batch_size, retry_failed=retry_failed, conn=conn,
         )
         total_updated += updated
     logger.info("Backfill finished: %d row(s) updated across %d race(s)",
                 total_updated, len(flagged))
+    if not metrics_path:
+        metrics_path = os.path.join(get_config().data_dir_path, 'backfill_scraper_metrics.json')
+    scraper.metrics.dump(metrics_path, request_rates=LiveTrailScraper.request_rates())
+    logger.info("Scraper metrics written to %s", metrics_path)
 
 
 def main() -> None:
@@ -298,11 +376,29 @@ def main() -> None:
         '--event-id', type=int, action='append',
         help='Restrict to one or more event_ids (may be repeated).',
     )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=DEFAULT_WORKERS,
+        help=f'Concurrent coureur.php requests (default {DEFAULT_WORKERS}).',
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help=f'Bibs written and checkpointed per transaction '
+             f'(default {DEFAULT_BATCH_SIZE}).',
+    )
+    parser.add_argument(
+        '--retry-failed', action='store_true',
+        help='Ask again for bibs whose coureur.php request failed in a '
+             'previous run.',
+    )
     parser.add_argument(
         '--log', default='backfill.log',
         help="Path to the log file (default 'backfill.log'). Complements "
-             "stdout — having the file is what lets the resume script "
-             "figure out where a crashed run left off.",
+             "stdout; progress itself is checkpointed in the DB.",
+    )
+    parser.add_argument(
+        '--metrics', default=None,
+        help='Path of the JSON scraper metrics (default '
+             'backfill_scraper_metrics.json in the data folder).',
     )
     args = parser.parse_args()
 
@@ -321,6 +417,10 @@ def main() -> None:
         db_path=os.path.abspath(args.path),
         event_ids=args.event_id,
         threshold=args.threshold,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        retry_failed=args.retry_failed,
+        metrics_path=args.metrics,
     )
 
 
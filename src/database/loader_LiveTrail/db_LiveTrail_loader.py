@@ -6,7 +6,11 @@ import re
 import logging
 import argparse
 import sqlite3
+from functools import partial
+from collections import Counter
 from scraper.scraper import LiveTrailScraper
+from scraper.fetch_plan import EventFetchPlan
+from scraper import storage
 from database.create_db import Database
 from database.models import Event, Race
 from database.loader_LiveTrail import CSV_to_DB_results, CSV_to_DB_timing_points
@@ -120,8 +124,92 @@ def generate_code_year_txt(db_path, output_file: str = None) -> dict:
     return parsed_years
 
 
-def main(path=None, data_path=None, clean=False, update=False):
-    '''Script used to parse LiveTrail and insert all available data into DB.'''
+def skip_race(race: str, name: str, cps: dict) -> bool:
+    '''Races not loaded: without control points, orientation or partner races.'''
+    if race not in cps:
+        return True
+    if race == 'maxirace' and 'Orientation' in name:
+        # 'maxirace' has two orientation races not standard
+        return True
+    return name.lower() == 'course des partenaires'
+
+
+def fetch_event_year(scraper: LiveTrailScraper, event: str, year: str, data_path: str) -> dict | None:
+    '''
+        Network half of an event-year unit: downloads its results and
+        returns what main needs to save it (None when the event-year has no
+        control points). ``races`` is None when LiveTrail lists no race,
+        ``race_infos`` holds the departure info of the races to load and
+        ``requests`` the requests sent per page.
+    '''
+    logger.info("Processing %s %s", event, year)
+    plan = EventFetchPlan(scraper, event, year, data_path=data_path)
+    cps, cpns = plan.control_points()
+    if not cps:
+        return None
+    races = plan.races()
+    plan.download()
+    rr = plan.random_runner_bibs()
+    race_infos = {}
+    for race, name in (races or {}).items():
+        if skip_race(race, name, cps):
+            continue
+        race_infos[race] = plan.race_info(rr[race]) if rr[race] is not None else {'date': None, 'hd': None}
+    logger.info("Fetched %s %s with %d requests", event, year, plan.request_count)
+    return {'cps': cps, 'cpns': cpns, 'races': races, 'races_data': plan.physical_details(),
+            'race_infos': race_infos, 'requests': plan.request_counts}
+
+
+CONTROL_POINTS_INSERT = '''
+    INSERT INTO control_points (event_id, race_id, code, name, distance, elevation_pos, elevation_neg)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+'''
+
+
+def save_event_year(conn: sqlite3.Connection, db: Database, event_id: int, event: str, year: str,
+                    data: dict, data_path: str) -> None:
+    '''
+        Database half of an event-year unit: saves the races fetched by
+        fetch_event_year and their control points (one executemany per
+        race, control points already saved are left as they are) within
+        the caller's transaction on ``conn``.
+    '''
+    cps, cpns = data['cps'], data['cpns']
+    cursor = conn.cursor()
+    for race, race_info in data['race_infos'].items():
+        name = data['races'][race]
+        filepath = storage.results_path(data_path, event, race, year)
+        results_filepath = f'csv/{event}/{event}_{race}_{year}.csv' if storage.has_results(filepath) else None
+        race_data = data['races_data'][race]
+        if race_info:  # some races are empty but have empty rows in data (e.g. 'templiers', 'Templi', 2019)
+            # the .split('.')[0] is needed since few races sometime contain a dot at the end or '000' for milliseconds
+            if race_info['date'] and race_info['hd']:
+                departure_datetime = ' '.join([race_info['date'], race_info['hd']]).split('.', maxsplit=1)[0] if race_info['hd'] else None
+            elif race_info['hd']:
+                departure_datetime = race_info['hd']
+            else:
+                departure_datetime = None
+        else:
+            departure_datetime = None
+        r = Race(race_id=race, event_id=event_id, race_name=name, distance=race_data['distance'],
+                 elevation_pos=race_data['elevation_pos'], elevation_neg=race_data['elevation_pos'],
+                 departure_datetime=departure_datetime, results_filepath=results_filepath, db=db)
+        r.save_to_database(conn)
+        Database.insert_many(cursor, CONTROL_POINTS_INSERT,
+                             [(event_id, race, cp_code, cpns[race][cp_code],  # Name not scraped
+                               cp_data[0], cp_data[1], cp_data[2]) for cp_code, cp_data in cps[race].items()])
+
+
+def main(path=None, data_path=None, clean=False, update=False, workers=4, metrics_path=None, parse_workers=1):
+    '''
+        Script used to parse LiveTrail and insert all available data into DB.
+        ``workers`` event-years are downloaded concurrently (the scraper's
+        rate limit still applies), then saved in order. The scraper's
+        metrics are written as JSON to ``metrics_path``
+        (scraper_metrics.json in the data folder by default). The CSV
+        loaders parse the results in ``parse_workers`` processes.
+    '''
     cfg = get_config()
     if not path:
         path = cfg.db_path
@@ -129,7 +217,6 @@ def main(path=None, data_path=None, clean=False, update=False):
         data_path = os.path.join(cfg.data_dir_path, 'csv')
 
     db: Database = Database.create_database(path=path)
-    Database.ensure_cat_backfill_column(db.path)
 
     if clean:
         Database.empty_all_tables(db.path)
@@ -177,107 +264,74 @@ def main(path=None, data_path=None, clean=False, update=False):
         logger.info("Events: %s", json.dumps(events, ensure_ascii=False))
         logger.info("Years: %s", json.dumps(years, ensure_ascii=False))
 
-    for code, name in events.items():
-        if code in years:
-            for year in years[code]:
-                event = Event(event_code=code,
-                              event_name=name,
-                              year=year,
-                              country=None,
-                              db=db)
-                event.save_to_database()
-
-    touched_event_ids: set[int] = set()
-    for event, name in events.items():
-        if event in years:
-            for year in years[event]:
-                logger.info("Processing %s %s", event, year)
-                scraper.set_events([event])
-                scraper.set_years([year])
-                cps, cpns = scraper.get_control_points()
-                event_id = Event.get_id_from_code_year(event, year, db=db)
-                if event_id is not None:
-                    touched_event_ids.add(event_id)
-                if not cps:
-                    continue
-                races = scraper.get_races()
-                rr = scraper.get_random_runner_bib(data_path=data_path)
-                scraper.download_data(data_path=data_path)
-                races_data = scraper.get_races_physical_details()
-                if event not in races:
-                    logger.info('No data available for %s %s.', events[event], year)
-                elif year not in races[event]:
-                    logger.info('No data available for %s %s.', events[event], year)
-                else:
-                    races = races[event][year]
-                    for race, name in races.items():
-                        if race not in cps:
-                            continue
-                        if race == 'maxirace' and 'Orientation' in name:
-                            # 'maxirace' has two orientation races not standard
-                            continue
-                        elif name.lower() == 'course des partenaires':
-                            continue
-                        scraper.set_race(race)
-                        folder_path = os.path.join(data_path, event)
-                        filepath = os.path.join(folder_path, f'{event}_{race}_{year}.csv')
-                        results_filepath = f'csv/{event}/{event}_{race}_{year}.csv' if os.path.exists(filepath) else None
-                        race_info = scraper.get_race_info(bib_n=rr[year][race]) if rr[year][race] is not None else {'date': None, 'hd': None}
-                        control_points = cps[race]
-                        race_data = races_data[race]
-                        if race_info:  # some races are empty but have empty rows in data (e.g. 'templiers', 'Templi', 2019)
-                            # the .split('.')[0] is needed since few races sometime contain a dot at the end or '000' for milliseconds
-                            if race_info['date'] and race_info['hd']:
-                                departure_datetime = ' '.join([race_info['date'], race_info['hd']]).split('.', maxsplit=1)[0] if race_info['hd'] else None
-                            elif race_info['hd']:
-                                departure_datetime = race_info['hd']
-                            else:
-                                departure_datetime = None
-                        else:
-                            departure_datetime = None
-                        r = Race(race_id=race, event_id=event_id, race_name=name, distance=race_data['distance'],
-                                 elevation_pos=race_data['elevation_pos'], elevation_neg=race_data['elevation_pos'],
-                                 departure_datetime=departure_datetime, results_filepath=results_filepath, db=db)
-                        r.save_to_database()
-                        for cp_code, data in cps[race].items():
-                            conn = sqlite3.connect(db.path, timeout=3600)
-                            with conn:
-                                cursor = conn.cursor()
-                                try:
-                                    cursor.execute('''
-                                                INSERT INTO control_points
-                                                            (event_id, race_id, code, name,
-                                                            distance, elevation_pos, elevation_neg)
-                                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                                                   (event_id, race, cp_code, cpns[race][cp_code],  # Name not scraped
-                                                    data[0], data[1], data[2],))
-                                except sqlite3.IntegrityError:
-                                    pass
-
-    for script in [CSV_to_DB_results, CSV_to_DB_timing_points]:
-        actual_path = os.getcwd()  # os.path.split(os.path.realpath(__file__))
-        if update:
-            script.main(path=os.path.join(actual_path, path), clean=clean,
-                        skip=os.path.join(actual_path, "update.txt"),
-                        data_path=data_path, force_update=True)
-        else:
-            script.main(path=os.path.join(actual_path, path), clean=clean,
-                        data_path=data_path, update=years)
-            
-    # Back-fill sex / category data for races whose bulk XML omits it.
-    # Scoped to touched events so an --update run doesn't re-probe the whole
-    # database every time.
-    if touched_event_ids:
-        try:
-            from database.loader_LiveTrail.backfill_categories import backfill_all
-            logger.info("Running category backfill for %d touched event(s)",
-                         len(touched_event_ids))
-            backfill_all(db_path=db.path, event_ids=touched_event_ids)
-        except Exception:
-            logger.exception("Category backfill failed; continuing")
-
-    logger.info("Creating table for enabling AI")
-    load_features(db_path=db.path, clean=clean)
+    # One connection for the whole run, each event-year saved in its own transaction
+    with Database.bulk_load(db.path) as conn:
+        Database.ensure_cat_backfill_column(db.path, conn)
+        Database.ensure_indexes(db.path, conn)
+        for code, name in events.items():
+            if code in years:
+                for year in years[code]:
+                    with conn:
+                        event = Event(event_code=code,
+                                      event_name=name,
+                                      year=year,
+                                      country=None,
+                                      db=db,
+                                      conn=conn)
+                        event.save_to_database(conn)
+
+        touched_event_ids: set[int] = set()
+        request_counts = Counter()
+        units = [(event, year) for event in events if event in years for year in years[event]]
+        fetched = scraper.map_event_years(partial(fetch_event_year, data_path=data_path),
+                                          units, max_workers=workers)
+        for (event, year), data in zip(units, fetched):
+            event_id = Event.get_id_from_code_year(event, year, db=db, conn=conn)
+            if event_id is not None:
+                touched_event_ids.add(event_id)
+            if data is None:
+                continue
+            request_counts.update(data['requests'])
+            if data['races'] is None:
+                logger.info('No data available for %s %s.', events[event], year)
+                continue
+            with conn:
+                save_event_year(conn, db, event_id, event, year, data, data_path)
+
+        logger.info("LiveTrail requests: %d (%s)", sum(request_counts.values()), dict(request_counts))
+        if not metrics_path:
+            metrics_path = os.path.join(cfg.data_dir_path, 'scraper_metrics.json')
+        scraper.metrics.dump(metrics_path, request_rates=LiveTrailScraper.request_rates(),
+                             requests=dict(request_counts))
+        logger.info("Scraper metrics written to %s", metrics_path)
+
+        for script in [CSV_to_DB_results, CSV_to_DB_timing_points]:
+            actual_path = os.getcwd()  # os.path.split(os.path.realpath(__file__))
+            if update:
+                # races already loaded in their downloaded version are left alone
+                script.main(path=os.path.join(actual_path, path), clean=clean,
+                            skip=os.path.join(actual_path, "update.txt"),
+                            data_path=data_path, force_update=True, changed_only=True, workers=parse_workers,
+                            conn=conn)
+            else:
+                script.main(path=os.path.join(actual_path, path), clean=clean,
+                            data_path=data_path, update=years, workers=parse_workers, conn=conn)
+
+        # Back-fill sex / category data for races whose bulk XML omits it.
+        # Scoped to touched events so an --update run doesn't re-probe the whole
+        # database every time.
+        if touched_event_ids:
+            try:
+                from database.loader_LiveTrail.backfill_categories import backfill_all
+                logger.info("Running category backfill for %d touched event(s)",
+                             len(touched_event_ids))
+                backfill_all(db_path=db.path, event_ids=touched_event_ids, conn=conn)
+            except Exception:
+                conn.rollback()  # a batch cut short is not written by the next steps
+                logger.exception("Category backfill failed; continuing")
+
+        logger.info("Creating table for enabling AI")
+        load_features(db_path=db.path, clean=clean, conn=conn)
     logger.info("Updated events:")
     if os.path.exists('updated_events_years.txt'):
         logger.info(open('updated_events_years.txt', encoding='utf-8').read())
@@ -289,11 +343,16 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--data-path', default=None, help='CSV files path.')
     parser.add_argument('-c', '--clean', action='store_true', help='Remove all data from table before execution.')
     parser.add_argument('-u', '--update', action='store_true', help='Download only events and races not already present in DB.')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Event-years downloaded concurrently.')
+    parser.add_argument('-j', '--parse-workers', type=int, default=os.cpu_count(), help='Processes parsing the CSV files.')
+    parser.add_argument('--metrics', default=None, help='Path of the JSON scraper metrics.')
 
     args = parser.parse_args()
     path = args.path
     data_path = args.data_path
     clean = args.clean
     update = args.update
+    workers = args.workers
 
-    main(path=path, data_path=data_path, clean=clean, update=update)
+    main(path=path, data_path=data_path, clean=clean, update=update, workers=workers, metrics_path=args.metrics,
+         parse_workers=args.parse_workers)
@@ -0,0 +1,54 @@
+'''
+    Parallel parsing for the CSV loaders: a pool of processes parses the
+    races into rows ready to be inserted while the calling thread, the only
+    one writing to SQLite, drains them into the database.
+'''
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Parsed tasks allowed to wait for the writer, per worker
+QUEUE_SIZE_PER_WORKER = 4
+
+
+def parse_and_write(tasks, parse, write, workers: int = 1, queue_size: int = None) -> int:
+    '''
+        Call ``write(task, parse(task))`` for every task, in order.
+
+        With more than one worker, ``parse`` runs in a pool of ``workers``
+        processes (it must be a module-level function and the tasks and
+        their results picklable) and at most ``queue_size`` tasks are
+        parsed ahead of ``write``, which bounds the memory held by rows not
+        written yet. ``write`` always runs in the calling thread, so a
+        single connection writes to the database and each task can be
+        committed on its own. ``tasks`` is consumed lazily, it may read the
+        database between writes. Returns the number of tasks written.
+    '''
+    count = 0
+    if workers <= 1:
+        for task in tasks:
+            write(task, parse(task))
+            count += 1
+        return count
+    if not queue_size:
+        queue_size = QUEUE_SIZE_PER_WORKER * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for task in tasks:
+                pending.append((task, pool.submit(parse, task)))
+                if len(pending) >= queue_size:
+                    task, future = pending.popleft()
+                    write(task, future.result())
+                    count += 1
+            while pending:
+                task, future = pending.popleft()
+                write(task, future.result())
+                count += 1
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            raise
+    return count
@@ -1,11 +1,30 @@
 import sqlite3
 from typing import Union
+from contextlib import contextmanager
+from sqlite3 import Connection
 from database.create_db import Database
 
 
+@contextmanager
+def _session(db: Database, conn: Connection = None):
+    '''
+        ``conn`` if given, its transaction is left to the caller, otherwise
+        a new connection to ``db`` committed and closed on exit.
+    '''
+    if conn is not None:
+        yield conn
+        return
+    conn = sqlite3.connect(db.path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
 class Event:
     def __init__(self, event_name: str = None, event_code: str = None, year: str = None,
-                 country: str = None, db: Database = None) -> None:
+                 country: str = None, db: Database = None, conn: Connection = None) -> None:
         if db is not None:
             self._db: Database = db
         else:
@@ -14,7 +33,7 @@ class Event:
         self._event_name: str = event_name
         self._year: str = year
         self._country: str = country
-        self._event_id: int = self.get_event_id_from_database()
+        self._event_id: int = self.get_event_id_from_database(conn)
 
     def __str__(self):
         return f"Event ID: {self._event_id}, Code: {self._event_code}, Name: {self._event_name}, Year: {self._year}, Country: {self._country}"
@@ -49,17 +68,19 @@ class Event:
     def get_country(self) -> str:
         return self._country
 
-    def save_to_database(self) -> None:
-        conn = sqlite3.connect(self._db.path)
+    def save_to_database(self, conn: Connection = None) -> None:
+        '''
+        Insert or update the event, in the transaction of ``conn`` if given.
+        '''
         query = '''
                         UPDATE events
                         SET code = ?,  name = ?, year = ?, country = ?
                         WHERE event_id = ?
                     '''
-        with conn:
-            cursor = conn.cursor()
+        with _session(self._db, conn) as session:
+            cursor = session.cursor()
             if self._event_id is None:
-                self._set_event_id(self.get_event_id_from_database())
+                self._set_event_id(self.get_event_id_from_database(session))
                 if self._event_id is None:
                     cursor.execute('INSERT INTO events (code, name, year, country) VALUES (?, ?, ?, ?)',
                                    (self._event_code, self._event_name, self._year, self._country))
@@ -69,19 +90,15 @@ class Event:
             else:
                 cursor.execute(query, (self._event_code, self._event_name, self._year,
                                        self._country, self._event_id))
-            conn.commit()
-        conn.close()
         # Update event_id after setting it in db
-        self._set_event_id(self.get_event_id_from_database())
+        self._set_event_id(self.get_event_id_from_database(conn))
 
-    def get_event_id_from_database(self) -> Union[int, None]:
-        conn = sqlite3.connect(self._db.path)
-        with conn:
-            cursor = conn.cursor()
+    def get_event_id_from_database(self, conn: Connection = None) -> Union[int, None]:
+        with _session(self._db, conn) as session:
+            cursor = session.cursor()
             cursor.execute('SELECT event_id FROM events WHERE code = ? AND name = ? AND year = ?',
                            (self._event_code, self._event_name, self._year,))
             row = cursor.fetchone()
-        conn.close()
         if row:
             return row[0]
         return None
@@ -108,16 +125,12 @@ class Event:
         return None
 
     @staticmethod
-    def get_id_from_code_year(event_code, year, db: Database = None) -> Union[int, None]:
-        if db is None:
-            conn = sqlite3.connect(Database().path)
-        else:
-            conn = sqlite3.connect(db.path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT event_id FROM events WHERE code = ? AND year = ?',
-                       (event_code, year))
-        row = cursor.fetchone()
-        conn.close()
+    def get_id_from_code_year(event_code, year, db: Database = None, conn: Connection = None) -> Union[int, None]:
+        with _session(Database() if db is None else db, conn) as session:
+            cursor = session.cursor()
+            cursor.execute('SELECT event_id FROM events WHERE code = ? AND year = ?',
+                           (event_code, year))
+            row = cursor.fetchone()
         if row:
             return row[0]
         return None
@@ -214,53 +227,41 @@ class Race:
     def get_results_filepath(self) -> str:
         return self._results_filepath
 
-    def save_to_database(self) -> None:
-        if self.get_race_event_id_from_database(self._event_id,
-                                                self._race_name,
-                                                self._db) is not None:
-            query = '''
-                UPDATE races SET race_name =?,
-                                 distance = ?, elevation_pos = ?,
-                                 elevation_neg =?, departure_datetime =?,
-                                 results_filepath = ?
-                WHERE race_id = ? AND event_id = ?
-            '''
-            conn = sqlite3.connect(self._db.path)
-            with conn:
-                cursor = conn.cursor()
-                cursor.execute(query, (self._race_name, self._distance,
-                                    self._elevation_pos, self._elevation_neg,
-                                    self._departure_datetime, self._results_filepath,
-                                    self._race_id, self._event_id))
-                conn.commit()
-        else:
-            query = '''
-                INSERT INTO races (race_id, event_id, race_name, distance, elevation_pos,
-                                    elevation_neg, departure_datetime, results_filepath)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            '''
-            conn = sqlite3.connect(self._db.path)
-            with conn:
-                cursor = conn.cursor()
-                cursor.execute(query, (self._race_id, self._event_id, self._race_name,
-                                    self._distance, self._elevation_pos,
-                                    self._elevation_neg, self._departure_datetime,
-                                    self._results_filepath))
-                conn.commit()
-        conn.close()
+    def save_to_database(self, conn: Connection = None) -> None:
+        '''
+        Insert or update the race, in the transaction of ``conn`` if given.
+        '''
+        with _session(self._db, conn) as session:
+            cursor = session.cursor()
+            if self.get_race_event_id_from_database(self._event_id, self._race_name,
+                                                    self._db, session) is not None:
+                cursor.execute('''
+                    UPDATE races SET race_name =?,
+                                     distance = ?, elevation_pos = ?,
+                                     elevation_neg =?, departure_datetime =?,
+                                     results_filepath = ?
+                    WHERE race_id = ? AND event_id = ?
+                ''', (self._race_name, self._distance,
+                      self._elevation_pos, self._elevation_neg,
+                      self._departure_datetime, self._results_filepath,
+                      self._race_id, self._event_id))
+            else:
+                cursor.execute('''
+                    INSERT INTO races (race_id, event_id, race_name, distance, elevation_pos,
+                                        elevation_neg, departure_datetime, results_filepath)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (self._race_id, self._event_id, self._race_name,
+                      self._distance, self._elevation_pos,
+                      self._elevation_neg, self._departure_datetime,
+                      self._results_filepath))
 
     @staticmethod
-    def get_race_event_id_from_database(event_id, race_name, db: Database = None):
-        if db is None:
-            conn = sqlite3.connect(Database().path)
-        else:
-            conn = sqlite3.connect(db.path)
-        with conn:
-            cursor = conn.cursor()
+    def get_race_event_id_from_database(event_id, race_name, db: Database = None, conn: Connection = None):
+        with _session(Database() if db is None else db, conn) as session:
+            cursor = session.cursor()
             cursor.execute('SELECT race_id FROM races WHERE event_id = ? AND race_name = ?',
                            (event_id, race_name,))
             row = cursor.fetchone()
-        conn.close()
         if row:
             return row[0]
         return None
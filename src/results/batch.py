@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from results.results import Results
+from results.times import (parse_seconds, parse_weekday_seconds, weekday_order, time_to_seconds,
+                           format_seconds, format_over24h)
+
+
+class ResultsBatch:
+    '''
+    Many races cleaned together, the way Results cleans one.
+
+    ``races`` are (control_points, times, offset, start_day, waves) tuples
+    with the same meaning as the Results arguments; ``times`` is a
+    DataFrame or a 2-D array of raw passages. All passages are parsed in
+    one pass and races of the same width are interpolated and corrected
+    for midnight as one matrix, so small races do not pay the fixed pandas
+    cost of a Results object each.
+
+    Layout: the runners of every race are stacked in ``seconds`` (clock
+    seconds) and ``real_seconds`` (seconds since departure, per runner
+    with waves), float matrices padded with NaN to the widest race. Race
+    ``i`` owns rows ``row_splits[i]:row_splits[i + 1]`` and its first
+    ``widths[i]`` columns (use ``race_seconds``). ``rows[i]`` holds the
+    positions of those runners in the raw times (DNFs are filtered out),
+    ``columns[i]``/``control_points[i]`` the control points left once
+    empty ones are dropped and ``interpolated`` flags the filled cells.
+    Races that cannot be processed are empty and their exception is kept
+    in ``errors``.
+    '''
+    def __init__(self, races: list[tuple], clean_days=False) -> None:
+        self.errors = {}
+        self.offsets, self.waves, raw, cleaned = [], [], [], []
+        for i, (control_points, times, offset, _, waves) in enumerate(races):
+            self.offsets.append(0)
+            self.waves.append(waves)
+            try:
+                raw.append(self._prepare(control_points, times, offset))
+                self.offsets[i] = raw[-1][3]
+            except (ValueError, TypeError, KeyError) as e:
+                self.errors[i] = e
+                raw.append((dict(control_points), pd.Index([]), np.empty((0, 0), dtype=object), 0))
+
+        # Parse every passage of every race at once
+        cells = [values for _, _, values, _ in raw]
+        if clean_days:
+            parsed = [parse_weekday_seconds(values, weekday_order(race[3]))
+                      for values, race in zip(cells, races)]
+        else:
+            flat = parse_seconds(np.concatenate([values.ravel() for values in cells])) if cells else []
+            parsed = [seconds.reshape(values.shape) for seconds, values in
+                      zip(np.split(flat, np.cumsum([values.size for values in cells])[:-1]), cells)]
+        for (control_points, columns, _, _), seconds in zip(raw, parsed):
+            cleaned.append(self._filter(control_points, columns, seconds))
+
+        self.control_points = [control_points for control_points, _, _, _ in cleaned]
+        self.columns = [columns for _, columns, _, _ in cleaned]
+        self.rows = [rows for _, _, rows, _ in cleaned]
+        self.widths = np.array([len(columns) for columns in self.columns], dtype=int)
+        self.row_splits = np.concatenate([[0], np.cumsum([len(rows) for rows in self.rows])]).astype(int)
+        width = int(self.widths.max()) if len(self.widths) else 0
+        self.seconds = np.full((self.row_splits[-1], width), np.nan)
+        self.interpolated = np.zeros(self.seconds.shape, dtype=bool)
+
+        # Races of the same width go through interpolation and the midnight
+        # correction as one matrix
+        for w in np.unique(self.widths):
+            group = np.flatnonzero(self.widths == w)
+            stacked = np.vstack([cleaned[i][3] for i in group])
+            missing = np.isnan(stacked)
+            corrected = Results._correct_times24h(np.floor(np.round(Results._interpolate_rows(stacked), 6)))
+            start = 0
+            for i in group:
+                n = len(self.rows[i])
+                race = slice(self.row_splits[i], self.row_splits[i + 1])
+                self.seconds[race, :w] = corrected[start:start + n]
+                self.interpolated[race, :w] = missing[start:start + n]
+                start += n
+
+        self.real_seconds = self.seconds - np.repeat(self.offsets, np.diff(self.row_splits))[:, None]
+        for i, waves in enumerate(self.waves):
+            if waves and self.widths[i] and i not in self.errors:
+                race = slice(self.row_splits[i], self.row_splits[i + 1])
+                first = self.columns[i].get_loc(next(iter(self.control_points[i])))
+                self.real_seconds[race] = self.seconds[race] - self.seconds[race, [first]]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def _prepare(control_points: dict, times, offset) -> tuple:
+        if isinstance(offset, str):
+            offset = time_to_seconds(offset)
+        elif not isinstance(offset, int) or isinstance(offset, bool):
+            raise ValueError("offset must be departure time in 'hh:mm:ss'\
+                              format or # seconds since midnight.")
+        if isinstance(times, pd.DataFrame):
+            columns, values = times.columns, times.to_numpy(dtype=object)
+        else:
+            columns, values = pd.Index(list(control_points)), np.array(times, dtype=object)
+            if values.size == 0:
+                values = values.reshape(len(values), len(columns))
+        if values.ndim != 2 or values.shape[1] != len(columns):
+            raise ValueError(f'{values.shape} times do not match {len(columns)} control points')
+        return dict(control_points), columns, values, offset
+
+    @staticmethod
+    def _filter(control_points: dict, columns: pd.Index, seconds: np.ndarray) -> tuple:
+        '''
+            Results.clean_times' filters: drop DNFs (last column missing) and
+            control points without any passage (but the last one).
+        '''
+        keep = ~np.isnan(seconds[:, -1]) if seconds.shape[1] else np.ones(len(seconds), dtype=bool)
+        seconds = seconds[keep]
+        empty = np.isnan(seconds).all(axis=0)
+        empty[-1:] = False
+        for c in columns[empty]:
+            control_points.pop(c, None)
+        return control_points, columns[~empty], np.flatnonzero(keep), seconds[:, ~empty]
+
+    def race_seconds(self, i: int, real=False) -> np.ndarray:
+        '''
+            Seconds matrix of race ``i`` (runners x its control points).
+        '''
+        seconds = self.real_seconds if real else self.seconds
+        return seconds[self.row_splits[i]:self.row_splits[i + 1], :self.widths[i]]
+
+    def get_real_times(self, over24h=False) -> list[np.ndarray]:
+        '''
+            Real times of every race (see Results.get_real_times), formatted
+            in one pass and returned as one string matrix per race.
+        '''
+        formatted = format_over24h(self.real_seconds) if over24h else format_seconds(self.real_seconds)
+        return [formatted[self.row_splits[i]:self.row_splits[i + 1], :self.widths[i]]
+                for i in range(len(self))]
+
+    def get_results(self, i: int, objective=0) -> Results:
+        '''
+            Results object of race ``i``, built from the batch's matrices.
+        '''
+        if i in self.errors:
+            raise ValueError(f'race {i} could not be processed') from self.errors[i]
+        race = slice(self.row_splits[i], self.row_splits[i + 1])
+        return Results.from_seconds(dict(self.control_points[i]), self.race_seconds(i), self.rows[i],
+                                    self.columns[i], offset=self.offsets[i], waves=self.waves[i],
+                                    interpolated=self.interpolated[race, :self.widths[i]],
+                                    objective=objective)
@@ -1,35 +1,227 @@
 import pandas as pd
 import numpy as np
-import datetime as dt
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from results.times import (parse_seconds, parse_weekday_seconds, weekday_order, format_seconds,
+                           format_over24h, split_time, time_to_seconds, seconds_to_time,
+                           seconds_to_time_over24h)
 
 
 class Results:
     '''
     Results class
+
+    Times are parsed once into ``_seconds``, a float matrix of clock seconds
+    (runner x control point, NaN where a passage is missing) and every
+    computation runs on it. Strings are only produced by the getters.
+
+    ``times``, ``time_deltas``, ``distance_deltas``, ``paces`` and
+    ``paces_norm`` are computed on first access and cached until
+    ``set_offset``, ``clean_times`` or ``compute_real_times`` change the
+    state they derive from.
+
+    ``live`` follows a race in progress: every control point is kept (the
+    ones nobody reached yet stay empty), passages still to come are not
+    interpolated, DNF filtering waits for ``finish`` and ``append_passages``
+    only recomputes the runners it changes.
     '''
     def __init__(self, control_points: dict, times: pd.DataFrame, objective=0, offset=0,
-                 clean_days=False, start_day=7, waves=False) -> None:
+                 clean_days=False, start_day=7, waves=False, live=False) -> None:
+        self._cache = {}
         self.control_points = control_points
         self.objective = objective
-        self.times = times
+        self.waves = waves
+        self.live = live
         if (isinstance(clean_days, str) and clean_days == 'Auto') or\
                 (isinstance(clean_days, bool) and clean_days):
-            days = ['Lu.', 'Ma.', 'Me.', 'Je.', 'Ve.', 'Sa.', 'Di.']  # Weekdays abreviations in French
-            days = [days[(start_day - 1 + j) % len(days)] for j in range(len(days))]
-            self.times = self.clean_days(times, days)
+            self._days = weekday_order(start_day)
+        else:
+            self._days = None
+        self._set_seconds(self._parse(times), times.index, times.columns)
         self.set_offset(offset)
-        self.times = self.clean_times(interpolate='mean', axis='columns')
-        self.times = self.times.apply(self._correct_times24h, axis=1)
-        self.real_times = self.times
-        self.waves = waves
+        if self.live:
+            self._raw = self._to_frame(self._seconds).reindex(columns=list(self.control_points)).to_numpy()
+            self._clean_live()
+        else:
+            self._clean()
+
+    @classmethod
+    def from_seconds(cls, control_points: dict, seconds: np.ndarray, index, columns, offset=0,
+                     waves=False, interpolated=None, objective=0) -> 'Results':
+        '''
+            Results from an already cleaned and midnight-corrected matrix of
+            clock seconds (e.g. a race of a ResultsBatch), skipping parsing
+            and cleaning. ``interpolated`` is the mask of filled cells.
+        '''
+        results = cls.__new__(cls)
+        results._cache = {}
+        results.control_points = control_points
+        results.objective = objective
+        results.set_offset(offset)
+        results._set_seconds(np.asarray(seconds, dtype=float), pd.Index(index), pd.Index(columns))
+        results.interpolated = None if interpolated is None else results._to_frame(np.asarray(interpolated))
+        results._real_seconds = results._seconds
+        results.waves = waves
+        results.live = False
+        if results.waves:
+            results.compute_real_times()
+        return results
+
+    def _parse(self, times: pd.DataFrame) -> np.ndarray:
+        if self._days is not None:
+            return parse_weekday_seconds(times.to_numpy(), self._days)
+        return parse_seconds(times.to_numpy())
+
+    def _clean(self) -> None:
+        self.clean_times(interpolate='mean', axis='columns')
+        self._set_seconds(self._correct_times24h(self._seconds))
+        self._real_seconds = self._seconds
         if self.waves:
             self.compute_real_times()
-        self.time_deltas = self.get_time_deltas()
-        self.distance_deltas = self.get_distance_deltas()
-        self.paces = self.get_paces()
-        self.paces_norm = self.get_paces_norm()
+
+    def _clean_live(self) -> None:
+        self._set_seconds(self._clean_live_rows(self._raw), columns=pd.Index(list(self.control_points)))
+        self.interpolated = self._to_frame(np.isnan(self._raw) & ~np.isnan(self._seconds))
+        self._real_seconds = self._seconds
+        if self.waves:
+            self.compute_real_times()
+
+    def _clean_live_rows(self, raw: np.ndarray) -> np.ndarray:
+        # Gaps between known passages are interpolated, passages to come stay NaN
+        filled = self._interpolate_rows(raw, extrapolate_end=False)
+        return self._correct_times24h(np.floor(np.round(filled, 6)))
+
+    def append_passages(self, times: pd.DataFrame) -> np.ndarray:
+        '''
+            Live mode: add passages, ``times`` being indexed by runner (new
+            labels are new runners) with control point columns. Empty cells
+            leave known passages untouched. Only the runners that changed
+            are cleaned again and get their times, deltas, paces and
+            interpolation mask recomputed; returns their positions.
+        '''
+        if not self.live:
+            raise ValueError('append_passages needs a live Results (live=True)')
+        unknown = times.columns.difference(self._columns)
+        if len(unknown):
+            raise ValueError(f'Unknown control points: {list(unknown)}')
+        new = self._parse(times)
+        new_runners = times.index[~times.index.isin(self._index)].unique()
+        if len(new_runners):
+            self._index = self._index.append(new_runners)
+            self._raw = np.vstack([self._raw, np.full((len(new_runners), len(self._columns)), np.nan)])
+        rows = self._index.get_indexer(times.index)
+        cells = np.ix_(rows, self._columns.get_indexer(times.columns))
+        known = self._raw[cells]
+        passages = np.where(np.isnan(new), known, new)
+        changed = ((passages != known) & ~(np.isnan(passages) & np.isnan(known))).any(axis=1)
+        self._raw[cells] = passages
+        positions = np.union1d(rows[changed], np.arange(len(self._index) - len(new_runners), len(self._index)))
+        self._refresh_rows(positions)
+        return positions
+
+    def _refresh_rows(self, positions: np.ndarray) -> None:
+        grow = len(self._index) - len(self._seconds)
+        if grow:
+            self._seconds = np.vstack([self._seconds, np.full((grow, len(self._columns)), np.nan)])
+            if self.waves:
+                self._real_seconds = np.vstack([self._real_seconds, np.full((grow, len(self._columns)), np.nan)])
+        self._seconds[positions] = self._clean_live_rows(self._raw[positions])
+        if self.waves:
+            first = self._column_positions()[0]
+            self._real_seconds[positions] = self._seconds[positions] - self._seconds[positions][:, [first]]
+        else:
+            self._real_seconds = self._seconds
+        self.interpolated = self.interpolated.reindex(self._index)
+        self.interpolated.iloc[positions] = np.isnan(self._raw[positions]) & ~np.isnan(self._seconds[positions])
+        self.interpolated = self.interpolated.astype(bool)
+
+        # Patch the derived frames already computed, drop the aggregates
+        updaters = {
+            'times': lambda rows: format_seconds(self._seconds[rows]),
+            'time_deltas': self._time_delta_rows,
+            'pace_seconds': self._pace_rows,
+            'pace_seconds_norm': lambda rows: self._pace_rows(rows, norm=True),
+            'paces': lambda rows: format_seconds(self._pace_rows(rows), na=np.nan),
+            'paces_norm': lambda rows: format_seconds(self._pace_rows(rows, norm=True), na=np.nan),
+        }
+        for name in list(self._cache):
+            if name in updaters:
+                frame = self._cache[name].reindex(self._index)
+                frame.iloc[positions] = updaters[name](positions)
+                self._cache[name] = frame
+            elif name != 'distance_deltas':
+                del self._cache[name]
+
+    def finish(self) -> None:
+        '''
+            End of a live race: filter out DNFs and clean every runner the
+            way a finished race is cleaned.
+        '''
+        if not self.live:
+            return
+        self.live = False
+        self._set_seconds(self._raw, self._index, self._columns)
+        del self._raw
+        self._clean()
+
+    @property
+    def times(self) -> pd.DataFrame:
+        '''
+            Clock times (hour of the day, +24h per midnight crossed) formatted
+            from the seconds matrix.
+        '''
+        return self._cached('times', lambda: self._to_frame(format_seconds(self._seconds)))
+
+    @times.setter
+    def times(self, times: pd.DataFrame) -> None:
+        self._set_seconds(parse_seconds(times.to_numpy()), times.index, times.columns)
+
+    @property
+    def real_times(self) -> pd.DataFrame:
+        return self._to_frame(format_seconds(self._real_seconds))
+
+    @property
+    def time_deltas(self) -> pd.DataFrame:
+        return self._cached('time_deltas', self.get_time_deltas)
+
+    @property
+    def distance_deltas(self) -> dict:
+        return self._cached('distance_deltas', self.get_distance_deltas)
+
+    @property
+    def paces(self) -> pd.DataFrame:
+        return self._cached('paces', self.get_paces)
+
+    @property
+    def paces_norm(self) -> pd.DataFrame:
+        return self._cached('paces_norm', self.get_paces_norm)
+
+    def _cached(self, name: str, compute):
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    def _invalidate(self) -> None:
+        '''
+            Drop every derived frame; they are rebuilt on next access.
+        '''
+        self._cache.clear()
+
+    def _set_seconds(self, seconds: np.ndarray, index=None, columns=None) -> None:
+        self._seconds = seconds
+        if index is not None:
+            self._index = index
+        if columns is not None:
+            self._columns = columns
+        self._invalidate()
+
+    def _to_frame(self, values: np.ndarray, columns=None) -> pd.DataFrame:
+        return pd.DataFrame(values, index=self._index,
+                            columns=self._columns if columns is None else columns)
+
+    def _column_positions(self) -> list[int]:
+        # control_points and the times columns share labels; work by position
+        return [self._columns.get_loc(point) for point in self.control_points.keys()]
 
     # Minimum backward step before we trust the +24h wrap. A genuine crossing
     # of midnight produces a diff of ~22-24h; a spurious backward step from a
@@ -39,51 +231,90 @@ class Results:
     # 84th runner, just before the last checkpoint).
     _WRAP_THRESHOLD_SECONDS = 3600
 
-    def _correct_times24h(self, row) -> pd.Series:
-        previous_time = row.iloc[0]
-        adjusted_row = [row.iloc[0]]
-        for i, time in enumerate(row[1:]):
-            current_secs = self.get_seconds(time)
-            previous_secs = self.get_seconds(previous_time)
-            if current_secs < previous_secs:
-                gap = previous_secs - current_secs
-                if gap >= self._WRAP_THRESHOLD_SECONDS:
+    @classmethod
+    def _correct_times24h(cls, seconds: np.ndarray) -> np.ndarray:
+        '''
+            Whole-matrix midnight correction. Backward steps of at least
+            ``_WRAP_THRESHOLD_SECONDS`` between consecutive control points are
+            day crossings and add +24h to the rest of the row (one diff and
+            one cumsum); smaller backward steps are clamped to the previous
+            checkpoint (running maximum). Rows where that shortcut does not
+            reproduce ``_correct_row_times24h`` step by step (a clamp followed
+            by a crossing, steps over 24h, NaN) go through the row loop.
+        '''
+        if seconds.shape[1] < 2:
+            return seconds.copy()
+        day = 24 * 60 * 60
+        wraps = np.diff(seconds, axis=1) <= -cls._WRAP_THRESHOLD_SECONDS
+        days = np.zeros(seconds.shape)
+        days[:, 1:] = np.cumsum(wraps, axis=1) * day
+        adjusted = np.maximum.accumulate(seconds + days, axis=1)
+
+        # Replay one step of the row recurrence on the whole matrix at once
+        previous = adjusted[:, :-1]
+        current = seconds[:, 1:] + days[:, :-1]
+        gap = previous - current
+        wrapped = gap >= cls._WRAP_THRESHOLD_SECONDS
+        expected = np.where(wrapped, current + day, np.where(gap > 0, previous, current))
+        same = (expected == adjusted[:, 1:]) | (np.isnan(expected) & np.isnan(adjusted[:, 1:]))
+        consistent = ((wrapped == wraps) & same).all(axis=1)
+        for i in np.flatnonzero(~consistent):
+            adjusted[i] = cls._correct_row_times24h(seconds[i])
+        return adjusted
+
+    @classmethod
+    def _correct_row_times24h(cls, row: np.ndarray) -> np.ndarray:
+        row = row.copy()
+        for i in range(1, len(row)):
+            gap = row[i - 1] - row[i]
+            if gap > 0:
+                if gap >= cls._WRAP_THRESHOLD_SECONDS:
                     # Genuine midnight wrap: add 24h to this and every later
                     # checkpoint so the monotonic ordering is restored.
-                    row.iloc[i+1:] = [
-                        self.get_time(self.get_seconds(t, offset=False) + 24 * 60 * 60)
-                        for t in row.iloc[i+1:]
-                    ]
-                    time = row.iloc[i+1]
+                    row[i:] += 24 * 60 * 60
                 else:
                     # Tiny backward step — almost certainly an interpolation
                     # glitch. Clamp to the previous checkpoint so the +24h
                     # correction further down the row is never triggered.
-                    time = previous_time
-                    row.iloc[i+1] = previous_time
-            adjusted_row.append(time)
-            previous_time = time
-        return pd.Series(adjusted_row, index=row.index)
+                    row[i] = row[i - 1]
+        return row
+
+    @staticmethod
+    def _interpolate_rows(seconds: np.ndarray, extrapolate_end=True) -> np.ndarray:
+        '''
+            Row-wise linear interpolation between the nearest valid cells,
+            constant beyond them (pandas interpolate(method='linear',
+            axis='columns', limit_direction='both') on every row at once).
+            Without ``extrapolate_end`` cells after the last valid one stay NaN.
+        '''
+        n, width = seconds.shape
+        if not width:
+            return seconds.copy()
+        valid = ~np.isnan(seconds)
+        positions = np.broadcast_to(np.arange(width), seconds.shape)
+        previous = np.maximum.accumulate(np.where(valid, positions, -1), axis=1)
+        following = np.minimum.accumulate(np.where(valid, positions, width)[:, ::-1], axis=1)[:, ::-1]
+        low = np.clip(np.where(previous >= 0, previous, following), 0, width - 1)
+        high = np.clip(np.where(following < width, following, previous), 0, width - 1)
+        rows = np.arange(n)[:, None]
+        low_values, high_values = seconds[rows, low], seconds[rows, high]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = np.where(high > low, (high_values - low_values) / (high - low), 0)
+        filled = np.where(valid, seconds, slope * (positions - low) + low_values)
+        if not extrapolate_end:
+            filled[following == width] = np.nan
+        return filled
 
     def clean_days(self, times: pd.DataFrame, days: list[str]) -> pd.DataFrame:
-        # Not tested
-        times = times.apply(lambda x: x.map(lambda y: y[:9] if '\n' in y and len(y) > 9 else y))
-        for i, day in enumerate(days):
-            if (i + 1) == 1:
-                times = times.apply(lambda x: x.map(lambda y: y[4:9] if f'\n{day}' in y else y))\
-                             .apply(lambda x: x.map(lambda y: np.NaN if y == '.' or '.\n.' in y else
-                                                            y.replace(f'{day} ', '') + ':00'))
-            else:
-                times = times.apply(lambda x: x.map(lambda y: self.format_time_over24h(
-                    self.get_time(self.get_seconds(y.replace(f'{day} ', ''),
-                                  offset=False) + i * 24 * 3600) if str(y).startswith(f'{day}') else y)))
-        return times
+        seconds = parse_weekday_seconds(times.to_numpy(), days)
+        return pd.DataFrame(format_over24h(seconds, na=np.nan), index=times.index, columns=times.columns)
 
     def clean_times(self, interpolate='previous', axis='rows') -> pd.DataFrame:
+        seconds = self._seconds
         # Filter out DNFs (last column is NaN)
-        self.times = self.times.replace('', pd.NA)  # Some races instead of NaN, place an empty string
-        self.times = self.times[(self.times.iloc[:, -1].isna() == False)]
-        self.times = self.times.replace('nan', None)  # so ffill works
+        keep = ~np.isnan(seconds[:, -1]) if seconds.shape[1] else np.ones(len(seconds), dtype=bool)
+        seconds = seconds[keep]
+        index = self._index[keep]
 
         # Drop control points that have no timing data for any runner (e.g.
         # mut 2023). Interpolating them would invent a synthetic timestamp
@@ -91,54 +322,53 @@ class Results:
         # is to remove the column from both the times frame and the
         # control_points dict so downstream distance/elevation logic stays
         # aligned. Keep the last column since it gates DNF filtering above.
-        candidate_cols = list(self.times.columns[:-1])
-        empty_cols = [c for c in candidate_cols if self.times[c].isna().all()]
+        empty = np.isnan(seconds).all(axis=0)
+        empty[-1:] = False
+        empty_cols = list(self._columns[empty])
         if empty_cols:
-            self.times = self.times.drop(columns=empty_cols)
+            seconds = seconds[:, ~empty]
             for c in empty_cols:
                 self.control_points.pop(c, None)
+        columns = self._columns[~empty]
 
         # Capture which cells will be filled by interpolation so callers
         # (the front-end rendering code) can flag these cells as not real.
         # Snapshotting here, after the DNF filter and all-NaN column drop
         # but before any fill, gives a mask aligned to the final frame.
-        self.interpolated = self.times.isna()
+        self.interpolated = pd.DataFrame(np.isnan(seconds), index=index, columns=columns)
 
         # prevent failing for df with only one row
-        axis = 'columns' if len(self.times) == 1 else axis
-        interpolate = 'mean' if len(self.times) == 1 else interpolate
+        axis = 'columns' if len(seconds) == 1 else axis
+        interpolate = 'mean' if len(seconds) == 1 else interpolate
 
+        frame = pd.DataFrame(seconds, index=index, columns=columns)
         if interpolate == 'previous':
-            self.times = self.times.ffill(axis=axis)
+            frame = frame.ffill(axis=axis)
             if axis == 'rows':
                 # First row may still contain NaN
-                if self.times.iloc[0].isnull().any():
-                    self.times = self.times.bfill(axis=axis)
+                if frame.iloc[0].isnull().any():
+                    frame = frame.bfill(axis=axis)
             else:
-                if self.times.iloc[:, 0].isnull().any():
+                if frame.iloc[:, 0].isnull().any():
                     # First column may still contain NaN
-                    self.times = self.times.bfill(axis=axis)
+                    frame = frame.bfill(axis=axis)
         elif interpolate == 'next':
-            self.times = self.times.bfill(axis=axis)
+            frame = frame.bfill(axis=axis)
             if axis == 'rows':
                 # Last row may still contain NaN (last column cannot be NaN)
-                if self.times.iloc[-1].isnull().any():
-                    self.times = self.times.ffill(axis=axis)
+                if frame.iloc[-1].isnull().any():
+                    frame = frame.ffill(axis=axis)
         elif interpolate == 'mean':
             # Linear interpolation between the nearest valid neighbours spreads
             # consecutive NaNs proportionally. The previous (ffill+bfill)/2
             # approach gave the same midpoint to every NaN in a run, producing
             # duplicate timestamps whenever a runner missed two or more
             # consecutive checkpoints (penyagolosa 2022 'mim' iloc[616]).
-            seconds = self.times.map(
-                lambda x: self.get_seconds(x) if isinstance(x, str) else np.nan
-            )
-            seconds = seconds.interpolate(method='linear', axis=axis,
-                                          limit_direction='both')
-            self.times = seconds.map(
-                lambda x: self.get_time(self.offset + x) if pd.notna(x)
-                else str(np.nan)
-            )
+            frame = frame.interpolate(method='linear', axis=axis,
+                                      limit_direction='both')
+            # Whole seconds, as the formatted times always were
+            frame = np.floor(frame.round(6))
+        self._set_seconds(frame.to_numpy(dtype=float), index, columns)
         return self.times
 
     def get_interpolated_mask(self) -> pd.DataFrame:
@@ -170,57 +400,53 @@ class Results:
         return marked
 
     def compute_real_times(self):
-        first_cp_key, first_cp_value = list(self.control_points.items())[0]
-        # self.real_times = 
-        real_times = self.times.map(self.get_seconds)
-        real_times = real_times.sub(real_times[first_cp_key], axis=0)
-        self.real_times = real_times.map(self.get_time)
+        # Seconds since each runner's own departure (first control point)
+        first = self._column_positions()[0]
+        self._real_seconds = self._seconds - self._seconds[:, [first]]
+        self._invalidate()
         return True
 
     def get_d_h_m_s(self, time: str):
-        d = 0  # days
-        if 'day' in time:
-            days, time = time.split(", ")
-            d = int(days.split()[0])
-        if len(time.split(':')) == 2:
-            time += ':00'
-        h, m, s = map(int, time.split(':'))
-        return d, h, m, s
+        return split_time(time)
 
     def get_seconds(self, time: str, offset=True):
-        d, h, m, s = self.get_d_h_m_s(time)
         if not offset:
-            return d * 24 * 3600 + h * 3600 + m * 60 + s
-        return d * 24 * 3600 + h * 3600 + m * 60 + s - self.offset
+            return time_to_seconds(time)
+        return time_to_seconds(time) - self.offset
 
-    def get_times(self) -> pd.DataFrame:
+    def get_times(self, over24h=False) -> pd.DataFrame:
         '''
             Getter for times in hh:mm:ss since OFFICIAL departure time
+            (``over24h`` formats as HH:MM:SS with hours beyond 24)
         '''
-        numeric_times = self.times.map(lambda x: self.get_seconds(x, offset=True))
-        return numeric_times.map(self.get_time)
+        return self._format(self._seconds - self.offset, over24h)
 
-    def get_real_times(self) -> pd.DataFrame:
+    def get_real_times(self, over24h=False) -> pd.DataFrame:
         '''
             Getter for real times: in hh:mm:ss since SELF departure if waves is True
             or get_times() if False
         '''
         if self.waves:
-            return self.real_times
+            return self._format(self._real_seconds, over24h)
         else:
-            return self.get_times()
+            return self.get_times(over24h=over24h)
+
+    def _format(self, seconds: np.ndarray, over24h=False) -> pd.DataFrame:
+        return self._to_frame(format_over24h(seconds) if over24h else format_seconds(seconds))
 
-    def get_hours(self) -> pd.DataFrame:
+    def get_hours(self, over24h=False) -> pd.DataFrame:
         '''
             Getter for times in hour of the day
         '''
+        if over24h:
+            return self._format(self._seconds, over24h)
         return self.times
 
     def get_time(self, seconds: int) -> str:
         '''
             Returns formated time in string from a number of seconds
         '''
-        return str(dt.timedelta(seconds=(seconds))).split('.')[0]
+        return seconds_to_time(seconds)
 
     def get_allure(self, seconds, distance, offset=False):
         try:
@@ -271,17 +497,14 @@ class Results:
             plt.show()
 
     def get_time_deltas(self):
-        time_deltas = self.times.copy()
-        prev_point = ''
-        for point in self.control_points.keys():
-            if prev_point == '':
-                if self.control_points[point][0] > 0.0:
-                    time_deltas[point] = self.times.apply(lambda x: self.total_time_to_delta(x[point], self.get_time(self.offset)), axis=1)
-                else:
-                    time_deltas[point] = self.times.apply(lambda x: None, axis=1)
-            else:
-                time_deltas[point] = self.times.apply(lambda x: self.total_time_to_delta(x[point], x[prev_point]), axis=1)
-            prev_point = point
+        positions = self._column_positions()
+        return self._to_frame(self._time_delta_rows(slice(None)), columns=self._columns[positions])
+
+    def _time_delta_rows(self, rows) -> np.ndarray:
+        seconds = self._seconds[rows][:, self._column_positions()]
+        time_deltas = format_seconds(np.diff(seconds, axis=1, prepend=self.offset))
+        if self.control_points[next(iter(self.control_points))][0] <= 0.0:
+            time_deltas[:, 0] = None
         return time_deltas
 
     def get_distance_deltas(self) -> dict:
@@ -308,6 +531,7 @@ class Results:
         else:
             raise ValueError("offset must be departure time in 'hh:mm:ss'\
                               format or # seconds since midnight.")
+        self._invalidate()
         return True
 
     # Pace-filter thresholds.
@@ -336,165 +560,230 @@ class Results:
             the absolute floor) or inconsistent with the runner's own race
             (less than ``_PACE_RUNNER_CONSISTENCY_FACTOR`` of their own
             median pace) with NaN. Downstream ffill/bfill fills the cleared
-            cells from their neighbours.
+            cells from their neighbours. Accepts paces as seconds per km or
+            as formatted strings.
         '''
-
-        def _to_seconds(pace):
-            if pace is None or (isinstance(pace, float) and np.isnan(pace)):
-                return np.nan
-            try:
-                return self.get_seconds(pace, offset=False)
-            except (ValueError, AttributeError, TypeError):
-                return np.nan
-
-        seconds = df.map(_to_seconds)
-        if seconds.empty:
+        if df.empty:
             return df
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+            seconds = df.to_numpy(dtype=float)
+        else:
+            seconds = parse_seconds(df.to_numpy())
+        mask = self._aberrant_paces_mask(seconds)
+        if mask.any():
+            df = df.where(~mask, other=np.nan)
+        return df
 
+    def _aberrant_paces_mask(self, seconds: np.ndarray) -> np.ndarray:
         # Per-runner median across all segments. A runner with every segment
         # artefact-poisoned would have a broken median too, but in practice
         # glitches are rare outliers — one or two cells in a ~10-column row.
-        runner_median = seconds.median(axis=1, skipna=True)
+        runner_median = pd.DataFrame(seconds).median(axis=1, skipna=True).to_numpy()
         consistency_floor = runner_median * self._PACE_RUNNER_CONSISTENCY_FACTOR
         # Use the stricter of the two floors for each runner: the absolute
         # physical limit always applies; the consistency floor only bites
         # when the runner's own baseline is faster than the absolute floor.
-        per_row_floor = consistency_floor.where(
-            consistency_floor > self._PACE_ABSOLUTE_FLOOR_SECONDS_PER_KM,
-            other=self._PACE_ABSOLUTE_FLOOR_SECONDS_PER_KM,
-        )
-        mask = seconds.lt(per_row_floor, axis=0)
-        if mask.values.any():
-            df = df.where(~mask, other=np.nan)
-        return df
-
-    def get_paces(self):
-        times_paces = self.times.copy()
-        times_paces = times_paces[(times_paces.isna().any(axis=1) == False)]
+        per_row_floor = np.where(consistency_floor > self._PACE_ABSOLUTE_FLOOR_SECONDS_PER_KM,
+                                 consistency_floor, self._PACE_ABSOLUTE_FLOOR_SECONDS_PER_KM)
+        return seconds < per_row_floor[:, None]
 
-        prev_point = ''
-        for point in self.control_points.keys():
-            if prev_point == '':
-                if self.control_points[point][0] > 0.0:
-                    times_paces['__all__' + point] = times_paces[point].map(lambda x: self.get_allure(x, self.control_points[point][0], offset=True))
-                else:
-                    times_paces['__all__' + point] = times_paces[point].map(lambda x: None)
-            else:
-                times_paces['__all__' + point] = times_paces.apply(lambda x: self.get_allure(
-                    self.total_time_to_delta(x[point], x[prev_point]),
-                    self.control_points[point][0] - self.control_points[prev_point][0]), axis=1)
-            prev_point = point
-        paces = times_paces[[col for col in times_paces.columns if col.startswith('__all__')]]
-        paces.columns = [col.replace('__all__', '') for col in paces.columns]
-        paces = self._clamp_aberrant_paces(paces)
-        return paces.ffill(axis='columns').bfill(axis='columns')
+    def _pace_seconds(self, norm=False) -> pd.DataFrame:
+        '''
+            Paces in seconds per km (per effort-km, distance + D+/100, when
+            ``norm``) for every runner with complete times (every runner in
+            live mode). Whole seconds, as displayed.
+        '''
+        positions = self._column_positions()
+        if self.live:
+            rows = np.arange(len(self._index))
+        else:
+            rows = np.flatnonzero(~np.isnan(self._seconds[:, positions]).any(axis=1))
+        return pd.DataFrame(self._pace_rows(rows, norm=norm), index=self._index[rows],
+                            columns=self._columns[positions])
 
-    def get_paces_norm(self):
-        times_paces = self.times[(self.times[self.times.columns] != ':00')].copy()
-        times_paces = times_paces[(times_paces.isna().any(axis=1) == False)]
+    def _pace_rows(self, rows, norm=False) -> np.ndarray:
+        '''
+            Paces of ``rows``: segment times from one diff along the control
+            points divided by the segment lengths, clamped and gap-filled.
+        '''
+        seconds = self._seconds[rows][:, self._column_positions()]
+        deltas = np.array(list(self.get_distance_deltas().values()), dtype=float).reshape(-1, 3)
+        distance = deltas[:, 0] + deltas[:, 1] / 100 if norm else deltas[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            paces = np.diff(seconds, axis=1, prepend=self.offset) / distance
+        paces[:, distance == 0] = np.nan
+        if self.control_points[next(iter(self.control_points))][0] <= 0.0:
+            # Starting line: no segment to compute a pace on
+            paces[:, 0] = np.nan
+        paces = np.floor(np.round(paces, 6))
+
+        paces[self._aberrant_paces_mask(paces)] = np.nan
+        paces = pd.DataFrame(paces).ffill(axis='columns').bfill(axis='columns').to_numpy()
+        if self.live:
+            # No pace for the passages still to come
+            paces[np.isnan(seconds)] = np.nan
+        return paces
 
-        prev_point = ''
-        for point in self.control_points.keys():
-            if prev_point == '':
-                if self.control_points[point][0] > 0.0:
-                    times_paces['__allNorm__' + point] = times_paces[point].map(lambda x: self.get_allure_norm(x, self.control_points[point][0], self.control_points[point][1], offset=True))
-                else:
-                    times_paces['__allNorm__' + point] = times_paces[point].map(lambda x: None)
-            else:
-                times_paces['__allNorm__' + point] = times_paces.apply(lambda x: self.get_allure_norm(self.total_time_to_delta(x[point], x[prev_point]),
-                                                                                        self.control_points[point][0] - self.control_points[prev_point][0],
-                                                                                        self.control_points[point][1] - self.control_points[prev_point][1]
-                                                                                        # + self.control_points[point][2]-self.control_points[prev_point][2]
-                                                                                                      ), axis=1)
-            prev_point = point
+    def get_paces(self):
+        paces = self._cached('pace_seconds', self._pace_seconds)
+        return pd.DataFrame(format_seconds(paces.to_numpy(), na=np.nan),
+                            index=paces.index, columns=paces.columns)
 
-        paces_norm = times_paces[[col for col in times_paces.columns if col.startswith('__allNorm__')]]
-        paces_norm.columns = [col.replace('__allNorm__', '') for col in paces_norm.columns]
-        paces_norm = self._clamp_aberrant_paces(paces_norm)
-        return paces_norm.ffill(axis='columns').bfill(axis='columns')
+    def get_paces_norm(self):
+        paces_norm = self._cached('pace_seconds_norm', lambda: self._pace_seconds(norm=True))
+        return pd.DataFrame(format_seconds(paces_norm.to_numpy(), na=np.nan),
+                            index=paces_norm.index, columns=paces_norm.columns)
 
     def get_stats(self, n1=4, n2=20, paces=None):
-        if paces is None:
-            paces = self.paces
-        mean_n1 = pd.DataFrame(paces.head(n1).apply(lambda x: pd.to_timedelta(x)).mean().map(self.td_to_string)).T
-        mean_n2 = pd.DataFrame(paces.head(n2).apply(lambda x: pd.to_timedelta(x)).mean().map(self.td_to_string)).T
-        first = pd.DataFrame(paces.head(1).apply(lambda x: pd.to_timedelta(x)).min().map(self.td_to_string)).T
-        mins = pd.DataFrame(paces.apply(lambda x: pd.to_timedelta(x)).min().map(self.td_to_string)).T
-
-        index = ['mins', 'first', f'mean_{n1}', f'mean_{n2}']
-
-        means = pd.concat([mins, first, mean_n1, mean_n2], ignore_index=True)
-        means['index'] = index
-        means.set_index('index', inplace=True)
-        return means
+        return self.format_stats(self.get_pace_stats(n1=n1, n2=n2, paces=paces))
 
     def get_stats_norm(self, n1=4, n2=20):
         means = self.get_stats(n1=n1, n2=n2, paces=self.paces_norm)
         return means
 
+    def get_pace_stats(self, n1=4, n2=20, quantiles=(), norm=False, paces=None) -> pd.DataFrame:
+        '''
+            Per control point pace statistics in seconds per km: fastest
+            pace ('mins'), the winner's pace ('first'), the mean of the
+            first ``n1`` and ``n2`` runners and one 'pXX' row per quantile
+            in ``quantiles`` (e.g. (0.1, 0.5, 0.9) for percentile bands).
+            ``paces`` overrides the pace matrix (seconds or formatted).
+            Use format_stats to display the result.
+        '''
+        seconds = self._stats_input(paces, norm)
+        stats = [seconds.min(), seconds.head(1).min(),
+                 seconds.head(n1).mean(), seconds.head(n2).mean()]
+        index = ['mins', 'first', f'mean_{n1}', f'mean_{n2}']
+        if len(quantiles):
+            stats.extend(seconds.quantile(q) for q in quantiles)
+            index.extend(f'p{round(q * 100):02d}' for q in quantiles)
+        stats = pd.DataFrame(stats, columns=seconds.columns)
+        stats.index = pd.Index(index, name='index')
+        return stats
+
+    def get_objective_pace_stats(self, n=5, norm=False, paces=None) -> pd.DataFrame:
+        '''
+            The objective runner's paces ('objective') and the mean over the
+            ``n`` runners around them (f'mean_{n}'), in seconds per km.
+            ``paces`` overrides the pace matrix (seconds or formatted).
+        '''
+        seconds = self._stats_input(paces, norm)
+        stats = pd.DataFrame([seconds.iloc[self.objective], self._objective_window(seconds, n).mean()],
+                             columns=seconds.columns)
+        stats.index = pd.Index(['objective', f'mean_{n}'], name='index')
+        return stats
+
+    @staticmethod
+    def format_stats(stats: pd.DataFrame) -> pd.DataFrame:
+        '''
+            Format a frame of seconds as 'H:MM:SS' strings (hours over 24).
+        '''
+        return pd.DataFrame(format_over24h(stats.to_numpy(dtype=float), hours_width=1),
+                            index=stats.index, columns=stats.columns)
+
+    def _stats_input(self, paces=None, norm=False) -> pd.DataFrame:
+        if paces is None:
+            return self._cached('pace_seconds_norm' if norm else 'pace_seconds',
+                                lambda: self._pace_seconds(norm=norm))
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in paces.dtypes):
+            return paces.astype(float)
+        return pd.DataFrame(parse_seconds(paces.to_numpy()), index=paces.index, columns=paces.columns)
+
+    def _objective_window(self, seconds: pd.DataFrame, n=5) -> pd.DataFrame:
+        n = n - 1  # objective is already one of the n to compute mean on
+        # note: if n is impair, n-n/2 before objective and n/2 after it
+        return seconds.iloc[self.objective - (n - n // 2):self.objective + n // 2]
+
     def set_objective(self, obj=0):
         self.objective = obj
         return
 
     def get_objective_times(self):
-        return pd.DataFrame(self.times.iloc[self.objective].apply(lambda x: pd.to_timedelta(x)).map(self.td_to_string)).T
+        return self._format_objective(self._to_frame(self._seconds).iloc[self.objective])
 
     def get_objective_paces(self):
-        return pd.DataFrame(self.paces.iloc[self.objective].apply(lambda x: pd.to_timedelta(x)).map(self.td_to_string)).T
+        return self._format_objective(self._stats_input().iloc[self.objective])
 
     def get_objective_paces_norm(self):
-        return pd.DataFrame(self.paces_norm.iloc[self.objective].apply(lambda x: pd.to_timedelta(x)).map(self.td_to_string)).T
+        return self._format_objective(self._stats_input(norm=True).iloc[self.objective])
 
     def get_objective_mean_paces(self, n=5, paces=None):
-        n = n - 1  # objective is already one of the n to compute mean on
-        if paces is None:
-            paces = self.paces
-        # note: if n is impair, n-n/2 before objective and n/2 after it
-        return pd.DataFrame(paces.iloc[self.objective - (n - n // 2):self.objective + n // 2]
-                            .apply(lambda x: pd.to_timedelta(x)).mean().map(self.td_to_string)).T
+        window = self._objective_window(self._stats_input(paces), n)
+        return self._format_objective(window.mean(), name=0)
 
     def get_objective_mean_times(self, n=5):
-        return self.get_objective_mean_paces(n=n, paces=self.times)
+        return self.get_objective_mean_paces(n=n, paces=self._to_frame(self._seconds))
 
     def get_objective_mean_paces_norm(self, n=5):
-        return self.get_objective_mean_paces(n=n, paces=self.paces_norm)
+        return self.get_objective_mean_paces(n=n, paces=self._stats_input(norm=True))
+
+    def _format_objective(self, seconds: pd.Series, name=None) -> pd.DataFrame:
+        # One-row frame named after the runner (or ``name`` for aggregates)
+        return self.format_stats(pd.DataFrame([seconds], index=[seconds.name if name is None else name]))
 
     def get_closest_time_to_objective(self, time):
-        # Compute absolute difference between each element in the DataFrame and X
-        time = self.get_seconds(time, offset=False)
-        closest_index = None
-        min_diff = float('inf')  # Initialize with infinity
-        # Iterate over each row in the DataFrame
-        for index, row in self.times.iterrows():
-            # Compute absolute difference between each element in the row and X
-            diff = abs(self.get_seconds(row.iloc[-1]) - time)
-            # Check if this row has the minimum difference seen so far
-            if diff < min_diff:
-                min_diff = diff
-                closest_index = index
+        '''
+            Index label of the runner whose finish time is closest to
+            ``time`` (hh:mm:ss since departure). That runner becomes the
+            objective.
+        '''
+        closest_index = self.get_closest_times_to_objectives([time])[0]
         self.objective = int(closest_index)
 
         return closest_index
 
+    def get_closest_times_to_objectives(self, times) -> list:
+        '''
+            Batch version of get_closest_time_to_objective: index labels of
+            the closest finishers for each of ``times`` (hh:mm:ss strings or
+            seconds since departure), without changing the objective. Ties
+            go to the runner listed first.
+        '''
+        targets = np.asarray(times, dtype=object)
+        if targets.size and isinstance(targets.flat[0], str):
+            targets = parse_seconds(targets)
+        targets = targets.astype(float)
+
+        finish, order = self._finish_order
+        if len(finish) == 0:
+            return [None] * len(targets)
+        right = np.clip(np.searchsorted(finish, targets, side='left'), 0, len(finish) - 1)
+        left = np.clip(right - 1, 0, len(finish) - 1)
+        # Of several runners sharing a finish time, the first listed wins
+        left = np.searchsorted(finish, finish[left], side='left')
+        left_gap = np.abs(targets - finish[left])
+        right_gap = np.abs(finish[right] - targets)
+        closest = np.where((right_gap < left_gap) |
+                           ((right_gap == left_gap) & (order[right] < order[left])),
+                           order[right], order[left])
+        return list(self._index[closest])
+
+    @property
+    def _finish_order(self) -> tuple[np.ndarray, np.ndarray]:
+        '''
+            Finish times since departure sorted ascending, and the row of each.
+        '''
+        def compute():
+            finish = self._seconds[:, -1] - self.offset
+            rows = np.flatnonzero(~np.isnan(finish))
+            order = rows[np.argsort(finish[rows], kind='stable')]
+            return finish[order], order
+        return self._cached('finish_order', compute)
+
     def format_time_over24h(self, td) -> str:
         '''
         Function to format timedelta to string in hours instead of default 1 day, ...
         '''
-        total_seconds = self.get_seconds(td, offset=False)
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+        return seconds_to_time_over24h(time_to_seconds(td))
 
     def format_hourtime_over24h(self, td) -> str:
         '''
         Function to format timedelta to string in hour of the day
         indicating if days have passed with (+1)
         '''
-        d, h, m, s = self.get_d_h_m_s(td)
-        total_seconds = self.get_seconds(td, offset=False) % (24 * 3600)
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
+        d = split_time(td)[0]
+        hour = seconds_to_time_over24h(time_to_seconds(td) % (24 * 3600))
         if d > 0:
-            return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02} (+{d})"
-        return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+            return f"{hour} (+{d})"
+        return hour
 
@@ -0,0 +1,154 @@
+'''
+    Time parsing and formatting shared by Results, the AI features and the
+    LiveTrail loaders.
+
+    Array functions take any array-like of strings or seconds and return
+    NumPy arrays of the same shape (NaN where a value does not parse).
+    Scalar functions are fast paths for single values and raise ValueError
+    on input they cannot parse.
+'''
+import re
+import math
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+DAY = 24 * 3600
+
+# "[N day(s), ]H:MM[:SS][.fff]" as produced by str(timedelta) and LiveTrail,
+# hours may go beyond 24 ('26:52:00').
+TIME_PATTERN = r'^\s*(?:(-?\d+) days?, )?(-?\d+):(\d+)(?::(\d+))?(?:\.\d*)?\s*$'
+_TIME_RE = re.compile(TIME_PATTERN)
+
+# Weekday abbreviations (in French) LiveTrail prefixes passages with, Monday first.
+WEEKDAYS = ['Lu.', 'Ma.', 'Me.', 'Je.', 'Ve.', 'Sa.', 'Di.']
+
+# "[Dd.][ \n]HH:MM[:SS]", first passage only (cells may hold "Sa. 01:35\nSa.01:37").
+WEEKDAY_TIME_PATTERN = r'^\s*(?:([A-Z][a-z]\.)\s*)?(\d+):(\d+)(?::(\d+))?'
+
+
+def split_time(time: str) -> tuple[int, int, int, int]:
+    '''
+        Split '[N day(s), ]H:MM[:SS]' into (days, hours, minutes, seconds).
+    '''
+    match = _TIME_RE.match(time) if isinstance(time, str) else None
+    if match is None:
+        raise ValueError(f"time must be in '[N days, ]hh:mm[:ss]' format, got {time!r}")
+    d, h, m, s = match.groups()
+    return int(d or 0), int(h), int(m), int(s or 0)
+
+
+def time_to_seconds(time: str) -> int:
+    '''
+        Seconds in '[N day(s), ]H:MM[:SS]' (hours may go beyond 24).
+    '''
+    d, h, m, s = split_time(time)
+    return d * DAY + h * 3600 + m * 60 + s
+
+
+def seconds_to_time(seconds: float) -> str:
+    '''
+        str(timedelta(seconds=seconds)).split('.')[0], e.g. '1 day, 1:36:42'.
+    '''
+    return str(dt.timedelta(seconds=seconds)).split('.')[0]
+
+
+def seconds_to_time_over24h(seconds: float, hours_width=2) -> str:
+    '''
+        'HH:MM:SS' with hours beyond 24, e.g. '25:36:42'.
+    '''
+    hours, remainder = divmod(math.floor(round(seconds, 6)), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f'{hours:0{hours_width}}:{minutes:02}:{seconds:02}'
+
+
+def parse_seconds(values) -> np.ndarray:
+    '''
+        Parse an array-like of time strings into float seconds in one pass.
+        Anything that is not a parseable time ('', 'nan', None, NaN) is NaN.
+    '''
+    values = np.asarray(values, dtype=object)
+    parts = pd.Series(values.ravel(), dtype=object).str.extract(TIME_PATTERN).astype(float)
+    seconds = (parts[0].fillna(0) * DAY + parts[1] * 3600 + parts[2] * 60
+               + parts[3].fillna(0)).to_numpy()
+    return seconds.reshape(values.shape)
+
+
+def weekday_order(start_day=7) -> list[str]:
+    '''
+        Weekday abbreviations starting at ``start_day`` (1 Monday ... 7 Sunday).
+    '''
+    return [WEEKDAYS[(start_day - 1 + j) % len(WEEKDAYS)] for j in range(len(WEEKDAYS))]
+
+
+def parse_weekday_seconds(values, days: list[str]) -> np.ndarray:
+    '''
+        Parse weekday-prefixed passages ('Sa. 01:36', 'Sa.\\n08:12:44') into
+        elapsed seconds in one pass: the i-th day of ``days`` adds i * 24h,
+        times without a weekday count as the first day. Cells that do not
+        parse, or whose weekday is not in ``days``, are NaN.
+    '''
+    values = np.asarray(values, dtype=object)
+    parts = pd.Series(values.ravel(), dtype=object).str.extract(WEEKDAY_TIME_PATTERN)
+    day_index = parts[0].map({day: i for i, day in enumerate(days)}).astype(float)
+    day_index[parts[0].isna()] = 0
+    clock = parts[[1, 2, 3]].astype(float)
+    seconds = (day_index * DAY + clock[1] * 3600 + clock[2] * 60 + clock[3].fillna(0)).to_numpy()
+    return seconds.reshape(values.shape)
+
+
+def elapsed_clock_seconds(clock, start=0) -> np.ndarray:
+    '''
+        Elapsed seconds since ``start`` of chronologically ordered clock
+        times (seconds of the day), adding 24h every time the clock goes
+        back, e.g. a finish order crossing midnights. NaN entries are
+        skipped and stay NaN.
+    '''
+    clock = np.asarray(clock, dtype=float)
+    valid = ~np.isnan(clock)
+    elapsed = np.full(clock.shape, np.nan)
+    elapsed[valid] = np.cumsum(np.diff(clock[valid], prepend=start) % DAY)
+    return elapsed
+
+
+def split_seconds(values) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Floor float seconds the way str(timedelta) truncates microseconds.
+        Returns the integer seconds of valid cells and the validity mask.
+    '''
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    return np.floor(np.round(values[valid], 6)).astype(np.int64), valid
+
+
+def format_seconds(values, na=str(np.nan)) -> np.ndarray:
+    '''
+        Vectorized str(timedelta(seconds=x)).split('.')[0], e.g. '1:36:42',
+        '1 day, 1:36:42' or '-1 day, 23:30:00'. NaN cells become ``na``.
+    '''
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, na, dtype=object)
+    seconds, valid = split_seconds(values)
+    days, rem = np.divmod(seconds, DAY)
+    hours, rem = np.divmod(rem, 3600)
+    minutes, secs = np.divmod(rem, 60)
+    out[valid] = [f'{h}:{m:02d}:{s:02d}' if d == 0 else
+                  f'{d} day{"" if abs(d) == 1 else "s"}, {h}:{m:02d}:{s:02d}'
+                  for d, h, m, s in zip(days.tolist(), hours.tolist(),
+                                        minutes.tolist(), secs.tolist())]
+    return out
+
+
+def format_over24h(values, na=str(np.nan), hours_width=2) -> np.ndarray:
+    '''
+        'HH:MM:SS' with hours beyond 24 (``hours_width=1`` gives 'H:MM:SS').
+        NaN cells become ``na``.
+    '''
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, na, dtype=object)
+    seconds, valid = split_seconds(values)
+    hours, rem = np.divmod(seconds, 3600)
+    minutes, secs = np.divmod(rem, 60)
+    out[valid] = [f'{h:0{hours_width}}:{m:02}:{s:02}'
+                  for h, m, s in zip(hours.tolist(), minutes.tolist(), secs.tolist())]
+    return out
@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import datetime as dt
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DAY = 24 * 3600
+
+# (pattern searched in "METHOD url body", TTL in seconds), first match wins.
+# None means the entry never expires.
+ENDPOINT_TTLS = [
+    (r'mode=dispAllEvents', DAY),   # event list (homeFunctions.php)
+    (r'mode=dispEventPass', DAY),   # past editions (eventFunctions.php)
+]
+DEFAULT_TTL = 3600
+
+# Seconds a connection waits for the cache database to be unlocked
+TIMEOUT = 60
+
+# Archived pages: livetrail.net/histo/{event}_{year}/... or /histo/{event}{year}/...
+_HISTO_RE = re.compile(r'/histo/[^/]*?(\d{4})/')
+# Tags of the XML documents the scraper reads (passages.php races and
+# results, parcours.php, coureur.php): LiveTrail answers missing pages with
+# a 200 HTML page, which must not be kept forever
+_DOCUMENT_RE = re.compile(rb'<(?:courses|fiches|fiche|points|identite)[\s/>]')
+
+
+@contextmanager
+def _connect(path: str):
+    '''
+        Connection to the cache database, committed and closed on exit.
+    '''
+    with closing(sqlite3.connect(path, timeout=TIMEOUT)) as conn, conn:
+        yield conn
+
+
+@dataclass
+class CacheEntry:
+    response: requests.Response
+    fresh: bool
+    validators: dict
+
+
+class ResponseCache:
+    '''
+        On-disk HTTP response cache for LiveTrailScraper, stored in a SQLite
+        table and keyed by the SHA-256 of method, URL and POST body. Bodies
+        are zlib-compressed.
+
+        Pages archived under ``histo/`` for a past year never change and
+        are kept forever when they hold an XML document of LiveTrail (not an
+        error page), other entries expire after their ENDPOINT_TTLS
+        (DEFAULT_TTL otherwise). Expired entries are revalidated with the
+        ETag/Last-Modified the server sent. With ``cache_only`` no request
+        is made: stale entries are served as is and misses get a 504.
+    '''
+    def __init__(self, path: str, cache_only=False) -> None:
+        self.path = path
+        self.cache_only = cache_only
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _connect(self.path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    method TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    headers TEXT NOT NULL,
+                    encoding TEXT,
+                    content BLOB NOT NULL,
+                    stored_at REAL NOT NULL
+                )''')
+
+    @staticmethod
+    def _body(data) -> str:
+        if data is None:
+            return ''
+        if isinstance(data, dict):
+            return urlencode(sorted(data.items()))
+        return data.decode() if isinstance(data, bytes) else str(data)
+
+    @classmethod
+    def key(cls, method: str, url: str, data=None) -> str:
+        return hashlib.sha256('\n'.join([method.upper(), url, cls._body(data)]).encode()).hexdigest()
+
+    @classmethod
+    def ttl(cls, method: str, url: str, data=None, content: bytes = b'') -> float | None:
+        '''
+            Seconds an entry with body ``content`` stays fresh, None if it
+            never expires.
+        '''
+        histo = _HISTO_RE.search(url)
+        if histo and int(histo.group(1)) < dt.date.today().year and _DOCUMENT_RE.search(content):
+            return None
+        request = f'{method.upper()} {url} {cls._body(data)}'
+        for pattern, ttl in ENDPOINT_TTLS:
+            if re.search(pattern, request):
+                return ttl
+        return DEFAULT_TTL
+
+    def get(self, method: str, url: str, data=None) -> CacheEntry | None:
+        with _connect(self.path) as conn:
+            row = conn.execute('SELECT headers, encoding, content, stored_at FROM responses WHERE key = ?',
+                               (self.key(method, url, data),)).fetchone()
+        if row is None:
+            return None
+        headers, encoding, content, stored_at = row
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = zlib.decompress(content)
+        ttl = self.ttl(method, url, data, response.content)
+        validators = {}
+        if 'ETag' in response.headers:
+            validators['If-None-Match'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            validators['If-Modified-Since'] = response.headers['Last-Modified']
+        return CacheEntry(response, ttl is None or time.time() - stored_at < ttl, validators)
+
+    def put(self, method: str, url: str, data, response: requests.Response) -> None:
+        '''
+            Store a 200 response (other statuses are not cached).
+        '''
+        if response.status_code != 200:
+            return
+        with _connect(self.path) as conn:
+            conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (self.key(method, url, data), method.upper(), url, self._body(data),
+                          json.dumps(dict(response.headers)), response.encoding,
+                          zlib.compress(response.content), time.time()))
+
+    def touch(self, method: str, url: str, data=None) -> None:
+        '''
+            Mark an entry as fresh again (the server answered 304).
+        '''
+        with _connect(self.path) as conn:
+            conn.execute('UPDATE responses SET stored_at = ? WHERE key = ?',
+                         (time.time(), self.key(method, url, data)))
+
+    @staticmethod
+    def miss(url: str) -> requests.Response:
+        '''
+            Response returned in cache-only mode for requests not cached.
+        '''
+        response = requests.Response()
+        response.status_code = 504
+        response.reason = 'Not cached'
+        response.url = url
+        response._content = b''
+        return response
+
+
+class TemplateMap:
+    '''
+        URL template (LiveTrailScraper.base_url or base_url2) that answered
+        for each event-year, persisted in the cache database when ``path``
+        is given. Years not seen yet get the template of the closest known
+        year of the event, since LiveTrail changed its URLs at some point in
+        each event's history.
+    '''
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path
+        self._templates = {}  # {event: {year: template}}
+        self._lock = threading.Lock()
+        if self.path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with _connect(self.path) as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS url_templates (
+                        event TEXT NOT NULL,
+                        year TEXT NOT NULL,
+                        template TEXT NOT NULL,
+                        PRIMARY KEY (event, year)
+                    )''')
+                rows = conn.execute('SELECT event, year, template FROM url_templates').fetchall()
+            for event, year, template in rows:
+                self._templates.setdefault(event, {})[year] = template
+
+    def get(self, event: str, year: str) -> str | None:
+        with self._lock:
+            years = self._templates.get(event)
+            if not years:
+                return None
+            if year in years:
+                return years[year]
+            closest = min(years, key=lambda y: (abs(int(y) - int(year)), y))
+            return years[closest]
+
+    def set(self, event: str, year: str, template: str) -> None:
+        with self._lock:
+            if self._templates.get(event, {}).get(year) == template:
+                return
+            self._templates.setdefault(event, {})[year] = template
+        if self.path:
+            with _connect(self.path) as conn:
+                conn.execute('INSERT OR REPLACE INTO url_templates VALUES (?, ?, ?)', (event, year, template))
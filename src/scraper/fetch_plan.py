@@ -0,0 +1,153 @@
+import os
+import logging
+from collections import Counter
+import pandas as pd
+from scraper.scraper import LiveTrailScraper
+from scraper import storage
+from scraper.manifest import DownloadManifest
+
+logger = logging.getLogger(__name__)
+
+
+class EventFetchPlan:
+    '''
+        Everything the loader needs from LiveTrail for one event-year, each
+        resource fetched at most once: parcours.php (control points and
+        physical details), passages.php (races list, then one POST per race
+        for its results, saved as CSV) and coureur.php (race info).
+
+        Parsed results are memoized and shared by every consumer, where the
+        scraper's get_* methods refetch what they need on every call.
+        ``request_counts`` counts the requests sent per method and page.
+    '''
+    def __init__(self, scraper: LiveTrailScraper, event: str, year: str, data_path=None) -> None:
+        self.scraper = scraper
+        self.event = event
+        self.year = year
+        self.data_path = data_path if data_path else os.path.join(scraper.data_path, 'csv')
+        self.request_counts = Counter()
+        # Old events are under base_url2, the template that answered is tried first
+        self._templates = scraper._url_templates(event, year)
+        self._memo = {}
+        self._results = {}
+        self._race_infos = {}
+        try:
+            scraper._check_event_year(event, year)
+            self.valid = True
+        except ValueError as e:
+            logger.warning("%s", e)
+            self.valid = False
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.request_counts.values())
+
+    def _fetch(self, page: str, method='GET', data=None):
+        '''
+            Response to ``page`` of the event-year from the first URL template
+            answering 200, None if none does.
+        '''
+        if not self.valid:
+            return None
+        for template in list(self._templates):
+            url = template.replace("{event}", self.event).replace("{year}", self.year) + f"/{page}"
+            self.request_counts[f"{method} {page.split('?')[0]}"] += 1
+            response = self.scraper._request(method, url, data=data)
+            if response.status_code == 200:
+                self._templates.remove(template)
+                self._templates.insert(0, template)
+                self.scraper.template_map.set(self.event, self.year, template)
+                return response
+            logger.warning("Failed to retrieve %s for %s %s. Status code: %s",
+                           page, self.event, self.year, response.status_code)
+        return None
+
+    def control_points(self) -> tuple[dict, dict]:
+        '''
+            (control_points, control_points_names) as returned by
+            LiveTrailScraper.get_control_points, empty if unavailable.
+        '''
+        if 'control_points' not in self._memo:
+            response = self._fetch('parcours.php')
+            self._memo['control_points'] = (self.scraper._parse_control_points(response.content)
+                                            if response is not None else ({}, {}))
+        return self._memo['control_points']
+
+    def races(self) -> dict | None:
+        '''
+            {race: name} of the event-year, None if unavailable.
+        '''
+        if 'races' not in self._memo:
+            response = self._fetch('passages.php')
+            self._memo['races'] = self.scraper._parse_races(response.content) if response is not None else None
+        return self._memo['races']
+
+    def results(self, race: str) -> pd.DataFrame | None:
+        '''
+            Results table of ``race``, read from its CSV (or event-year
+            store) when already downloaded, otherwise downloaded, saved in
+            the scraper's results format and recorded in the manifest. None
+            if unavailable.
+        '''
+        if race not in self._results:
+            file_path = storage.results_path(self.data_path, self.event, race, self.year)
+            if storage.has_results(file_path):
+                df = storage.read_results(file_path)
+            else:
+                data = {
+                    'course': race,
+                    'cat': 'scratch',
+                    'from': '1',
+                    'to': '1000000'  # To get all results
+                }
+                response = self._fetch('passages.php', 'POST', data=data)
+                df = None
+                if response is not None:
+                    df = self.scraper._parse_table(response.content)
+                    DownloadManifest(self.data_path).record(file_path, response.url, response, df)
+                    storage.save_results(file_path, df, self.scraper.results_format)
+            self._results[race] = df
+        return self._results[race]
+
+    def download(self) -> int:
+        '''
+            Download the results of every race. Returns the number of races
+            whose results are unavailable.
+        '''
+        return sum(self.results(race) is None for race in self.races() or {})
+
+    def random_runner_bibs(self) -> dict:
+        '''
+            {race: bib} of a finisher of each race (as
+            LiveTrailScraper.get_random_runner_bib), None for empty races.
+        '''
+        bibs = {}
+        for race in self.races() or {}:
+            df = self.results(race)
+            bibs[race] = df.sort_index().iloc[0]['doss'] if df is not None and not df.empty else None
+        return bibs
+
+    def physical_details(self) -> dict:
+        '''
+            {race: {'distance', 'elevation_pos', 'elevation_neg'}} from the
+            last control point of each race.
+        '''
+        cps, _ = self.control_points()
+        details = {}
+        for race, points in cps.items():
+            if not points:
+                continue
+            distance, elevation_pos, elevation_neg = next(reversed(points.values()))
+            details[race] = {'distance': distance, 'elevation_pos': elevation_pos,
+                             'elevation_neg': elevation_neg}
+        return details
+
+    def race_info(self, bib_n) -> dict:
+        '''
+            Departure info read from runner ``bib_n``'s page (as
+            LiveTrailScraper.get_race_info), empty if unavailable.
+        '''
+        if bib_n not in self._race_infos:
+            response = self._fetch(f'coureur.php?rech={bib_n}')
+            self._race_infos[bib_n] = self.scraper._parse_race_info(response.content) if response is not None else {}
+        return self._race_infos[bib_n]
@@ -0,0 +1,128 @@
+import os
+import time
+import hashlib
+import sqlite3
+from contextlib import closing, contextmanager
+import pandas as pd
+import requests
+
+# Columns before the control points in a results table
+FIXED_COLUMNS = 5
+
+
+def results_name(file_path: str) -> str:
+    '''
+        Name of a race's results in the DB (races.results_filepath) from
+        its CSV path, e.g. 'csv/utmb/utmb_CCC_2023.csv'.
+    '''
+    folder_path, file = os.path.split(file_path)
+    return f'csv/{os.path.basename(folder_path)}/{file}'
+
+
+def summarize(df: pd.DataFrame) -> dict:
+    '''
+        SHA-256 of the table (as CSV), number of rows, furthest control
+        point with a passage and number of passages there.
+    '''
+    reached = [c for c in df.columns[FIXED_COLUMNS:] if df[c].notna().any()]
+    return {
+        'hash': hashlib.sha256(df.to_csv(index=False).encode()).hexdigest(),
+        'rows': len(df),
+        'last_cp': str(reached[-1]) if reached else None,
+        'last_cp_passages': int(df[reached[-1]].notna().sum()) if reached else 0,
+    }
+
+
+class DownloadManifest:
+    '''
+        Every results table downloaded into ``data_path``, recorded in its
+        manifest.db: URL, fetch time, response size, hash of the parsed
+        table, number of rows and last control point reached.
+
+        ``record`` tells whether a (re)downloaded table changed, so
+        unchanged races are not rewritten. The DB loaders ``mark_loaded``
+        the version of each race they load and skip the races ``loaded``
+        returns: only new or changed races are reloaded.
+    '''
+    FILENAME = 'manifest.db'
+
+    def __init__(self, data_path: str) -> None:
+        self.path = os.path.join(data_path, self.FILENAME)
+        os.makedirs(data_path, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS downloads (
+                    name TEXT PRIMARY KEY,
+                    url TEXT,
+                    fetched_at REAL NOT NULL,
+                    changed_at REAL NOT NULL,
+                    size INTEGER,
+                    hash TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    last_cp TEXT,
+                    last_cp_passages INTEGER NOT NULL
+                )''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS loads (
+                    name TEXT NOT NULL,
+                    loader TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    loaded_at REAL NOT NULL,
+                    PRIMARY KEY (name, loader)
+                )''')
+
+    @contextmanager
+    def _connect(self):
+        '''
+            Connection to manifest.db, committed and closed on exit.
+        '''
+        with closing(sqlite3.connect(self.path, timeout=3600)) as conn, conn:
+            conn.row_factory = sqlite3.Row
+            yield conn
+
+    def get(self, file_path: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM downloads WHERE name = ?', (results_name(file_path),)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, file_path: str, url: str, response: requests.Response | None, df: pd.DataFrame) -> bool:
+        '''
+            Record the download of ``df``, the results saved as
+            ``file_path``. Returns False if the table is unchanged since
+            the last download.
+        '''
+        summary = summarize(df)
+        now = time.time()
+        size = len(response.content) if response is not None else None
+        previous = self.get(file_path)
+        changed = previous is None or previous['hash'] != summary['hash']
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO downloads
+                    (name, url, fetched_at, changed_at, size, hash, rows, last_cp, last_cp_passages)
+                VALUES (:name, :url, :fetched_at, :changed_at, :size, :hash, :rows, :last_cp, :last_cp_passages)
+                ''', {'name': results_name(file_path), 'url': url, 'fetched_at': now,
+                      'changed_at': now if changed else previous['changed_at'], 'size': size, **summary})
+        return changed
+
+    def loaded(self, loader: str) -> set[str]:
+        '''
+            Names of the races ``loader`` loaded in their current version.
+        '''
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT d.name FROM downloads d
+                JOIN loads l ON l.name = d.name AND l.loader = ? AND l.hash = d.hash
+                ''', (loader,)).fetchall()
+        return {row['name'] for row in rows}
+
+    def mark_loaded(self, loader: str, names: list[str]) -> None:
+        '''
+            Record that ``loader`` loaded the current version of ``names``
+            (races.results_filepath), races not downloaded are ignored.
+        '''
+        with self._connect() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO loads (name, loader, hash, loaded_at)
+                SELECT name, ?, hash, ? FROM downloads WHERE name = ?
+                ''', [(loader, time.time(), name) for name in names])
@@ -0,0 +1,99 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import numpy as np
+
+# Logical endpoint of a page, from the last part of its URL path
+ENDPOINTS = {
+    'homeFunctions.php': 'events',
+    'eventFunctions.php': 'event_years',
+    'parcours.php': 'parcours',
+    'coureur.php': 'coureur',
+}
+PERCENTILES = (50, 90, 99)
+
+
+def endpoint(method: str, url: str) -> str:
+    '''
+        Logical endpoint of a request, e.g. 'passages POST' for a race's
+        results or 'events' for the event list.
+    '''
+    page = urlparse(url).path.rsplit('/', 1)[-1]
+    if page == 'passages.php':
+        return f'passages {method.upper()}'
+    return ENDPOINTS.get(page, page)
+
+
+class ScraperMetrics:
+    '''
+        Thread-safe counters of a LiveTrailScraper's requests per logical
+        endpoint (see ``endpoint``): requests sent and their latency,
+        response bytes, retries and backoff sleep, time spent waiting for
+        the rate limiter, cache hits (fresh, revalidated by a 304 or missed
+        in cache-only mode) and parse time. ``to_dict`` summarizes them
+        with latency percentiles and ``dump`` writes that summary as JSON.
+    '''
+    COUNTERS = ('requests', 'errors', 'bytes', 'retries', 'backoff_seconds', 'throttle_seconds',
+                'cache_hits', 'cache_revalidated', 'cache_misses', 'parses', 'parse_seconds')
+
+    def __init__(self) -> None:
+        self._counters = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def add(self, endpoint: str, **counts) -> None:
+        '''
+            Add ``counts`` (keys of COUNTERS) to the counters of ``endpoint``.
+        '''
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, dict.fromkeys(self.COUNTERS, 0))
+            for name, value in counts.items():
+                counters[name] += value
+
+    def record_request(self, endpoint: str, seconds: float, nbytes: int, error=False) -> None:
+        self.add(endpoint, requests=1, bytes=nbytes, errors=int(error))
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+
+    @contextmanager
+    def parse(self, endpoint: str):
+        '''
+            Time the parsing of an ``endpoint`` response.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(endpoint, parses=1, parse_seconds=time.perf_counter() - start)
+
+    def to_dict(self) -> dict:
+        '''
+            {endpoint: counters and latency percentiles in seconds}.
+        '''
+        with self._lock:
+            counters = {e: dict(c) for e, c in self._counters.items()}
+            latencies = {e: list(values) for e, values in self._latencies.items()}
+        summary = {}
+        for name, values in sorted(counters.items()):
+            latency = latencies.get(name)
+            if latency:
+                values['latency_mean'] = float(np.mean(latency))
+                for p, value in zip(PERCENTILES, np.percentile(latency, PERCENTILES)):
+                    values[f'latency_p{p}'] = float(value)
+                values['latency_max'] = float(np.max(latency))
+            summary[name] = values
+        return summary
+
+    def dump(self, path: str, **extra) -> dict:
+        '''
+            Write the summary, the run's duration and ``extra`` entries as
+            JSON to ``path``. Returns what was written.
+        '''
+        report = {'started': self.started, 'duration_seconds': time.time() - self.started,
+                  **extra, 'endpoints': self.to_dict()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
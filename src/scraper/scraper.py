@@ -1,15 +1,28 @@
+import io
 import os
+import re
+import copy
+import functools
 import json
 import time
 import random
 import logging
+import threading
 import warnings
 import requests
+import numpy as np
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 import pandas as pd
 from bs4 import BeautifulSoup
 from bs4 import GuessedAtParserWarning
 from bs4 import XMLParsedAsHTMLWarning
 from config import get_config
+from scraper.cache import ResponseCache, TemplateMap
+from scraper import storage
+from scraper.manifest import DownloadManifest
+from scraper.metrics import ScraperMetrics, endpoint
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +34,115 @@ warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
 warnings.filterwarnings("ignore", category=UserWarning, module='bs4')
 
 
+# Decoded text given to the parsers: its encoding declaration no longer holds.
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml\s[^>]*\?>')
+# Rows the passages table columns grow by (doubling past it).
+_TABLE_CHUNK = 1024
+
+
+class RateLimiter:
+    '''
+        Thread-safe token bucket: ``rate`` requests per second on average,
+        at most ``burst`` back to back. Callers reserve a token under the
+        lock and sleep outside of it, so concurrent callers are served in
+        arrival order without holding each other up.
+
+        The rate adapts (AIMD) between ``min_rate`` and ``max_rate`` when
+        callers ``record`` how requests went: ``increase`` is added after
+        each healthy response and the rate is multiplied by ``decrease``
+        after a throttled or failed one. Without bounds the rate is fixed.
+    '''
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = None, max_rate: float = None,
+                 increase: float = 0.0, decrease: float = 1.0) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1.")
+        self.min_rate = rate if min_rate is None else min_rate
+        self.max_rate = rate if max_rate is None else max_rate
+        if not 0 < self.min_rate <= self.max_rate:
+            raise ValueError("min_rate must be positive and at most max_rate.")
+        if increase < 0 or not 0 < decrease <= 1:
+            raise ValueError("increase must be positive and decrease in ]0, 1].")
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        '''
+            Take one token, sleeping until it is available.
+            Returns the seconds waited.
+        '''
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(self, healthy: bool) -> float:
+        '''
+            Additive increase of the rate after a healthy response,
+            multiplicative decrease otherwise. Returns the new rate.
+        '''
+        with self._lock:
+            # tokens earned so far are counted at the previous rate
+            self._refill()
+            if healthy:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            return self.rate
+
+
+def _timed_parse(name: str):
+    '''
+        Record the parse time of ``name`` responses in the scraper's metrics.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return func(self, *args, **kwargs)
+            with self.metrics.parse(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class LiveTrailScraper:
     base_url: str = "https://livetrail.net/histo/{event}_{year}"
     base_url2: str = "https://livetrail.net/histo/{event}{year}"
     data_path = get_config().data_dir_path
 
     _MAX_RETRIES = 3
-    _BASE_DELAY = 1.0   # min seconds between requests
-    _MAX_DELAY = 3.0     # max seconds between requests
+    _RATE = 0.5          # initial requests per second per host, adapted within the
+                         # AppConfig scraper_min_rate/scraper_max_rate bounds
+    _BURST = 1           # requests allowed back to back
     _BACKOFF_BASE = 2.0  # exponential backoff base (2s, 4s, 8s)
 
+    # One limiter per host, shared by every scraper (and thread) of the process
+    _limiters: dict[str, RateLimiter] = {}
+    _limiters_lock = threading.Lock()
+    # Requests and parsing per endpoint, shared by the copies of a scraper
+    metrics: ScraperMetrics | None = None
+
     def __init__(self, events: list[str] = [], years: list[str] = [],
-                 race: str = 'all') -> None:
+                 race: str = 'all', cache: ResponseCache | None = None) -> None:
+        if cache is None and get_config().scraper_cache_path:
+            cache = ResponseCache(get_config().scraper_cache_path, cache_only=get_config().scraper_cache_only)
+        self.cache = cache
+        self.metrics = ScraperMetrics()
+        self.template_map = TemplateMap(cache.path if cache is not None else None)
+        self.results_format = get_config().results_format
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
@@ -45,32 +155,131 @@ class LiveTrailScraper:
         self.years = years
         self.race = race
 
+    @classmethod
+    def _limiter(cls, url) -> RateLimiter:
+        host = urlparse(url).netloc
+        with cls._limiters_lock:
+            if host not in cls._limiters:
+                cfg = get_config()
+                cls._limiters[host] = RateLimiter(cls._RATE, cls._BURST, min_rate=cfg.scraper_min_rate,
+                                                  max_rate=cfg.scraper_max_rate, increase=cfg.scraper_rate_increase,
+                                                  decrease=cfg.scraper_rate_decrease)
+            return cls._limiters[host]
+
+    @classmethod
+    def request_rates(cls) -> dict[str, float]:
+        '''
+            Current pace (requests per second) of each host.
+        '''
+        with cls._limiters_lock:
+            return {host: limiter.rate for host, limiter in cls._limiters.items()}
+
     def _request(self, method, url, **kwargs):
+        '''
+            Request through the response cache (when enabled): fresh entries
+            are served without a request, stale ones are revalidated with
+            their ETag/Last-Modified.
+        '''
+        if self.cache is None:
+            return self._send(method, url, **kwargs)
+        data = kwargs.get('data')
+        entry = self.cache.get(method, url, data)
+        if entry is not None and (entry.fresh or self.cache.cache_only):
+            self._count(method, url, cache_hits=1)
+            return entry.response
+        if self.cache.cache_only:
+            self._count(method, url, cache_misses=1)
+            return self.cache.miss(url)
+        if entry is not None and entry.validators:
+            kwargs['headers'] = {**entry.validators, **kwargs.get('headers', {})}
+        response = self._send(method, url, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self._count(method, url, cache_revalidated=1)
+            self.cache.touch(method, url, data)
+            return entry.response
+        self.cache.put(method, url, data, response)
+        return response
+
+    def _count(self, method, url, **counts) -> None:
+        if self.metrics is not None:
+            self.metrics.add(endpoint(method, url), **counts)
+
+    def _send(self, method, url, **kwargs):
         kwargs.setdefault('timeout', 20)
+        limiter = self._limiter(url)
         for attempt in range(self._MAX_RETRIES + 1):
-            # Polite delay before each request
-            delay = random.uniform(self._BASE_DELAY, self._MAX_DELAY)
-            time.sleep(delay)
+            # Polite delay before each request (retries included)
+            self._count(method, url, throttle_seconds=limiter.acquire())
+            start = time.perf_counter()
             try:
                 response = self.session.request(method, url, **kwargs)
-                if response.status_code == 429 or response.status_code >= 500:
+                if self.metrics is not None:
+                    self.metrics.record_request(endpoint(method, url), time.perf_counter() - start,
+                                                len(response.content or b''))
+                throttled = response.status_code == 429 or response.status_code >= 500
+                rate = limiter.record(not throttled)
+                if throttled:
+                    logger.debug("Pace for %s lowered to %.2f req/s", urlparse(url).netloc, rate)
                     if attempt < self._MAX_RETRIES:
                         backoff = self._BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 1)
                         logger.warning("HTTP %s from %s — retrying in %.1fs (attempt %d/%d)",
                                        response.status_code, url, backoff, attempt + 1, self._MAX_RETRIES)
+                        self._count(method, url, retries=1, backoff_seconds=backoff)
                         time.sleep(backoff)
                         continue
                 return response
             except (requests.ConnectionError, requests.Timeout) as e:
+                limiter.record(False)
+                if self.metrics is not None:
+                    self.metrics.record_request(endpoint(method, url), time.perf_counter() - start, 0, error=True)
                 if attempt < self._MAX_RETRIES:
                     backoff = self._BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 1)
                     logger.warning("Connection error on %s — retrying in %.1fs (attempt %d/%d): %s",
                                    url, backoff, attempt + 1, self._MAX_RETRIES, e)
+                    self._count(method, url, retries=1, backoff_seconds=backoff)
                     time.sleep(backoff)
                 else:
                     logger.error("Request failed after %d retries: %s", self._MAX_RETRIES, url)
                     raise
 
+    def _url_templates(self, event: str, year: str) -> list[str]:
+        '''
+            base_url and base_url2, the one learned for the event first.
+        '''
+        templates = [self.base_url, self.base_url2]
+        learned = self.template_map.get(event, year)
+        if learned in templates:
+            templates.remove(learned)
+            templates.insert(0, learned)
+        return templates
+
+    def _for_event_year(self, event: str, year: str) -> 'LiveTrailScraper':
+        '''
+            Copy restricted to one event and year, with its own session
+            (sessions are not thread-safe) but the same event lists.
+        '''
+        scraper = copy.copy(self)
+        scraper.session = requests.Session()
+        scraper.session.headers.update(self.session.headers)
+        scraper.events, scraper.years = [event], [year]
+        return scraper
+
+    def map_event_years(self, func, units=None, max_workers=4):
+        '''
+            Run ``func(scraper, event, year)`` for every (event, year) of
+            ``units`` (default: every self.events x self.years pair) on a
+            thread pool, so units overlap their network latency. Each call
+            gets a scraper restricted to its unit; all requests still go
+            through the shared per-host rate limiter. Yields the results in
+            ``units`` order, exceptions raised by ``func`` propagate.
+        '''
+        if units is None:
+            units = [(event, year) for event in self.events for year in self.years]
+        scrapers = [self._for_event_year(event, year) for event, year in units]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(lambda args: func(*args),
+                                    [(scraper, event, year) for scraper, (event, year) in zip(scrapers, units)])
+
     def _check_event_year(self, e: str, y: str) -> None:
         if e not in list(self.allEvents.keys()) or y not in self.eventsYears[e]:
             raise ValueError(f"{e} is not a valid Live Trail race id for year {y}.")
@@ -99,9 +308,8 @@ class LiveTrailScraper:
         for event in self.events:
             for year in self.years:
                 try:
-                    url1 = self.base_url.replace("{event}", event).replace("{year}", year) + f"/coureur.php?rech={bib_n}"
-                    url2 = self.base_url2.replace("{event}", event).replace("{year}", year) + f"/coureur.php?rech={bib_n}"
-                    for url in [url1, url2]:
+                    for template in self._url_templates(event, year):
+                        url = template.replace("{event}", event).replace("{year}", year) + f"/coureur.php?rech={bib_n}"
                         self._check_event_year(event, year)
                         # URL of the website
                         # url = f"https://livetrail.net/histo/{event}_{year}/coureur.php?rech={bib_n}"
@@ -110,8 +318,9 @@ class LiveTrailScraper:
                         # Check if request was successful
                         if response.status_code == 200:
                             # 'race' is an id and 'name' a more human-readble version
-                            race_info = self._parse_race_info(response.text)
-                            # if url1 fails, some old pages url is like in 2
+                            race_info = self._parse_race_info(response.content)
+                            # old events are under base_url2, remember which template answered
+                            self.template_map.set(event, year, template)
                             break
                         else:
                             race_info = {}
@@ -140,7 +349,7 @@ class LiveTrailScraper:
             ``descat`` (e.g. "0-34", "35-39", "") and ``cat`` (may be "").
             Returns ``None`` if the request fails or the identite tag is missing.
         '''
-        for template in (self.base_url, self.base_url2):
+        for template in self._url_templates(event, year):
             url = (template.replace("{event}", event).replace("{year}", year)
                    + f"/coureur.php?rech={bib}")
             try:
@@ -151,84 +360,104 @@ class LiveTrailScraper:
                 continue
             if '<identite' not in response.text:
                 continue
-            soup = BeautifulSoup(response.text, 'xml')
-            identite = soup.find('identite')
-            if identite is None:
+            identity = self._parse_identity(response.text)
+            if identity is None:
                 continue
-            return {
-                'sx': identite.get('sx', '') or '',
-                'descat': identite.get('descat', '') or '',
-                'cat': identite.get('cat', '') or '',
-            }
+            self.template_map.set(event, year, template)
+            return identity
         return None
 
-    def _parse_race_info(self, xml_content: str) -> dict:
-        # Parse the XML content
+    @_timed_parse('coureur')
+    def _parse_identity(self, xml_content: str) -> dict | None:
         soup = BeautifulSoup(xml_content, 'xml')
+        identite = soup.find('identite')
+        if identite is None:
+            return None
+        return {
+            'sx': identite.get('sx', '') or '',
+            'descat': identite.get('descat', '') or '',
+            'cat': identite.get('cat', '') or '',
+        }
 
-        # Find the <pass> tag
-        pass_tag = soup.find('pass')  # 'select', id='chxCourse')
-
-        # Find all <e> tags within the <pass> tag
-        e_tags = pass_tag.find_all('e')
-
-        # Create a dictionary to store id and n attributes
-        race_info = {}
-        # Extract id and n attributes from each <c> tag
-        for e_tag in e_tags:
-            if e_tag['idpt'] == '0':
-                race_info['date'] = e_tag['date'] if e_tag.has_attr('date') else None  # date of departure
-                race_info['tz'] = e_tag['tz'] if e_tag.has_attr('tz') else None  # timezone of date
-                race_info['hd'] = e_tag['hd'] if e_tag.has_attr('hd') else None  # departure time
-                race_info['jd'] = e_tag['jd'] if e_tag.has_attr('jd') else None  # departure day of the week (1 Monday...7 Sunday)
-                return race_info
-
-    def _parse_table(self, xml_content: str) -> pd.DataFrame:
-        # Parse the XML content
-        soup = BeautifulSoup(xml_content, 'xml')
-
-        # Find all <l> tags (rows)
-        rows = soup.find_all('l')
-
-        # Create an empty list to store row data
-        data = []
-
-        # Extract data from each row
-        for row in rows:
-            row_data = {}
-            row_data['n'] = row['n']
-            row_data['doss'] = row['doss']
-            row_data['nom'] = row['nom']
-            row_data['prenom'] = row['prenom']
-            row_data['cat'] = row['cat']
-            points = row.find_all('p')
-            for point in points:
-                row_data[point['idpt']] = point['h']
-            data.append(row_data)
-
-        # Create a DataFrame from the extracted data
-        df = pd.DataFrame(data)
-        return df
-
-    def _parse_races(self, xml_content: str) -> dict:
-        # Parse the XML content
-        soup = BeautifulSoup(xml_content, 'xml')
-
-        # Find the <courses> tag
-        courses_tag = soup.find('courses')  # 'select', id='chxCourse')
-
-        # Find all <c> tags within the <courses> tag
-        c_tags = courses_tag.find_all('c')
+    @staticmethod
+    def _iterparse(xml_content: bytes | str, tag):
+        '''
+            Stream the end events of ``tag`` elements of an XML document
+            (recovering from markup errors like BeautifulSoup did). Raw
+            ``response.content`` bytes are parsed in place, lxml decoding
+            them from their own declaration.
+        '''
+        if isinstance(xml_content, str):
+            xml_content = _XML_DECLARATION_RE.sub('', xml_content, count=1).encode('utf-8')
+        return etree.iterparse(io.BytesIO(xml_content), events=('end',), tag=tag, recover=True, huge_tree=True)
 
-        # Create a dictionary to store id and n attributes
+    @staticmethod
+    def _release(element) -> None:
+        '''
+            Free a processed element and its already processed siblings.
+        '''
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    @_timed_parse('coureur')
+    def _parse_race_info(self, xml_content: bytes | str) -> dict:
+        # Departure info is the <e idpt="0"> entry of the first <pass> tag
+        for _, e_tag in self._iterparse(xml_content, ('e', 'pass')):
+            if e_tag.tag == 'pass':
+                return None
+            if e_tag.getparent().tag == 'pass' and e_tag.get('idpt') == '0':
+                return {
+                    'date': e_tag.get('date'),  # date of departure
+                    'tz': e_tag.get('tz'),  # timezone of date
+                    'hd': e_tag.get('hd'),  # departure time
+                    'jd': e_tag.get('jd'),  # departure day of the week (1 Monday...7 Sunday)
+                }
+            self._release(e_tag)
+
+    @_timed_parse('passages POST')
+    def _parse_table(self, xml_content: bytes | str) -> pd.DataFrame:
+        '''
+            Runners table of a passages.php POST response, one row per <l>
+            tag and one column per control point (<p idpt=...>). Rows are
+            streamed into NaN-filled columnar arrays, grown in chunks, and
+            freed as they are read.
+        '''
+        fixed = ['n', 'doss', 'nom', 'prenom', 'cat']
+        capacity = _TABLE_CHUNK
+        columns = {name: np.full(capacity, np.nan, dtype=object) for name in fixed}
+        n_rows = 0
+        for _, row in self._iterparse(xml_content, 'l'):
+            if n_rows == capacity:
+                capacity *= 2
+                for name, column in columns.items():
+                    columns[name] = np.full(capacity, np.nan, dtype=object)
+                    columns[name][:n_rows] = column
+            attrib = row.attrib
+            for name in fixed:
+                columns[name][n_rows] = attrib[name]
+            for point in row.iter('p'):
+                idpt = point.attrib['idpt']
+                column = columns.get(idpt)
+                if column is None:
+                    column = columns[idpt] = np.full(capacity, np.nan, dtype=object)
+                column[n_rows] = point.attrib['h']  # repeated idpt: the last one wins
+            n_rows += 1
+            self._release(row)
+        if n_rows == 0:
+            return pd.DataFrame()
+        return pd.DataFrame({name: column[:n_rows] for name, column in columns.items()})
+
+    @_timed_parse('passages GET')
+    def _parse_races(self, xml_content: bytes | str) -> dict:
+        # {id: name} of the <c> tags of the first <courses> tag, which comes
+        # first in passages.php: the rest of the document is not parsed
         result_dict = {}
-
-        # Extract id and n attributes from each <c> tag
-        for c_tag in c_tags:
-            c_id = c_tag['id']
-            c_n = c_tag['n']
-            result_dict[c_id] = c_n
-
+        for _, c_tag in self._iterparse(xml_content, ('c', 'courses')):
+            if c_tag.tag == 'courses':
+                break
+            if c_tag.getparent().tag == 'courses':
+                result_dict[c_tag.attrib['id']] = c_tag.attrib['n']
         return result_dict
 
     def get_random_runner_bib(self, data_path=None):
@@ -277,9 +506,8 @@ class LiveTrailScraper:
         for event in self.events:
             for year in self.years:
                 try:
-                    url1 = self.base_url.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                    url2 = self.base_url2.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                    for url in [url1, url2]:
+                    for template in self._url_templates(event, year):
+                        url = template.replace("{event}", event).replace("{year}", year) + "/passages.php"
                         self._check_event_year(event, year)
                         # URL of the website
                         # url = f"https://livetrail.net/histo/{event}_{year}/passages.php"
@@ -288,9 +516,10 @@ class LiveTrailScraper:
                         # Check if request was successful
                         if response.status_code == 200:
                             # 'race' is an id and 'name' a more human-readble version
-                            races = self._parse_races(response.text)
+                            races = self._parse_races(response.content)
                             full_races[event] = {year: races}
-                            # if url1 fails, some old pages url is like in 2
+                            # old events are under base_url2, remember which template answered
+                            self.template_map.set(event, year, template)
                             break
                         else:
                             logger.warning("Failed to retrieve races' names. Status code: %s", response.status_code)
@@ -299,15 +528,21 @@ class LiveTrailScraper:
         return full_races
 
     def download_data(self, data_path=None, force_download=False) -> int:
+        '''
+            Download the results of every race of the events and years.
+            Races already downloaded are skipped unless ``force_download``,
+            in which case only the races whose table changed (see
+            DownloadManifest) are rewritten. Returns the number of errors.
+        '''
         if not data_path:
             data_path = os.path.join(self.data_path, 'csv')
+        manifest = DownloadManifest(data_path)
         count = 0
         for event in self.events:
             for year in self.years:
                 try:
-                    url1 = self.base_url.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                    url2 = self.base_url2.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                    for url in [url1, url2]:
+                    for template in self._url_templates(event, year):
+                        url = template.replace("{event}", event).replace("{year}", year) + "/passages.php"
                         self._check_event_year(event, year)
                         # URL of the website
                         # url = f"https://livetrail.net/histo/{event}_{year}/passages.php"
@@ -315,7 +550,9 @@ class LiveTrailScraper:
                         response = self._request('GET', url)
                         # Check if request was successful
                         if response.status_code == 200:
-                            races = self._parse_races(response.text)
+                            races = self._parse_races(response.content)
+                            # written together, an event-year store is rewritten once
+                            to_save = {}
                             # 'race' is an id and 'name' a more human-readble version
                             for race, name in races.items():
                                 # Data for the POST request
@@ -326,24 +563,27 @@ class LiveTrailScraper:
                                     'to': '1000000'  # To get all results
                                 }
                                 # Check if data already available or redownload:
-                                folder_path = os.path.join(data_path, event)
-                                if not os.path.exists(folder_path):
-                                    os.makedirs(folder_path)
-                                file_path = os.path.join(folder_path, f'{event}_{race}_{year}.csv')
-                                if os.path.exists(file_path) and force_download is False:
+                                file_path = storage.results_path(data_path, event, race, year)
+                                if storage.has_results(file_path) and force_download is False:
                                     pass
                                 else:
                                     # Sending POST request
                                     results_response = self._request('POST', url, data=data)
                                     # Check if request was successful
                                     if results_response.status_code == 200:
-                                        df = self._parse_table(results_response.text)
-                                        df.to_csv(os.path.join(folder_path, f'{event}_{race}_{year}.csv'), index=False)
+                                        df = self._parse_table(results_response.content)
+                                        if manifest.record(file_path, url, results_response, df) \
+                                                or not storage.has_results(file_path):
+                                            to_save[file_path] = df
+                                        else:
+                                            logger.info("Unchanged results for event: %s %s, race: %s", event, year, race)
                                     else:
                                         logger.warning("Failed to retrieve HTML table for event: %s %s, race: %s. Status code: %s",
                                                        event, year, race, results_response.status_code)
                                         count += 1
-                            # if url1 fails, some old pages url is like in 2
+                            storage.save_all_results(to_save, self.results_format)
+                            # old events are under base_url2, remember which template answered
+                            self.template_map.set(event, year, template)
                             break
                         else:
                             logger.warning("Failed to retrieve races' names. Status code: %s", response.status_code)
@@ -373,22 +613,19 @@ class LiveTrailScraper:
                 'to': '1000000'  # To get all results
             }
             # Check if data already available or redownload:
-            folder_path = os.path.join(data_path, event)
-            if not os.path.exists(folder_path):
-                os.makedirs(folder_path)
-            file_path = os.path.join(folder_path, f'{event}_{race}_{year}.csv')
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path, sep=',')
+            file_path = storage.results_path(data_path, event, race, year)
+            if storage.has_results(file_path):
+                df = storage.read_results(file_path)
             else:
                 # Sending POST request
                 # url = f"https://livetrail.net/histo/{event}_{year}/passages.php"
-                url1 = self.base_url.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                url2 = self.base_url2.replace("{event}", event).replace("{year}", year) + "/passages.php"
-                for url in [url1, url2]:
+                for template in self._url_templates(event, year):
+                    url = template.replace("{event}", event).replace("{year}", year) + "/passages.php"
                     results_response = self._request('POST', url, data=data)
                     # Check if request was successful
                     if results_response.status_code == 200:
-                        df = self._parse_table(results_response.text)
+                        df = self._parse_table(results_response.content)
+                        self.template_map.set(event, year, template)
                         break
                     else:
                         logger.warning("Failed to retrieve HTML table for event: %s %s, race: %s. Status code: %s",
@@ -397,6 +634,7 @@ class LiveTrailScraper:
         except ValueError as e:
             logger.warning("%s", e)
 
+    @_timed_parse('events')
     def _parse_event_list(self, data) -> dict:
         data = json.loads(data)
         events_dict = {}
@@ -404,6 +642,7 @@ class LiveTrailScraper:
             events_dict[i[0]] = i[1]['nom']
         return events_dict
 
+    @_timed_parse('event_years')
     def _parse_past_event_list(self, data) -> dict:
         data = json.loads(data)
         events_dict = {}
@@ -422,26 +661,29 @@ class LiveTrailScraper:
         else:
             return name
 
+    @_timed_parse('parcours')
     def _parse_control_points(self, data):
-        soup = BeautifulSoup(data, 'lxml')
-        p_tags = soup.find_all('points')
         control_points = {}
         control_points_names = {}
-        for p_tag in p_tags:
-            pt_tags = p_tag.find_all('pt')
+        for _, p_tag in self._iterparse(data, 'points'):
             cps = {}
             cps_names = {}
-            for pt_tag in pt_tags:
+            first_altitude = None
+            for pt_tag in p_tag.iter('pt'):
+                if first_altitude is None:
+                    first_altitude = int(pt_tag.attrib['a'])
                 # Calculate the altitude difference between the current point and the first point
                 # of the route and substract this quantity from cummulated elevaation gain.
-                elev_loss = int(pt_tag['d']) - (int(pt_tag['a']) - int(pt_tags[0]['a']))
+                elev_loss = int(pt_tag.attrib['d']) - (int(pt_tag.attrib['a']) - first_altitude)
                 # {'cp_name' : (acc_dist, acc_elev+, -acc_elev-)}
-                if pt_tag['nc'] in cps:
-                    pt_tag['nc'] = self._clean_control_name(cps, pt_tag['nc'])
-                cps[pt_tag['nc']] = (float(pt_tag['km']), int(pt_tag['d']), -elev_loss)
-                cps_names[pt_tag['nc']] = pt_tag['n']
-            control_points[p_tag['course']] = cps
-            control_points_names[p_tag['course']] = cps_names
+                name = pt_tag.attrib['nc']
+                if name in cps:
+                    name = self._clean_control_name(cps, name)
+                cps[name] = (float(pt_tag.attrib['km']), int(pt_tag.attrib['d']), -elev_loss)
+                cps_names[name] = pt_tag.attrib['n']
+            control_points[p_tag.attrib['course']] = cps
+            control_points_names[p_tag.attrib['course']] = cps_names
+            self._release(p_tag)
         return control_points, control_points_names
 
     def get_events(self) -> dict:
@@ -508,7 +750,7 @@ class LiveTrailScraper:
                 continue
             if year in self.eventsYears.get(event, []):
                 continue
-            for template in (self.base_url, self.base_url2):
+            for template in self._url_templates(event, year):
                 url = template.replace("{event}", event).replace("{year}", year) + "/passages.php"
                 try:
                     response = self._request('GET', url)
@@ -521,6 +763,7 @@ class LiveTrailScraper:
                 if '<courses>' not in response.text:
                     continue
                 self.eventsYears.setdefault(event, []).insert(0, year)
+                self.template_map.set(event, year, template)
                 discovered.append(event)
                 logger.info("Discovered %s %s via current-year probe", event, year)
                 break
@@ -534,9 +777,8 @@ class LiveTrailScraper:
         for event in self.events:
             for year in self.years:
                 try:
-                    url1 = self.base_url.replace("{event}", event).replace("{year}", year) + "/parcours.php"
-                    url2 = self.base_url2.replace("{event}", event).replace("{year}", year) + "/parcours.php"
-                    for url in [url1, url2]:
+                    for template in self._url_templates(event, year):
+                        url = template.replace("{event}", event).replace("{year}", year) + "/parcours.php"
                         self._check_event_year(event, year)
                         # URL of the website
                         # url = f"https://livetrail.net/histo/{event}_{year}/parcours.php"
@@ -544,8 +786,9 @@ class LiveTrailScraper:
                         response = self._request('GET', url)
                         # Check if request was successful
                         if response.status_code == 200:
-                            control_points, control_points_names = self._parse_control_points(response.text)
-                            # if url1 fails, some old pages url is like in 2
+                            control_points, control_points_names = self._parse_control_points(response.content)
+                            # old events are under base_url2, remember which template answered
+                            self.template_map.set(event, year, template)
                             break
                         else:
                             logger.warning("Failed to retrieve races' control points for %s %s. Status code: %s",
@@ -0,0 +1,345 @@
+'''
+    Storage of downloaded race results.
+
+    Results are saved either as one CSV per race,
+    ``{data_path}/{event}/{event}_{race}_{year}.csv`` (the default), or, with
+    the ``npy`` format, in one NumPy store per event-year,
+    ``{data_path}/{event}/{event}_{year}/`` (see ResultsStore). The CSV path
+    of a race stays its name either way (it is the races table's
+    results_filepath): the functions below find a race in its event-year
+    store when its CSV does not exist.
+'''
+import os
+import json
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'npy')
+STORE_VERSION = 3
+
+# {index path: ((mtime, size) of the index file, index)}
+_INDEXES = {}
+
+
+def results_path(data_path: str, event: str, race: str, year: str) -> str:
+    return os.path.join(data_path, event, f'{event}_{race}_{year}.csv')
+
+
+def _cells(column: pd.Series) -> np.ndarray:
+    '''
+        Cells of a column as DataFrame.to_csv writes them for the scraped
+        tables (integers without a decimal point, '' for missing values).
+    '''
+    values = column.to_numpy()
+    if values.dtype.kind in 'iub':
+        return values.astype(str)
+    if values.dtype.kind == 'f':
+        valid = ~np.isnan(values)
+        out = np.full(values.shape, '', dtype=object)
+        integral = valid & (values == np.floor(np.where(valid, values, 0)))
+        out[integral] = values[integral].astype(np.int64).astype(str)
+        out[valid & ~integral] = [repr(v) for v in values[valid & ~integral].tolist()]
+        return out.astype(str)
+    return column.where(column.notna(), '').astype(str).to_numpy(dtype=str)
+
+
+def _typed(values: np.ndarray) -> np.ndarray:
+    '''
+        Cells of a column typed as pd.read_csv would: int64 or float64
+        when every value is numeric, otherwise objects with NaN for ''.
+    '''
+    values = np.where(values == '', np.nan, values.astype(object))
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        return values
+
+
+class ResultsStore:
+    '''
+        Results of every race of an event-year in two files: ``index.json``
+        and the NumPy array it names. The array holds the cells of every
+        race, as strings, back to back: one row per runner, one field c{j}
+        per column position (each as wide as its longest cell). The index
+        gives each race's range of rows and column names.
+
+        The array is memory-mapped, so reading a race maps only the pages
+        of its rows and its columns are views of the file: no copy and no
+        text parsing (only ``.tolist()`` makes Python strings of them).
+        Writing rewrites the event-year once for any number of races and
+        is atomic: the new array gets a new name and replacing the index
+        commits it.
+    '''
+    INDEX = 'index.json'
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @classmethod
+    def for_event_year(cls, data_path: str, event: str, year: str) -> 'ResultsStore':
+        return cls(os.path.join(data_path, event, f'{event}_{year}'))
+
+    @classmethod
+    def locate(cls, file_path: str) -> tuple['ResultsStore', str]:
+        '''
+            Store and race of the results CSV path ``file_path``
+            ({data_path}/{event}/{event}_{race}_{year}.csv).
+        '''
+        folder_path, file = os.path.split(file_path)
+        event = os.path.basename(folder_path)
+        stem = file[:-len('.csv')]
+        if not (file.endswith('.csv') and stem.startswith(f'{event}_') and len(stem) > len(event) + 6
+                and stem[-5] == '_'):
+            raise ValueError(f'{file_path} is not a results CSV path')
+        year = stem[-4:]
+        race = stem[len(event) + 1:-5]
+        return cls.for_event_year(os.path.dirname(folder_path), event, year), race
+
+    def _index(self) -> dict:
+        '''
+            Index of the store, read again only when the file changed.
+        '''
+        index_path = os.path.join(self.path, self.INDEX)
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            return {'races': {}}
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = _INDEXES.get(index_path)
+        if cached is None or cached[0] != key:
+            with open(index_path, encoding='utf-8') as f:
+                cached = _INDEXES[index_path] = (key, json.load(f))
+        return cached[1]
+
+    def _cells(self, race: str) -> np.ndarray:
+        '''
+            Rows of ``race``, a view of the memory-mapped array.
+        '''
+        index = self._index()
+        entry = index['races'][race]
+        data = np.load(os.path.join(self.path, index['data']), mmap_mode='r')
+        return data[entry['start']:entry['start'] + entry['rows']]
+
+    @property
+    def races(self) -> list[str]:
+        return sorted(self._index()['races'])
+
+    def __contains__(self, race) -> bool:
+        return race in self._index()['races']
+
+    def rows(self, race: str) -> int:
+        return self._index()['races'][race]['rows']
+
+    def column_names(self, race: str) -> list[str]:
+        return self._index()['races'][race]['columns']
+
+    def columns(self, race: str, names: list[str] = None) -> dict[str, np.ndarray]:
+        '''
+            {column name: cells} of ``race``, only ``names`` if given. Cells
+            are read-only string views of the memory-mapped array, '' for
+            missing values.
+        '''
+        positions = {name: j for j, name in enumerate(self.column_names(race))}
+        cells = self._cells(race)
+        return {name: cells[f'c{positions[name]}'] for name in (positions if names is None else names)}
+
+    def put(self, race: str, df: pd.DataFrame) -> None:
+        '''
+            Add (or replace) the results table of ``race``.
+        '''
+        self.put_many({race: df})
+
+    def put_many(self, tables: dict[str, pd.DataFrame]) -> None:
+        '''
+            Add (or replace) the results tables {race: df}, rewriting the
+            store once.
+        '''
+        index = self._index()
+        kept = {race: entry for race, entry in index['races'].items() if race not in tables}
+        old = np.load(os.path.join(self.path, index['data']), mmap_mode='r') if kept else None
+        new = {race: [_cells(df[name]) for name in df.columns] for race, df in tables.items()}
+        n_fields = max([len(entry['columns']) for entry in kept.values()]
+                       + [len(columns) for columns in new.values()] + [1])
+        widths = [1] * n_fields
+        for entry in kept.values():
+            for j in range(len(entry['columns'])):
+                widths[j] = max(widths[j], old.dtype[f'c{j}'].itemsize // 4)
+        for columns in new.values():
+            for j, values in enumerate(columns):
+                widths[j] = max(widths[j], values.dtype.itemsize // 4)
+        races = {}
+        n_rows = sum(entry['rows'] for entry in kept.values()) + sum(len(df) for df in tables.values())
+        data = np.zeros(n_rows, dtype=[(f'c{j}', f'U{width}') for j, width in enumerate(widths)])
+        start = 0
+        for race, entry in kept.items():
+            rows = old[entry['start']:entry['start'] + entry['rows']]
+            for j in range(len(entry['columns'])):
+                data[f'c{j}'][start:start + entry['rows']] = rows[f'c{j}']
+            races[race] = {'start': start, 'rows': entry['rows'], 'columns': entry['columns']}
+            start += entry['rows']
+        for race, df in tables.items():
+            for j, values in enumerate(new[race]):
+                data[f'c{j}'][start:start + len(df)] = values
+            races[race] = {'start': start, 'rows': len(df), 'columns': [str(name) for name in df.columns]}
+            start += len(df)
+        del old
+
+        os.makedirs(self.path, exist_ok=True)
+        generation = index.get('generation', 0) + 1
+        data_file = f'results_{generation}.npy'
+        np.save(os.path.join(self.path, data_file), data)
+        index_path = os.path.join(self.path, self.INDEX)
+        with open(f'{index_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'generation': generation, 'data': data_file, 'races': races}, f)
+        os.replace(f'{index_path}.tmp', index_path)
+        for file in os.listdir(self.path):
+            if file.startswith('results_') and file.endswith('.npy') and file != data_file:
+                os.remove(os.path.join(self.path, file))
+
+    def frame(self, race: str) -> pd.DataFrame:
+        '''
+            Results table of ``race`` as pd.read_csv returns it from its CSV.
+        '''
+        columns = self.columns(race)
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame({name: _typed(values) for name, values in columns.items()})
+
+    def strings(self, race: str, names: list[str] = None) -> list[np.ndarray]:
+        '''
+            Columns of ``race`` (only ``names`` if given, in that order),
+            views of the cells as the CSV holds them.
+        '''
+        columns = self.columns(race, names)
+        return [columns[name] for name in (columns if names is None else names)]
+
+
+def has_results(file_path: str) -> bool:
+    '''
+        Whether the results CSV path ``file_path`` exists or is in its
+        event-year store (the store index is only read again when it
+        changed, the array is not opened).
+    '''
+    if os.path.exists(file_path):
+        return True
+    try:
+        store, race = ResultsStore.locate(file_path)
+    except ValueError:
+        return False
+    return race in store
+
+
+def archived(file_path: str) -> tuple[ResultsStore, str]:
+    '''
+        Store and race of the results CSV path ``file_path``, raises
+        FileNotFoundError if the race is not stored.
+    '''
+    store, race = ResultsStore.locate(file_path)
+    if race not in store:
+        raise FileNotFoundError(file_path)
+    return store, race
+
+
+def read_results(file_path: str) -> pd.DataFrame:
+    '''
+        Results table saved as ``file_path``, from its CSV or store.
+    '''
+    if os.path.exists(file_path):
+        return pd.read_csv(file_path, sep=',')
+    store, race = archived(file_path)
+    return store.frame(race)
+
+
+def save_results(file_path: str, df: pd.DataFrame, fmt: str = 'csv') -> None:
+    '''
+        Save the results table of the race named ``file_path`` in ``fmt``.
+    '''
+    if fmt not in FORMATS:
+        raise ValueError(f'results format must be one of {FORMATS}, got {fmt!r}')
+    if fmt == 'csv':
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        df.to_csv(file_path, index=False)
+    else:
+        store, race = ResultsStore.locate(file_path)
+        store.put(race, df)
+
+
+def save_all_results(tables: dict[str, pd.DataFrame], fmt: str = 'csv') -> None:
+    '''
+        save_results for every {file_path: df}, each event-year store being
+        written once.
+    '''
+    if fmt != 'npy':
+        for file_path, df in tables.items():
+            save_results(file_path, df, fmt)
+        return
+    stores = {}
+    for file_path, df in tables.items():
+        store, race = ResultsStore.locate(file_path)
+        stores.setdefault(store.path, (store, {}))[1][race] = df
+    for store, races in stores.values():
+        store.put_many(races)
+
+
+def list_results(folder_path: str) -> list[str]:
+    '''
+        Results CSV file names of an event folder, the races of its
+        event-year stores included.
+    '''
+    files = sorted(os.listdir(folder_path))
+    names = [file for file in files if file.endswith('.csv')]
+    seen = set(names)
+    event = os.path.basename(os.path.normpath(folder_path))
+    for file in files:
+        year = file[-4:]
+        if file == f'{event}_{year}' and year.isdigit() and os.path.isdir(os.path.join(folder_path, file)):
+            for race in ResultsStore(os.path.join(folder_path, file)).races:
+                name = f'{event}_{race}_{year}.csv'
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+    return names
+
+
+def convert_csv_tree(data_path: str, remove: bool = False) -> int:
+    '''
+        Pack every results CSV under ``data_path`` into its event-year
+        store (removing the CSVs if ``remove``). Returns the number of
+        races converted.
+    '''
+    count = 0
+    for event in sorted(os.listdir(data_path)):
+        folder_path = os.path.join(data_path, event)
+        if not os.path.isdir(folder_path):
+            continue
+        tables = {}
+        for file in sorted(os.listdir(folder_path)):
+            if not file.endswith('.csv'):
+                continue
+            file_path = os.path.join(folder_path, file)
+            try:
+                ResultsStore.locate(file_path)
+                # cells kept as written, the store holds them as strings
+                tables[file_path] = pd.read_csv(file_path, sep=',', dtype=str, keep_default_na=False)
+            except (ValueError, pd.errors.EmptyDataError) as e:
+                logger.warning("Skipping %s: %s", file_path, e)
+        save_all_results(tables, 'npy')
+        if remove:
+            for file_path in tables:
+                os.remove(file_path)
+        count += len(tables)
+        logger.info("Converted %s", event)
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pack the per-race results CSVs into one NumPy store per event-year.')
+    parser.add_argument('-d', '--data-path', default=None, help='CSV files path.')
+    parser.add_argument('--remove', action='store_true', help='Remove the CSVs once converted.')
+    args = parser.parse_args()
+    data_path = args.data_path if args.data_path else os.path.join(get_config().data_dir_path, 'csv')
+    logger.info("%d races converted", convert_csv_tree(data_path, remove=args.remove))
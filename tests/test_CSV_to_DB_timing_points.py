@@ -0,0 +1,56 @@
+import unittest
+import sqlite3
+from database.loader_LiveTrail import CSV_to_DB_timing_points
+
+
+class TestCSV_to_DB_timing_points(unittest.TestCase):
+    """
+    Test class for CSV_to_DB_timing_points
+    """
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.cursor = self.conn.cursor()
+        self.cursor.execute('''
+            CREATE TABLE control_points (control_point_id INTEGER PRIMARY KEY, event_id INTEGER, race_id TEXT,
+                                         code TEXT, name TEXT, distance REAL, elevation_pos INTEGER,
+                                         elevation_neg INTEGER)
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE timing_points (timing_point_id INTEGER PRIMARY KEY, control_point_id INTEGER,
+                                        race_id TEXT, event_id INTEGER, bib TEXT, time TEXT,
+                                        UNIQUE (control_point_id, bib))
+        ''')
+        self.cursor.executemany('INSERT INTO control_points VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+            (1, 1, 'ut', 'dep', 'Départ', 0.0, 0, 0),
+            (2, 1, 'ut', 'col', 'Col', 10.0, 900, -100),
+            (3, 1, 'ut', 'arr', 'Arrivée', 20.0, 1200, -1200),
+            (4, 1, 'tr', 'col', 'Col', 10.0, 900, -100),
+            (5, 1, 'tr', 'arr', 'Arrivée', 20.0, 1200, -1200),
+            (6, 1, 'tr', 'dep', 'Départ', 0.0, 0, 0),
+        ])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_insert_races_into_timing_points(self):
+        ultra = [['1', ['22:00:00', '23:30:00', '01:00:00']],
+                 ['2', ['22:00:00', '23:40:00', '']],  # DNF
+                 ['3', ['22:10:00', '', '23:50:00']]]
+        trail = [['7', ['09:50:00', '10:30:00']]]  # no departure passage: times since 09:00
+        inserted = CSV_to_DB_timing_points.insert_races_into_timing_points(self.cursor, [
+            ('ut', 1, '2023-06-24 22:00:00', ultra),
+            ('tr', 1, '2023-06-25 09:00:00', trail),
+            ('xx', 1, '2023-06-25 09:00:00', [['9', ['', '']]]),  # cancelled
+        ])
+        self.assertEqual(inserted, 2)
+        self.cursor.execute('SELECT bib, control_point_id, time FROM timing_points ORDER BY bib, control_point_id')
+        self.assertEqual(self.cursor.fetchall(), [
+            ('1', 1, '00:00:00'), ('1', 2, '01:30:00'), ('1', 3, '03:00:00'),
+            ('3', 1, '00:00:00'), ('3', 2, '00:50:00'), ('3', 3, '01:40:00'),  # interpolated, own wave
+            ('7', 4, '00:50:00'), ('7', 5, '01:30:00'),
+        ])
+
+    def test_insert_into_timing_points_cancelled(self):
+        with self.assertRaises(ValueError):
+            CSV_to_DB_timing_points.insert_into_timing_points(self.cursor, 'ut', 1, '22:00:00',
+                                                              [['1', ['', '', '']]])
@@ -1,7 +1,9 @@
 '''Tests for the category backfill module.'''
 import os
 import sqlite3
+import threading
 import unittest
+from unittest.mock import patch
 
 import pytest
 
@@ -191,5 +193,140 @@ class TestDetector(unittest.TestCase):
         self.assertEqual(race_ids, {'mim'})
 
 
+class FakeScraper:
+    '''coureur.php stand-in: identities per bib, optionally crashing on one.'''
+    def __init__(self, identities, crash_on=None):
+        self.identities = identities
+        self.crash_on = crash_on
+        self.asked = []
+        self.lock = threading.Lock()
+
+    def _for_event_year(self, event, year):
+        return self
+
+    def get_runner_identity(self, event, year, bib):
+        with self.lock:
+            self.asked.append(bib)
+        if bib == self.crash_on:
+            raise RuntimeError('interrupted')
+        return self.identities.get(bib)
+
+
+class TestBackfillRace(unittest.TestCase):
+
+    BACKFILL_DB = 'test_backfill_race.db'
+    IDENTITIES = {
+        '1': {'sx': 'F', 'descat': '0-34', 'cat': ''},
+        '2': {'sx': 'H', 'descat': '', 'cat': ''},  # sex only
+        # '3': request failed
+        '4': {'sx': '', 'descat': '', 'cat': ''},  # nothing usable
+        '5': {'sx': 'H', 'descat': '35-39', 'cat': ''},
+        '6': {'sx': 'F', 'descat': '', 'cat': ''},
+    }
+
+    def setUp(self):
+        if os.path.exists(self.BACKFILL_DB):
+            os.remove(self.BACKFILL_DB)
+        Database.create_database(path=self.BACKFILL_DB)
+        conn = sqlite3.connect(self.BACKFILL_DB)
+        conn.execute("INSERT INTO events (event_id, code, name, year, country) "
+                     "VALUES (1, 'penyagolosa', 'PENYAGOLOSA', '2025', 'ES')")
+        conn.execute("INSERT INTO races (race_id, event_id, race_name) VALUES ('mim', 1, 'MIM')")
+        conn.executemany(
+            "INSERT INTO results (race_id, event_id, position, bib, surname, name, "
+            "full_category, sex_category, time) VALUES ('mim', 1, ?, ?, 'S', 'N', ?, NULL, ?)",
+            [(i, str(i), '' if i <= 6 else '35-39 F', f'10:00:0{i}') for i in range(1, 9)],
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        if os.path.exists(self.BACKFILL_DB):
+            try:
+                os.remove(self.BACKFILL_DB)
+            except PermissionError:
+                pass
+
+    def rows(self, query):
+        conn = sqlite3.connect(self.BACKFILL_DB)
+        try:
+            return dict(conn.execute(query).fetchall())
+        finally:
+            conn.close()
+
+    def test_backfill_race_updates_and_checkpoints(self):
+        scraper = FakeScraper(self.IDENTITIES)
+        attempted, updated = backfill_categories.backfill_race(
+            scraper, self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025',
+            workers=3, batch_size=2,
+        )
+        self.assertEqual((attempted, updated), (6, 4))
+        self.assertEqual(sorted(scraper.asked), ['1', '2', '3', '4', '5', '6'])
+        self.assertEqual(
+            self.rows("SELECT bib, full_category FROM results WHERE bib IN ('1', '2', '5')"),
+            {'1': '0-34 F', '2': '', '5': '35-39 H'})
+        self.assertEqual(
+            self.rows("SELECT bib, sex_category FROM results WHERE bib IN ('2', '3', '6')"),
+            {'2': 'Male', '3': None, '6': 'Female'})
+        self.assertEqual(
+            self.rows("SELECT bib, status FROM backfill_progress"),
+            {'1': 'updated', '2': 'updated', '3': 'failed', '4': 'no_category',
+             '5': 'updated', '6': 'updated'})
+        # Nothing left: chronic-empty bibs are not asked again
+        self.assertEqual(backfill_categories.pending_bibs(self.BACKFILL_DB, 1, 'mim'), [])
+        self.assertEqual(
+            backfill_categories.pending_bibs(self.BACKFILL_DB, 1, 'mim', retry_failed=True), ['3'])
+        self.assertEqual(backfill_categories.backfill_race(
+            FakeScraper(self.IDENTITIES), self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025'), (0, 0))
+
+    def test_backfill_race_resumes_after_interruption(self):
+        scraper = FakeScraper(self.IDENTITIES, crash_on='5')
+        with self.assertRaises(RuntimeError):
+            backfill_categories.backfill_race(
+                scraper, self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025',
+                workers=1, batch_size=3,
+            )
+        # Bibs fetched before the crash are kept, even mid-batch
+        self.assertEqual(set(self.rows("SELECT bib, status FROM backfill_progress")),
+                         {'1', '2', '3', '4'})
+        self.assertEqual(self.rows("SELECT bib, full_category FROM results WHERE bib = '1'"),
+                         {'1': '0-34 F'})
+        resumed = FakeScraper(self.IDENTITIES)
+        attempted, updated = backfill_categories.backfill_race(
+            resumed, self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025', workers=1)
+        self.assertEqual(resumed.asked, ['5', '6'])
+        self.assertEqual((attempted, updated), (2, 2))
+
+    def test_backfill_race_resume_recomputes_rankings(self):
+        with self.assertRaises(RuntimeError):
+            backfill_categories.backfill_race(
+                FakeScraper(self.IDENTITIES, crash_on='6'), self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025',
+                workers=1, batch_size=2,
+            )
+        # updates written, rankings not recomputed before the crash
+        self.assertEqual(self.rows("SELECT bib, full_cat_position FROM results WHERE bib = '1'"), {'1': None})
+        # the resumed run only asks bib 6 again, and gets nothing for it
+        attempted, updated = backfill_categories.backfill_race(
+            FakeScraper({}), self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025', workers=1)
+        self.assertEqual((attempted, updated), (1, 0))
+        self.assertEqual(
+            self.rows("SELECT bib, full_cat_position FROM results WHERE bib IN ('1', '5', '7')"),
+            {'1': 1, '5': 1, '7': 1})
+
+    def test_backfill_race_with_connection(self):
+        conn = sqlite3.connect(self.BACKFILL_DB)
+        try:
+            with patch.object(Database, 'connect', side_effect=AssertionError('new connection')):
+                attempted, updated = backfill_categories.backfill_race(
+                    FakeScraper(self.IDENTITIES), self.BACKFILL_DB, 1, 'mim', 'penyagolosa', '2025',
+                    workers=3, batch_size=2, conn=conn,
+                )
+        finally:
+            conn.close()
+        self.assertEqual((attempted, updated), (6, 4))
+        self.assertEqual(self.rows("SELECT bib, full_category FROM results WHERE bib = '5'"),
+                         {'5': '35-39 H'})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -91,6 +91,114 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(rows), 0)
         conn.close()
 
+    def test_insert_many(self):
+        '''
+            Rows are written in chunks, within the caller's transaction
+        '''
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        cursor.execute('CREATE TABLE t (a INTEGER, b TEXT)')
+        rows = ((i, str(i)) for i in range(25))
+        self.assertEqual(Database.insert_many(cursor, 'INSERT INTO t VALUES (?, ?)', rows, chunk_size=10), 25)
+        self.assertEqual(Database.insert_many(cursor, 'INSERT INTO t VALUES (?, ?)', []), 0)
+        self.assertTrue(conn.in_transaction)
+        cursor.execute('SELECT COUNT(*), SUM(a) FROM t')
+        self.assertEqual(cursor.fetchone(), (25, 300))
+        conn.close()
+
+    def test_savepoint(self):
+        '''
+            A failing block is rolled back alone, the caller's transaction is kept
+        '''
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        cursor.execute('CREATE TABLE t (a INTEGER PRIMARY KEY)')
+        conn.commit()
+        cursor.execute('INSERT INTO t VALUES (1)')
+        with self.assertRaises(sqlite3.IntegrityError):
+            with Database.savepoint(cursor, 'race'):
+                cursor.execute('INSERT INTO t VALUES (2)')
+                cursor.execute('INSERT INTO t VALUES (1)')
+        with Database.savepoint(cursor, 'race'):
+            cursor.execute('INSERT INTO t VALUES (3)')
+        conn.commit()
+        cursor.execute('SELECT a FROM t ORDER BY a')
+        self.assertEqual(cursor.fetchall(), [(1,), (3,)])
+        conn.close()
+
+    def test_connect(self):
+        '''
+            Connections get the bulk settings only during a bulk load
+        '''
+        Database.create_database(self.db_path)
+        conn = Database.connect(self.db_path)
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 2)  # FULL
+        conn.close()
+        other_path = 'test_other.db'
+        try:
+            with Database.bulk_load(self.db_path, cache_size_mib=64):
+                conn = Database.connect(self.db_path)
+                self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+                self.assertEqual(conn.execute('PRAGMA cache_size').fetchone()[0], -64 * 1024)
+                conn.close()
+                # only the connections to the database being loaded
+                conn = Database.connect(other_path)
+                self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 2)
+                conn.close()
+        finally:
+            if os.path.exists(other_path):
+                os.remove(other_path)
+
+    def test_session(self):
+        '''
+            A given connection is used and left open, otherwise one is opened and closed
+        '''
+        Database.create_database(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        with Database.session(self.db_path, conn) as session:
+            self.assertIs(session, conn)
+        conn.execute('SELECT 1')
+        conn.close()
+        with Database.session(self.db_path) as session:
+            session.execute('SELECT 1')
+        with self.assertRaises(sqlite3.ProgrammingError):
+            session.execute('SELECT 1')
+
+    def test_bulk_load(self):
+        '''
+            WAL during the load, indexes rebuilt and journal mode restored after
+        '''
+        Database.create_database(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE INDEX idx_test_results_bib ON results (bib)')
+        conn.commit()
+        conn.close()
+        other_path = 'test_other.db'
+        try:
+            with Database.bulk_load(self.db_path, drop_indexes=True) as conn:
+                self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+                self.assertIsNone(conn.execute("SELECT name FROM sqlite_master WHERE name = 'idx_test_results_bib'").fetchone())
+                with Database.bulk_load(self.db_path) as nested:  # nested loads run within the outer one
+                    self.assertIs(nested, conn)
+                with Database.bulk_load(other_path) as other:  # other databases get their own
+                    self.assertIsNot(other, conn)
+                    self.assertEqual(other.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                conn.execute("INSERT INTO events (code, name, year) VALUES ('utmb', 'UTMB', '2023')")
+                other = Database.connect(other_path)  # its bulk load is over
+                self.assertEqual(other.execute('PRAGMA synchronous').fetchone()[0], 2)
+                other.close()
+        finally:
+            if os.path.exists(other_path):
+                os.remove(other_path)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        # what was written through the yielded connection is committed
+        self.assertEqual(conn.execute('SELECT code FROM events').fetchall(), [('utmb',)])
+        self.assertIsNotNone(conn.execute("SELECT name FROM sqlite_master WHERE name = 'idx_test_results_bib'").fetchone())
+        self.assertIsNotNone(conn.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone())
+        conn.close()
+
     def test_implemented_tests(self):
         '''
             Check that all functions are tested
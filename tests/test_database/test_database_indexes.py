@@ -0,0 +1,122 @@
+'''
+    Query plans of the hot lookups: none of them may scan a whole table
+'''
+import unittest
+import os
+import sqlite3
+from unittest.mock import patch
+from database.create_db import Database, INDEXES
+
+# (query, parameters) of the lookups the loaders and the app run the most
+HOT_QUERIES = {
+    'fetch_race_event_ids': (
+        'SELECT race_id, event_id, departure_datetime FROM races WHERE results_filepath=?',
+        ('csv/utmb/utmb_CCC_2023.csv',)),
+    'Event.get_id_from_code_year': (
+        'SELECT event_id FROM events WHERE code = ? AND year = ?', ('utmb', '2023')),
+    'Event.get_event_id_from_database': (
+        'SELECT event_id FROM events WHERE code = ? AND name = ? AND year = ?', ('utmb', 'UTMB', '2023')),
+    'fetch_control_points': ('''
+        SELECT code, name, distance, elevation_pos, elevation_neg, control_point_id
+        FROM control_points WHERE race_id = ? AND event_id = ?
+        ORDER BY control_point_id
+        ''', ('CCC', 1)),
+    'timing points of a runner': (
+        'SELECT control_point_id, time FROM timing_points WHERE race_id = ? AND event_id = ? AND bib = ?',
+        ('CCC', 1, '12')),
+    'clean_race (timing points)': (
+        'DELETE FROM timing_points WHERE event_id = ? AND race_id = ?', (1, 'CCC')),
+    'clean_race (results)': (
+        'DELETE FROM results WHERE event_id = ? AND race_id = ?', (1, 'CCC')),
+    'results search by surname': ('''
+        SELECT results.event_id, results.race_id, results.bib,
+               events.name, events.year, races.race_name,
+               results.position, results.cat_position, results.full_cat_position,
+               results.surname, results.name,
+               results.sex_category, results.full_category, results.time
+        FROM results
+        INNER JOIN events ON events.event_id = results.event_id
+        INNER JOIN races ON races.race_id = results.race_id
+                         AND races.event_id = results.event_id
+        WHERE results.surname LIKE ?
+        ''', ('dupont%',)),
+    'results search by surname, name': ('''
+        SELECT results.event_id, results.race_id, results.bib, events.name, events.year, races.race_name,
+               results.time
+        FROM results
+        INNER JOIN events ON events.event_id = results.event_id
+        INNER JOIN races ON races.race_id = results.race_id
+                         AND races.event_id = results.event_id
+        WHERE results.surname LIKE ? AND results.name LIKE ?
+        ''', ('Dupont', 'Jean')),
+}
+
+
+class TestDatabaseIndexes(unittest.TestCase):
+    '''
+        Test class for the managed indexes
+    '''
+    db_path = 'test_indexes.db'
+
+    def setUp(self):
+        Database.create_database(self.db_path)
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def query_plan(self, query, parameters) -> list[str]:
+        conn = sqlite3.connect(self.db_path)
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', parameters).fetchall()]
+        conn.close()
+        return plan
+
+    def test_hot_queries(self):
+        '''
+            Every hot query searches an index, no full table scan
+        '''
+        for name, (query, parameters) in HOT_QUERIES.items():
+            with self.subTest(name):
+                plan = self.query_plan(query, parameters)
+                self.assertTrue(plan)
+                self.assertFalse([step for step in plan if step.startswith('SCAN')], plan)
+
+    def test_ensure_indexes(self):
+        '''
+            Indexes missing from an existing database are created, only once
+        '''
+        conn = sqlite3.connect(self.db_path)
+        for name in INDEXES:
+            conn.execute(f'DROP INDEX {name}')
+        conn.commit()
+        conn.close()
+        self.assertTrue(any(step.startswith('SCAN') for step in self.query_plan(*HOT_QUERIES['fetch_race_event_ids'])))
+        Database.ensure_indexes(self.db_path)
+        Database.ensure_indexes(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        self.assertTrue(set(INDEXES) <= names)
+        self.test_hot_queries()
+
+    def test_ensure_indexes_with_connection(self):
+        '''
+            Given a connection, the indexes are created through it
+        '''
+        conn = sqlite3.connect(self.db_path)
+        for name in INDEXES:
+            conn.execute(f'DROP INDEX {name}')
+        conn.commit()
+        with patch('database.create_db.sqlite3.connect', side_effect=AssertionError('new connection')):
+            Database.ensure_indexes(self.db_path, conn)
+        conn.close()
+        self.test_hot_queries()
+
+    def test_bulk_load(self):
+        '''
+            Indexes dropped for a bulk load are back afterwards
+        '''
+        with Database.bulk_load(self.db_path, drop_indexes=True):
+            self.assertTrue(any(step.startswith('SCAN')
+                                for step in self.query_plan(*HOT_QUERIES['Event.get_id_from_code_year'])))
+        self.test_hot_queries()
@@ -179,5 +179,74 @@ class TestFeaturesLoader(unittest.TestCase):
         result = self.cursor.fetchone()[0]
         self.assertEqual(result, 0)
 
+    def test_load_features_times_over_24h(self):
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self.cursor.executemany('''
+            INSERT INTO control_points (control_point_id, event_id, race_id, code, name, distance,
+                                        elevation_pos, elevation_neg)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(1, 1, 'ut', 'a', 'A', 50.0, 3000, -3000), (2, 1, 'ut', 'b', 'B', 300.0, 20000, -20000)])
+        self.cursor.executemany('''
+            INSERT INTO timing_points (control_point_id, race_id, event_id, bib, time)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(1, 'ut', 1, '7', '23:30:00'), (2, 'ut', 1, '7', '101:02:03')])
+        self.conn.commit()
+        self.conn.close()
+
+        load_features(self.db_path)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self.cursor.execute('SELECT dist_segment, time FROM features ORDER BY id')
+        self.assertEqual(self.cursor.fetchall(),
+                         [(50.0, '23:30:00'), (250.0, '77:32:03'), (300.0, '101:02:03')])
+
+    def test_load_features_with_connection(self):
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self._insert_test_data()
+        self.cursor.executemany('''
+            INSERT INTO control_points (control_point_id, event_id, race_id, code, name, distance,
+                                        elevation_pos, elevation_neg)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(1, 1, 'ut', 'a', 'A', 10.0, 500, -500)])
+        self.cursor.execute('''
+            INSERT INTO timing_points (control_point_id, race_id, event_id, bib, time)
+            VALUES (1, 'ut', 1, '7', '01:30:00')
+        ''')
+        self.conn.commit()
+
+        with patch.object(Database, 'connect', side_effect=AssertionError('new connection')):
+            load_features(self.db_path, clean=True, conn=self.conn)
+
+        self.cursor.execute('SELECT race_id, dist_cumul, time FROM features ORDER BY id')
+        self.assertEqual(self.cursor.fetchall(), [('ut', 10.0, '01:30:00'), ('ut', 10.0, '01:30:00')])
+
+    def test_load_features_unparsed_and_negative_segments(self):
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self.cursor.executemany('''
+            INSERT INTO control_points (control_point_id, event_id, race_id, code, name, distance,
+                                        elevation_pos, elevation_neg)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(1, 1, 'ut', 'a', 'A', 10.0, 500, -500), (2, 1, 'ut', 'b', 'B', 20.0, 1000, -1000),
+              (3, 1, 'ut', 'c', 'C', 30.0, 1500, -1500)])
+        self.cursor.executemany('''
+            INSERT INTO timing_points (control_point_id, race_id, event_id, bib, time)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(1, 'ut', 1, '7', '01:30:00'), (2, 'ut', 1, '7', 'nan'), (3, 'ut', 1, '7', '01:28:30')])
+        self.conn.commit()
+        self.conn.close()
+
+        load_features(self.db_path)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.cursor = self.conn.cursor()
+        self.cursor.execute('SELECT dist_cumul, time FROM features ORDER BY id')
+        # 'nan' counts as 0, negative segments keep SQLite's truncated printf format
+        self.assertEqual(self.cursor.fetchall(),
+                         [(10.0, '01:30:00'), (20.0, '-1:-30:00'), (30.0, '01:28:30'), (30.0, '01:30:00')])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,8 @@
 import unittest
+from contextlib import closing
 import pytest
+from database.create_db import Database
+from database.models import Event
 from database.loader_LiveTrail import db_LiveTrail_loader
 
 
@@ -53,3 +56,37 @@ class Testdb_LiveTrail_loader(unittest.TestCase):
             self.events, self.years_v1, self.years_v1)
         self.assertEqual(events, {})
         self.assertEqual(only_in_v1, {})
+
+    def test_skip_race(self):
+        cps = {'ultra': {}, 'maxirace': {}, 'partners': {}}
+        self.assertFalse(db_LiveTrail_loader.skip_race('ultra', 'Ultra', cps))
+        self.assertTrue(db_LiveTrail_loader.skip_race('kv', 'KV', cps))
+        self.assertTrue(db_LiveTrail_loader.skip_race('maxirace', 'Orientation A', cps))
+        self.assertTrue(db_LiveTrail_loader.skip_race('partners', 'Course des Partenaires', cps))
+
+
+def test_save_event_year(tmp_path):
+    '''
+        Races and control points of an event-year are saved through the
+        caller's connection, saving them again leaves the control points as
+        they are.
+    '''
+    db = Database.create_database(path=str(tmp_path / 'events.db'))
+    data = {'cps': {'ut': {'dep': (0.0, 0, 0), 'arr': (20.0, 1200, -1200)}},
+            'cpns': {'ut': {'dep': 'Départ', 'arr': 'Arrivée'}},
+            'races': {'ut': 'Ultra'}, 'races_data': {'ut': {'distance': 20.0, 'elevation_pos': 1200,
+                                                          'elevation_neg': -1200}},
+            'race_infos': {'ut': {'date': '2023-06-24', 'hd': '22:00:00'}}}
+    with closing(Database.connect(db.path)) as conn:
+        with conn:
+            event = Event(event_code='trail', event_name='Trail', year='2023', db=db, conn=conn)
+            event.save_to_database(conn)
+            event_id = event.get_event_id()
+            db_LiveTrail_loader.save_event_year(conn, db, event_id, 'trail', '2023', data, str(tmp_path / 'csv'))
+        data['cpns']['ut']['arr'] = 'Finish'
+        with conn:
+            db_LiveTrail_loader.save_event_year(conn, db, event_id, 'trail', '2023', data, str(tmp_path / 'csv'))
+        assert conn.execute('SELECT race_id, departure_datetime, results_filepath FROM races').fetchall() == \
+            [('ut', '2023-06-24 22:00:00', None)]
+        assert conn.execute('SELECT code, name FROM control_points ORDER BY control_point_id').fetchall() == \
+            [('dep', 'Départ'), ('arr', 'Arrivée')]
@@ -0,0 +1,134 @@
+'''
+Test module for the EventFetchPlan class
+'''
+import os
+from collections import Counter
+import pytest
+import requests
+import pandas as pd
+from scraper.scraper import LiveTrailScraper
+from scraper.fetch_plan import EventFetchPlan
+from scraper.cache import TemplateMap
+from tests.tools import get_untested_functions
+
+pytestmark = pytest.mark.filterwarnings("ignore", message=".*XMLParsedAsHTMLWarning.*")
+
+PARCOURS = '''<d><points course="ultra"><pt n="Start" nc="Start" km="0" d="0" a="1000" />
+    <pt n="Finish" nc="Finish" km="42.2" d="2100" a="1100" /></points>
+    <points course="kv"><pt n="Bottom" nc="Bottom" km="0" d="0" a="10" /><pt n="Top" nc="Top" km="5" d="1000" a="1010" /></points></d>'''
+RACES = '<d><courses><c id="ultra" n="Ultra" /><c id="kv" n="KV" /></courses></d>'
+TABLES = {
+    'ultra': '<d><fiches><l n="1" doss="12" nom="A" prenom="B" cat="SEH"><p idpt="0" h="06:00:00" /></l></fiches></d>',
+    'kv': '<d><fiches></fiches></d>',
+}
+COUREUR = '<d><fiche><pass><e idpt="0" date="2023-08-25" tz="2" hd="18:00:00" jd="5" /></pass></fiche></d>'
+
+
+def make_response(status_code, text='') -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.encoding = 'utf-8'
+    response._content = text.encode()
+    return response
+
+
+class TestEventFetchPlan():
+    @staticmethod
+    @pytest.fixture
+    def scraper():
+        '''
+            Offline scraper: pages only exist under base_url2 (old events).
+        '''
+        scr = object.__new__(LiveTrailScraper)
+        scr.allEvents, scr.eventsYears = {'utmb': 'UTMB'}, {'utmb': ['2013', '2012']}
+        scr.template_map = TemplateMap()
+        scr.results_format = 'csv'
+        scr.sent = []
+
+        def request(method, url, data=None, **kwargs):
+            scr.sent.append((method, url))
+            if '/histo/utmb2013/' not in url and '/histo/utmb2012/' not in url:
+                return make_response(404)
+            page = url.rsplit('/', 1)[1]
+            if page == 'parcours.php':
+                return make_response(200, PARCOURS)
+            if page == 'passages.php':
+                return make_response(200, TABLES[data['course']] if method == 'POST' else RACES)
+            return make_response(200, COUREUR)
+        scr._request = request
+        return scr
+
+    @staticmethod
+    @pytest.fixture
+    def plan(scraper, tmp_path):
+        return EventFetchPlan(scraper, 'utmb', '2013', data_path=str(tmp_path))
+
+    def test_request_count(self, plan, scraper):
+        plan.control_points()
+        plan.races()
+        plan.download()
+        plan.random_runner_bibs()
+        plan.physical_details()
+        plan.race_info(12)
+        plan.race_info(12)
+        # every page is requested once, only the first one tries base_url first
+        assert plan.request_count == len(scraper.sent) == 6
+        assert plan.request_counts == Counter({'GET parcours.php': 2, 'GET passages.php': 1,
+                                               'POST passages.php': 2, 'GET coureur.php': 1})
+        assert len(set(scraper.sent)) == 5
+        # the template is learned for the event: other years go straight to it
+        scraper.sent.clear()
+        EventFetchPlan(scraper, 'utmb', '2012').races()
+        assert scraper.sent == [('GET', 'https://livetrail.net/histo/utmb2012/passages.php')]
+
+    def test_control_points(self, plan):
+        cps, names = plan.control_points()
+        assert cps['ultra'] == {'Start': (0.0, 0, 0), 'Finish': (42.2, 2100, -2000)}
+        assert names['kv'] == {'Bottom': 'Bottom', 'Top': 'Top'}
+        assert plan.control_points() is plan.control_points()
+
+    def test_races(self, plan, scraper):
+        assert plan.races() == {'ultra': 'Ultra', 'kv': 'KV'}
+        invalid = EventFetchPlan(scraper, 'utmb', '2019')
+        assert invalid.races() is None
+        assert invalid.request_count == 0
+
+    def test_results(self, plan, tmp_path):
+        df = plan.results('ultra')
+        assert df.loc[0, 'doss'] == '12'
+        file_path = os.path.join(tmp_path, 'utmb', 'utmb_ultra_2013.csv')
+        assert os.path.exists(file_path)
+        # already downloaded results are read from their CSV
+        other = EventFetchPlan(plan.scraper, 'utmb', '2013', data_path=str(tmp_path))
+        pd.testing.assert_frame_equal(other.results('ultra'), pd.read_csv(file_path))
+        assert other.request_count == 0
+
+    def test_results_npy(self, plan, tmp_path):
+        plan.scraper.results_format = 'npy'
+        plan.download()
+        assert os.listdir(os.path.join(tmp_path, 'utmb')) == ['utmb_2013']
+        other = EventFetchPlan(plan.scraper, 'utmb', '2013', data_path=str(tmp_path))
+        assert other.results('ultra').loc[0, 'doss'] == 12
+        assert other.results('kv').empty
+        assert other.request_count == 0
+
+    def test_download(self, plan):
+        assert plan.download() == 0
+        assert set(plan._results) == {'ultra', 'kv'}
+
+    def test_random_runner_bibs(self, plan):
+        assert plan.random_runner_bibs() == {'ultra': '12', 'kv': None}
+
+    def test_physical_details(self, plan):
+        assert plan.physical_details() == {
+            'ultra': {'distance': 42.2, 'elevation_pos': 2100, 'elevation_neg': -2000},
+            'kv': {'distance': 5.0, 'elevation_pos': 1000, 'elevation_neg': 0},
+        }
+
+    def test_race_info(self, plan):
+        assert plan.race_info(12) == {'date': '2023-08-25', 'tz': '2', 'hd': '18:00:00', 'jd': '5'}
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(EventFetchPlan, TestEventFetchPlan)
+        print(untested)
+        assert len(untested) == 0, "EventFetchPlan is not tested enough. pytest -s for details."
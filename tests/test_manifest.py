@@ -0,0 +1,128 @@
+'''
+Test module for the DownloadManifest of downloaded results
+'''
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from scraper import storage
+from scraper.manifest import DownloadManifest, results_name, summarize
+from database.create_db import Database
+from database.loader_LiveTrail import CSV_to_DB_timing_points
+from tests.tools import get_untested_functions
+
+
+def results_table(finish='08:00:00') -> pd.DataFrame:
+    return pd.DataFrame({
+        'n': ['1', np.nan], 'doss': ['12', '7'], 'nom': ['A', 'B'], 'prenom': ['x', 'y'], 'cat': ['SEH', 'SEF'],
+        'dep': ['06:00:00', '06:00:00'], 'col': ['07:00:00', np.nan], 'arr': [finish, np.nan],
+    })
+
+
+def make_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    return response
+
+
+def test_results_name(tmp_path):
+    assert results_name(storage.results_path(str(tmp_path), 'utmb', 'CCC', '2023')) == 'csv/utmb/utmb_CCC_2023.csv'
+
+
+def test_summarize():
+    summary = summarize(results_table())
+    assert summary['rows'] == 2
+    assert (summary['last_cp'], summary['last_cp_passages']) == ('arr', 1)
+    assert summarize(results_table(finish=np.nan))['last_cp'] == 'col'
+    assert summarize(results_table())['hash'] != summarize(results_table(finish='08:00:01'))['hash']
+
+
+class TestDownloadManifest():
+    @staticmethod
+    @pytest.fixture
+    def manifest(tmp_path):
+        return DownloadManifest(str(tmp_path))
+
+    @staticmethod
+    @pytest.fixture
+    def file_path(tmp_path):
+        return storage.results_path(str(tmp_path), 'utmb', 'CCC', '2023')
+
+    def test_get(self, manifest, file_path):
+        assert manifest.get(file_path) is None
+        manifest.record(file_path, 'https://livetrail.net/histo/utmb_2023/passages.php', make_response(b'<d/>'),
+                        results_table())
+        entry = manifest.get(file_path)
+        assert entry['name'] == 'csv/utmb/utmb_CCC_2023.csv'
+        assert entry['url'] == 'https://livetrail.net/histo/utmb_2023/passages.php'
+        assert (entry['size'], entry['rows'], entry['last_cp']) == (4, 2, 'arr')
+
+    def test_record(self, manifest, file_path):
+        assert manifest.record(file_path, None, None, results_table())
+        changed_at = manifest.get(file_path)['changed_at']
+        # a refresh returning the same table is not a change
+        assert not manifest.record(file_path, None, None, results_table())
+        assert manifest.get(file_path)['changed_at'] == changed_at
+        assert manifest.get(file_path)['fetched_at'] > changed_at
+        assert manifest.record(file_path, None, None, results_table(finish='08:00:01'))
+
+    def test_loaded(self, manifest, file_path):
+        manifest.record(file_path, None, None, results_table())
+        assert manifest.loaded('results') == set()
+        manifest.mark_loaded('results', [results_name(file_path)])
+        assert manifest.loaded('results') == {'csv/utmb/utmb_CCC_2023.csv'}
+        assert manifest.loaded('timing_points') == set()
+        # a changed table has to be loaded again
+        manifest.record(file_path, None, None, results_table(finish='08:00:01'))
+        assert manifest.loaded('results') == set()
+
+    def test_mark_loaded(self, manifest, file_path):
+        manifest.mark_loaded('results', ['csv/utmb/utmb_OCC_2023.csv'])  # not downloaded
+        assert manifest.loaded('results') == set()
+        manifest.record(file_path, None, None, results_table())
+        manifest.mark_loaded('results', [results_name(file_path)] * 2)
+        assert manifest.loaded('results') == {results_name(file_path)}
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(DownloadManifest, TestDownloadManifest)
+        print(untested)
+        assert len(untested) == 0, "DownloadManifest is not tested enough. pytest -s for details."
+
+
+def test_timing_points_changed_only(tmp_path):
+    '''
+        The timing points loader only reloads races whose table changed.
+    '''
+    db_path = str(tmp_path / 'events.db')
+    data_path = str(tmp_path / 'csv')
+    Database.create_database(path=db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO races (race_id, event_id, departure_datetime, results_filepath) "
+                     "VALUES ('CCC', 1, '2023-09-02 06:00:00', 'csv/utmb/utmb_CCC_2023.csv')")
+        conn.executemany("INSERT INTO control_points (control_point_id, event_id, race_id, code, name, distance) "
+                         "VALUES (?, 1, 'CCC', ?, ?, ?)", [(1, 'dep', 'Start', 0.0), (2, 'col', 'Col', 10.0),
+                                                             (3, 'arr', 'Finish', 20.0)])
+    file_path = storage.results_path(data_path, 'utmb', 'CCC', '2023')
+    manifest = DownloadManifest(data_path)
+
+    def download(df):
+        manifest.record(file_path, None, None, df)
+        storage.save_results(file_path, df)
+
+    def finish_time():
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute("SELECT time FROM timing_points WHERE bib = '12' AND control_point_id = 3").fetchall()
+
+    download(results_table())
+    CSV_to_DB_timing_points.main(path=db_path, data_path=data_path, changed_only=True)
+    assert finish_time() == [('02:00:00',)]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE timing_points SET time = 'untouched'")
+    CSV_to_DB_timing_points.main(path=db_path, data_path=data_path, changed_only=True)
+    assert finish_time() == [('untouched',)]
+    download(results_table(finish='08:30:00'))
+    CSV_to_DB_timing_points.main(path=db_path, data_path=data_path, changed_only=True)
+    assert finish_time() == [('02:30:00',)]
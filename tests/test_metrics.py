@@ -0,0 +1,76 @@
+'''
+Test module for the scraper's instrumentation
+'''
+import json
+import threading
+import pytest
+from scraper.metrics import ScraperMetrics, endpoint
+from tests.tools import get_untested_functions
+
+
+def test_endpoint():
+    assert endpoint('post', 'https://livetrail.net/histo/utmb_2023/passages.php') == 'passages POST'
+    assert endpoint('GET', 'https://livetrail.net/histo/utmb_2023/passages.php') == 'passages GET'
+    assert endpoint('GET', 'https://livetrail.net/histo/utmb2013/coureur.php?rech=12') == 'coureur'
+    assert endpoint('GET', 'https://utmb.livetrail.net/parcours.php') == 'parcours'
+    assert endpoint('POST', 'https://livetrail.net/phpFonctions/homeFunctions.php') == 'events'
+    assert endpoint('POST', 'https://livetrail.net/phpFonctions/eventFunctions.php') == 'event_years'
+
+
+class TestScraperMetrics():
+    @staticmethod
+    @pytest.fixture
+    def metrics():
+        return ScraperMetrics()
+
+    def test_add(self, metrics):
+        metrics.add('coureur', retries=1, backoff_seconds=2.5)
+        metrics.add('coureur', retries=1, backoff_seconds=4.0)
+        coureur = metrics.to_dict()['coureur']
+        assert (coureur['retries'], coureur['backoff_seconds'], coureur['requests']) == (2, 6.5, 0)
+        with pytest.raises(KeyError):
+            metrics.add('coureur', unknown=1)
+
+    def test_record_request(self, metrics):
+        threads = [threading.Thread(target=metrics.record_request, args=('parcours', i / 100, 10))
+                   for i in range(1, 101)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        metrics.record_request('parcours', 5.0, 0, error=True)
+        parcours = metrics.to_dict()['parcours']
+        assert (parcours['requests'], parcours['errors'], parcours['bytes']) == (101, 1, 1000)
+        assert parcours['latency_p50'] == pytest.approx(0.51)
+        assert parcours['latency_max'] == 5.0
+
+    def test_parse(self, metrics):
+        with metrics.parse('passages POST'):
+            pass
+        with pytest.raises(ValueError):
+            with metrics.parse('passages POST'):
+                raise ValueError
+        passages = metrics.to_dict()['passages POST']
+        assert passages['parses'] == 2
+        assert passages['parse_seconds'] >= 0
+        assert 'latency_p50' not in passages
+
+    def test_to_dict(self, metrics):
+        assert metrics.to_dict() == {}
+        metrics.record_request('parcours', 0.2, 10)
+        metrics.add('events', cache_hits=1)
+        assert list(metrics.to_dict()) == ['events', 'parcours']
+        assert set(metrics.to_dict()['events']) == set(ScraperMetrics.COUNTERS)
+
+    def test_dump(self, metrics, tmp_path):
+        metrics.record_request('coureur', 0.3, 100)
+        report = metrics.dump(str(tmp_path / 'metrics.json'), request_rates={'livetrail.net': 0.5})
+        with open(tmp_path / 'metrics.json', encoding='utf-8') as f:
+            assert json.load(f) == report
+        assert report['request_rates'] == {'livetrail.net': 0.5}
+        assert report['endpoints']['coureur']['latency_p99'] == pytest.approx(0.3)
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(ScraperMetrics, TestScraperMetrics)
+        print(untested)
+        assert len(untested) == 0, "ScraperMetrics is not tested enough. pytest -s for details."
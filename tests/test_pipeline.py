@@ -0,0 +1,101 @@
+'''
+Test module for the parallel parsing of the CSV loaders
+'''
+import os
+import sqlite3
+import pandas as pd
+import pytest
+from scraper import storage
+from scraper.manifest import DownloadManifest
+from database.create_db import Database
+from database.loader_LiveTrail import CSV_to_DB_results, CSV_to_DB_timing_points
+from database.loader_LiveTrail.pipeline import parse_and_write
+from tests.test_manifest import results_table
+
+
+def square(task):
+    return task * task
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parse_and_write(workers):
+    written = []
+    count = parse_and_write(iter(range(10)), square, lambda task, rows: written.append((task, rows)),
+                            workers=workers, queue_size=2)
+    assert count == 10
+    assert written == [(i, i * i) for i in range(10)]
+
+
+def test_parse_and_write_error():
+    def write(task, rows):
+        if task == 3:
+            raise sqlite3.IntegrityError
+    with pytest.raises(sqlite3.IntegrityError):
+        parse_and_write(range(100), square, write, workers=2)
+
+
+def load(tmp_path, workers) -> tuple[list, list]:
+    '''
+        Results and timing points of two races loaded with ``workers``
+        parsing processes.
+    '''
+    db_path = str(tmp_path / f'events_{workers}.db')
+    data_path = str(tmp_path / 'csv')
+    Database.create_database(path=db_path)
+    with sqlite3.connect(db_path) as conn:
+        for race in ['CCC', 'OCC']:
+            conn.execute("INSERT INTO races (race_id, event_id, departure_datetime, results_filepath) "
+                         "VALUES (?, 1, '2023-09-02 06:00:00', ?)", (race, f'csv/utmb/utmb_{race}_2023.csv'))
+            conn.executemany("INSERT INTO control_points (event_id, race_id, code, name, distance) "
+                             "VALUES (1, ?, ?, ?, ?)", [(race, 'dep', 'Start', 0.0), (race, 'col', 'Col', 10.0),
+                                                        (race, 'arr', 'Finish', 20.0)])
+    for race, finish in [('CCC', '08:00:00'), ('OCC', '09:30:00')]:
+        file_path = storage.results_path(data_path, 'utmb', race, '2023')
+        if not os.path.exists(file_path):
+            storage.save_results(file_path, results_table(finish=finish))
+    CSV_to_DB_results.main(path=db_path, data_path=data_path, workers=workers)
+    CSV_to_DB_timing_points.main(path=db_path, data_path=data_path, workers=workers)
+    with sqlite3.connect(db_path) as conn:
+        results = conn.execute('SELECT race_id, bib, time FROM results ORDER BY race_id, bib').fetchall()
+        timing_points = conn.execute('SELECT race_id, bib, control_point_id, time FROM timing_points '
+                                     'ORDER BY race_id, bib, control_point_id').fetchall()
+    return results, timing_points
+
+
+def test_workers(tmp_path):
+    results, timing_points = load(tmp_path, workers=1)
+    assert results == [('CCC', '12', '02:00:00'), ('CCC', '7', 'DNF'),
+                       ('OCC', '12', '03:30:00'), ('OCC', '7', 'DNF')]
+    assert len(timing_points) == 6
+    assert load(tmp_path, workers=2) == (results, timing_points)
+
+
+def test_failing_race_rolled_back(tmp_path):
+    '''
+        A race breaking a constraint leaves no rows behind and is not marked
+        as loaded, the other races are loaded.
+    '''
+    db_path = str(tmp_path / 'events.db')
+    data_path = str(tmp_path / 'csv')
+    Database.create_database(path=db_path)
+    with sqlite3.connect(db_path) as conn:
+        for race in ['CCC', 'OCC']:
+            conn.execute("INSERT INTO races (race_id, event_id, departure_datetime, results_filepath) "
+                         "VALUES (?, 1, '2023-09-02 06:00:00', ?)", (race, f'csv/utmb/utmb_{race}_2023.csv'))
+            conn.executemany("INSERT INTO control_points (event_id, race_id, code, name, distance) "
+                             "VALUES (1, ?, ?, ?, ?)", [(race, 'dep', 'Start', 0.0), (race, 'col', 'Col', 10.0),
+                                                        (race, 'arr', 'Finish', 20.0)])
+    manifest = DownloadManifest(data_path)
+    for race in ['CCC', 'OCC']:
+        df = results_table()
+        if race == 'OCC':
+            df = pd.concat([df, df.iloc[:1]], ignore_index=True)  # bib 12 twice
+        file_path = storage.results_path(data_path, 'utmb', race, '2023')
+        manifest.record(file_path, None, None, df)
+        storage.save_results(file_path, df)
+    CSV_to_DB_results.main(path=db_path, data_path=data_path, changed_only=True)
+    CSV_to_DB_timing_points.main(path=db_path, data_path=data_path, changed_only=True)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT DISTINCT race_id FROM results').fetchall() == [('CCC',)]
+        assert conn.execute('SELECT DISTINCT race_id FROM timing_points').fetchall() == [('CCC',)]
+    assert manifest.loaded('results') == manifest.loaded('timing_points') == {'csv/utmb/utmb_CCC_2023.csv'}
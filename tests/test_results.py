@@ -150,6 +150,63 @@ class TestResults():
 
 
     # Test case for paces computation
+    def test_from_seconds(self, sample_results):
+        rs = Results.from_seconds(dict(sample_results.control_points), sample_results._seconds,
+                                  sample_results.times.index, sample_results.times.columns,
+                                  offset=sample_results.offset, waves=sample_results.waves,
+                                  interpolated=sample_results.get_interpolated_mask().to_numpy())
+        assert rs.get_real_times().equals(sample_results.get_real_times())
+        assert rs.get_paces().equals(sample_results.get_paces())
+        assert rs.get_interpolated_mask().equals(sample_results.get_interpolated_mask())
+
+    def test_interpolate_rows(self):
+        seconds = np.array([[np.nan, 10, np.nan, np.nan, 40, np.nan]])
+        np.testing.assert_array_equal(Results._interpolate_rows(seconds), [[10, 10, 20, 30, 40, 40]])
+        np.testing.assert_array_equal(Results._interpolate_rows(seconds, extrapolate_end=False),
+                                      [[10, 10, 20, 30, 40, np.nan]])
+
+    @staticmethod
+    def live_race() -> tuple[dict, pd.DataFrame]:
+        control_points = {'Départ': (0.0, 0, 0), 'Col': (10.0, 900, -100), 'Refuge': (20.0, 1500, -900),
+                          'Arrivée': (30.0, 1800, -1800)}
+        times = pd.DataFrame({'Départ': ['22:00:00', '22:00:00', '22:00:00'],
+                              'Col': ['23:10:00', '', '23:30:00'],
+                              'Refuge': ['00:20:00', '00:40:00', ''],
+                              'Arrivée': ['01:30:00', '', '']}, index=['1', '2', '3'])
+        return control_points, times
+
+    def test_append_passages(self):
+        control_points, times = self.live_race()
+        rs = Results(dict(control_points), times.iloc[:, :2], offset='22:00:00', live=True)
+        assert list(rs.times.columns) == list(control_points)  # control points to come are kept
+        assert rs.paces.shape == (3, 4)
+        changed = rs.append_passages(pd.concat([times.iloc[:, 2:], pd.DataFrame(
+            {'Col': ['23:05:00']}, index=['4'])]))
+        assert list(changed) == [0, 1, 3]  # '3' has no new passage
+        reference = Results(dict(control_points), pd.concat([times, pd.DataFrame(
+            {'Départ': [''], 'Col': ['23:05:00'], 'Refuge': [''], 'Arrivée': ['']}, index=['4'])]),
+            offset='22:00:00', live=True)
+        assert rs.times.equals(reference.times)
+        assert rs.paces.equals(reference.paces)
+        assert rs.get_interpolated_mask().equals(reference.get_interpolated_mask())
+        assert rs.get_interpolated_mask().loc['2', 'Col']  # between two passages
+        assert rs.times.loc['3', 'Refuge'] == 'nan'  # still to come, not interpolated
+        assert rs.get_times(over24h=True).loc['1', 'Arrivée'] == '03:30:00'
+        with pytest.raises(ValueError):
+            rs.append_passages(pd.DataFrame({'Unknown': ['23:00:00']}, index=['1']))
+        with pytest.raises(ValueError):
+            Results(dict(control_points), times, offset='22:00:00').append_passages(times)
+
+    def test_finish(self):
+        control_points, times = self.live_race()
+        rs = Results(dict(control_points), times, offset='22:00:00', live=True)
+        assert len(rs.times) == 3
+        rs.finish()
+        finished = Results(dict(control_points), times, offset='22:00:00')
+        assert not rs.live and list(rs.times.index) == ['1']  # DNFs filtered out
+        assert rs.times.equals(finished.times)
+        assert rs.paces.equals(finished.paces)
+
     def test_get_paces(self, sample_results):
         # Raul BUTACI in Transgrancanaria 2023
         data = {
@@ -197,6 +254,17 @@ class TestResults():
         assert sample_results.get_closest_time_to_objective('14:05:21') == '2'
         assert sample_results.get_closest_time_to_objective('14:22:21') == '3'
 
+    def test_get_closest_times_to_objectives(self, sample_results):
+        # n=1 is 13:44:47, n=2 is 14:06:56, n=3 is 14:15:50 since departure
+        targets = ['14:07:28', '14:05:21', '14:22:21', '10:00:00', '13:55:51']
+        assert sample_results.get_closest_times_to_objectives(targets) == ['2', '2', '3', '1', '1']
+        # Seconds work too, and the objective is left untouched
+        sample_results.set_objective(2)
+        assert sample_results.get_closest_times_to_objectives([50000, 51350]) == ['1', '3']
+        assert sample_results.objective == 2
+        # Exactly halfway between two finishers: the first listed wins
+        assert sample_results.get_closest_times_to_objectives([(49487 + 50816) / 2]) == ['1']
+
     def test_DNFs_filtered_out(self, sample_results):
         # Only 3 in results and not 4
         assert len(sample_results.times) == 3
@@ -234,6 +302,28 @@ class TestResults():
         sn.columns = list(sample_results.control_points.keys())
         assert all(sn == sample_results.get_stats_norm()), "Function get_stats_norm failed."
 
+    def test_get_pace_stats(self, sample_results):
+        stats = sample_results.get_pace_stats(quantiles=(0.1, 0.5, 0.9))
+        assert list(stats.index) == ['mins', 'first', 'mean_4', 'mean_20', 'p10', 'p50', 'p90']
+        assert stats.loc['mins', 'Tenoya'] == 259  # 0:04:19
+        assert (stats.loc['p10'] <= stats.loc['p50']).all() and (stats.loc['p50'] <= stats.loc['p90']).all()
+        assert (Results.format_stats(stats.iloc[:4]) == sample_results.get_stats()).all().all()
+        norm = sample_results.get_pace_stats(norm=True)
+        assert (Results.format_stats(norm) == sample_results.get_stats_norm()).all().all()
+
+    def test_get_objective_pace_stats(self, sample_results):
+        sample_results.set_objective(2)
+        stats = sample_results.get_objective_pace_stats(n=3)
+        assert list(stats.index) == ['objective', 'mean_3']
+        assert (Results.format_stats(stats.iloc[[0]]).to_numpy()
+                == sample_results.get_objective_paces().to_numpy()).all()
+        assert (Results.format_stats(stats.iloc[[1]]).to_numpy()
+                == sample_results.get_objective_mean_paces(n=3).to_numpy()).all()
+
+    def test_format_stats(self, sample_results):
+        stats = pd.DataFrame({'a': [59.9, 3600 * 25 + 61, np.nan]})
+        assert list(Results.format_stats(stats)['a']) == ['0:00:59', '25:01:01', 'nan']
+
     def test_get_distance_deltas(self, sample_results):
         dd = {'Tenoya': (11.43, 348, -188),
               'Arucas': (8.010000000000002, 356, -294),
@@ -492,6 +582,52 @@ class TestResults():
             h = int(v.split(':')[0])
             assert h < 24, f"{col}={v!r} has h>=24"
 
+    def test_correct_times24h_multiple_midnights(self):
+        # 200-mile style race: four midnights crossed. Every crossing must add
+        # one more day to the rest of the row.
+        control_points = {
+            'CP0': (0.0, 0, 0),
+            'CP1': (50.0, 2000, -2000),
+            'CP2': (100.0, 4000, -4000),
+            'CP3': (150.0, 6000, -6000),
+            'CP4': (200.0, 8000, -8000),
+            'CP5': (250.0, 10000, -10000),
+            'CP6': (320.0, 12000, -12000),
+        }
+        data = {
+            'CP0': ['10:00:00', '10:00:00'],
+            'CP1': ['20:00:00', '22:00:00'],
+            'CP2': ['08:00:00', '12:00:00'],
+            'CP3': ['23:00:00', '06:00:00'],
+            'CP4': ['15:00:00', '23:30:00'],
+            'CP5': ['04:00:00', '18:00:00'],
+            'CP6': ['20:00:00', '13:00:00'],
+        }
+        times = pd.DataFrame(data, index=['1', '2'])
+        control_points.pop(next(iter(control_points)))
+        rs = Results(control_points, times[control_points.keys()],
+                     offset='10:00:00', clean_days=False, start_day='5')
+        assert list(rs.get_hours(over24h=True).loc['1']) == \
+            ['20:00:00', '32:00:00', '47:00:00', '63:00:00', '76:00:00', '92:00:00']
+        assert list(rs.get_hours(over24h=True).loc['2']) == \
+            ['22:00:00', '36:00:00', '54:00:00', '71:30:00', '90:00:00', '109:00:00']
+
+    def test_correct_times24h_matches_row_by_row(self, sample_results):
+        # The whole-matrix correction must agree with the step-by-step row
+        # recurrence, including a clamp followed by a drop that only counts
+        # as a crossing against the clamped value.
+        seconds = np.array([
+            [36000, 34200, 31800, 36000],   # 10:00, 9:30 (clamp), 8:50, 10:00
+            [79200, 82800, 3600, 7200],     # crossing midnight once
+            [3600, 3500, 7200, 7100],       # two small glitches
+            [50000, np.nan, 51000, 52000],  # NaN left untouched
+        ], dtype=float)
+        expected = np.array([sample_results._correct_row_times24h(row) for row in seconds])
+        corrected = sample_results._correct_times24h(seconds)
+        assert np.array_equal(corrected, expected, equal_nan=True)
+        assert list(corrected[1]) == [79200, 82800, 90000, 93600]
+        assert list(corrected[2]) == [3600, 3600, 7200, 7200]
+
     def test_get_interpolated_mask(self):
         # Runner '1' has a NaN at CP2 that Results fills during clean_times;
         # runner '2' has no missing values. The mask must reflect that.
@@ -589,6 +725,57 @@ class TestResults():
         assert clamped.loc['a', 'CP1'] == '0:10:00'
         assert clamped.loc['c', 'CP3'] == '0:11:00'
 
+    def test_clamp_aberrant_paces_numeric(self, sample_results):
+        # The pace engine hands seconds per km straight to the clamp; the
+        # result must match the string path cell for cell.
+        strings = pd.DataFrame({
+            'CP1': ['0:10:00', '0:03:30', '0:10:30'],
+            'CP2': ['0:02:30', '0:03:50', '0:01:45'],
+            'CP3': ['0:10:15', '0:03:40', '0:11:00'],
+        }, index=['a', 'b', 'c'])
+        numeric = strings.map(lambda x: sample_results.get_seconds(x, offset=False))
+        clamped = sample_results._clamp_aberrant_paces(numeric)
+        assert clamped.isna().equals(sample_results._clamp_aberrant_paces(strings).isna())
+        assert pd.isna(clamped.loc['a', 'CP2']) and pd.isna(clamped.loc['c', 'CP2'])
+        assert clamped.loc['b', 'CP2'] == 230
+
+    def test_paces_match_segment_allure(self, sample_results):
+        # Every pace cell is the segment time over the segment length,
+        # exactly what get_allure gives for a single cell.
+        times = sample_results.get_times()
+        deltas = sample_results.get_distance_deltas()
+        points = list(sample_results.control_points)
+        for runner in sample_results.paces.index:
+            for prev, point in zip(points, points[1:]):
+                segment = sample_results.total_time_to_delta(times.loc[runner, point],
+                                                             times.loc[runner, prev])
+                expected = sample_results.get_allure(segment, deltas[point][0])
+                assert sample_results.paces.loc[runner, point] == expected
+
+    def test_derived_frames_are_lazy(self, sample_results, monkeypatch):
+        # Building Results and asking for real times (the timing-points
+        # loader path) must not compute deltas or paces.
+        def fail(*args, **kwargs):
+            raise AssertionError("derived frame computed eagerly")
+        for name in ('get_time_deltas', 'get_paces', 'get_paces_norm'):
+            monkeypatch.setattr(Results, name, fail)
+        times = sample_results.times
+        rs = Results(dict(sample_results.control_points), times, offset='00:00:03')
+        assert len(rs.get_real_times()) == 3
+
+    def test_derived_frames_are_cached_and_invalidated(self, sample_results):
+        paces = sample_results.paces
+        assert sample_results.paces is paces
+        assert sample_results.time_deltas is sample_results.time_deltas
+        sample_results.set_offset('00:00:00')
+        # Same offset shift on every row: first segment moves, others don't
+        assert sample_results.paces is not paces
+        assert sample_results.time_deltas.loc['3', 'Tenoya'] == '0:49:34'
+        assert sample_results.paces.loc['3', 'Arucas'] == paces.loc['3', 'Arucas']
+        times = sample_results.times
+        sample_results.clean_times()
+        assert sample_results.times is not times
+
     def test_get_seconds(self, sample_results):
         assert sample_results.get_seconds('1:30:00') == 5397
         assert sample_results.get_seconds('3 days, 1:30:00') == 264597
@@ -689,6 +876,33 @@ class TestResults():
         # This method is None if there are no differences and asserts the differences if they exist
         assert assert_frame_equal(sample_results_bis.get_times(), times) is None
 
+    def test_get_times_over24h(self, sample_results):
+        times = sample_results.get_times(over24h=True)
+        assert times.loc['3', 'Tenoya'] == '00:49:31'
+        assert times.loc['3', 'Meta Parque Sur'] == '14:15:50'
+        assert (times == sample_results.get_times().map(sample_results.format_time_over24h)).all().all()
+
+    def test_get_real_times_over24h(self):
+        # A runner crossing midnight is stored as clock seconds + 24h and
+        # formatted straight from the numeric matrix, without "1 day, ...".
+        control_points = {
+            'CP0': (0.0, 0, 0),
+            'CP1': (10.0, 100, -50),
+            'CP2': (20.0, 200, -100),
+        }
+        data = {
+            'CP0': ['22:00:00', '22:10:00'],
+            'CP1': ['23:30:00', '23:50:00'],
+            'CP2': ['01:15:07', '02:00:00'],
+        }
+        times = pd.DataFrame(data, index=['1', '2'])
+        rs = Results(control_points, times, offset='22:00:00', waves=True)
+        assert rs.times.loc['1', 'CP2'] == '1 day, 1:15:07'
+        assert rs.get_hours(over24h=True).loc['1', 'CP2'] == '25:15:07'
+        real = rs.get_real_times(over24h=True)
+        assert list(real.loc['1']) == ['00:00:00', '01:30:00', '03:15:07']
+        assert list(real.loc['2']) == ['00:00:00', '01:40:00', '03:50:00']
+
     def test_get_hours(self, sample_results_bis):
         data = {
             'Place du t': ['7:30:01', '7:30:01', '7:00:01', '7:30:01', '7:30:01'],
@@ -747,6 +961,12 @@ class TestResults():
         # Check if the cleaned DataFrame matches the expected DataFrame
         assert cleaned_df.equals(expected_df)
 
+    def test_init_clean_days(self, sample_results):
+        times = pd.DataFrame({'Tenoya': ['Ve. 23:51', 'Ve. 23:50'], 'Arucas': ['Sa. 01:36', 'Sa. 01:35']})
+        rs = Results(control_points={'Tenoya': (11.43, 348, -188), 'Arucas': (19.44, 704, -482)},
+                     times=times, offset='22:00:00', clean_days=True, start_day=5)
+        assert list(rs.get_times(over24h=True)['Arucas']) == ['03:36:00', '03:35:00']
+
 ##########################################################################################
 #
 #       Plot tests
@@ -0,0 +1,63 @@
+'''
+    Tests for results.batch
+'''
+import pytest
+import numpy as np
+import pandas as pd
+from results.results import Results
+from results.batch import ResultsBatch
+from tests.tools import get_untested_functions
+
+
+class TestResultsBatch():
+    control_points = {'Départ': (0.0, 0, 0), 'Col': (8.5, 900, -100), 'Refuge': (21.0, 1800, -1200),
+                      'Arrivée': (30.2, 2100, -2100)}
+    times = [['21:00:00', '22:05:10', '00:12:45', '01:40:02'],   # crosses midnight
+             ['21:00:00', '', '23:58:20', '01:20:13'],           # missing passage
+             ['21:04:12', '22:20:01', '', ''],                   # DNF
+             ['21:03:30', '22:01:00', '23:59:59', '01:30:30']]
+    short = {'Start': (0.0, 0, 0), 'Finish': (12.0, 500, -500)}
+
+    @pytest.fixture
+    def batch(self) -> ResultsBatch:
+        return ResultsBatch([(self.control_points, self.times, '21:00:00', 6, True),
+                             (self.short, [['09:00:00', '10:02:03']], '09:00:00', 7, False),
+                             (self.short, [['09:00:00', '10:02:03']], None, 7, False)])
+
+    def test___init__(self, batch):
+        assert len(batch) == 3
+        assert list(batch.widths) == [4, 2, 0]
+        assert list(batch.row_splits) == [0, 3, 4, 4]
+        assert list(batch.rows[0]) == [0, 1, 3]
+        assert list(batch.errors) == [2]
+        assert batch.seconds.shape == (4, 4)
+        assert batch.interpolated[1, 1] and batch.interpolated.sum() == 1
+
+    def test_matches_results(self, batch):
+        rs = Results(dict(self.control_points), pd.DataFrame(self.times, columns=list(self.control_points)),
+                     offset='21:00:00', waves=True)
+        np.testing.assert_array_equal(batch.race_seconds(0), rs._seconds)
+        assert (batch.get_real_times(over24h=True)[0] == rs.get_real_times(over24h=True).to_numpy()).all()
+
+    def test_race_seconds(self, batch):
+        np.testing.assert_array_equal(batch.race_seconds(1), [[9 * 3600, 10 * 3600 + 123]])
+        np.testing.assert_array_equal(batch.race_seconds(1, real=True), [[0, 3600 + 123]])
+        assert batch.race_seconds(0)[0, -1] == 25 * 3600 + 40 * 60 + 2
+
+    def test_get_real_times(self, batch):
+        times = batch.get_real_times(over24h=True)
+        assert [t.shape for t in times] == [(3, 4), (1, 2), (0, 0)]
+        assert list(times[0][0]) == ['00:00:00', '01:05:10', '03:12:45', '04:40:02']
+        assert list(batch.get_real_times()[1][0]) == ['0:00:00', '1:02:03']
+
+    def test_get_results(self, batch):
+        rs = batch.get_results(0)
+        assert list(rs.times.index) == [0, 1, 3]
+        assert rs.get_interpolated_mask().loc[1, 'Col']
+        assert rs.get_time_deltas().shape == (3, 4)
+        with pytest.raises(ValueError):
+            batch.get_results(2)
+
+    def test_implemented_tests(self):
+        unused_functions = get_untested_functions(ResultsBatch, TestResultsBatch)
+        assert len(unused_functions) == 0, "ResultsBatch is not tested enough. pytest -s for details."
@@ -2,9 +2,15 @@
 Test module for the LiveTrailScraper class
 '''
 import os
+import time
+import tempfile
+import threading
 import unittest
+from unittest.mock import patch
 import pytest
-from scraper.scraper import LiveTrailScraper
+import requests
+from scraper.scraper import LiveTrailScraper, RateLimiter
+from scraper.cache import ResponseCache
 import pandas as pd
 from tests.tools import get_untested_functions
 from config import get_config
@@ -322,7 +328,206 @@ class TestLiveTrailScraper(unittest.TestCase):
 
         assert race_details == scr_race_details, "get_races_physical_details test failed"
 
+    passages_xml = '''<?xml version="1.0" encoding="ISO-8859-1"?>
+        <d><courses><c id="ultra" n="Ultra Trail" /><c id="kv" n="KV Éclair" /></courses>
+        <fiches><l n="1" doss="12" nom="DUPONT" prenom="Jérôme" cat="SEH"><p idpt="0" h="06:00:00" /><p idpt="5" h="07:12:40" /></l>
+        <l n="2" doss="7" nom="MARTIN" prenom="Ana" cat="SEF"><p idpt="0" h="06:00:00" /><p idpt="9" h="08:01:02" /><p idpt="5" h="07:30:00" /></l>
+        <l n="3" doss="3" nom="DOE" prenom="John" cat="V1H" /></fiches></d>'''
+
+    def test__parse_table(self):
+        scr = object.__new__(LiveTrailScraper)
+        df = scr._parse_table(self.passages_xml)
+        expected = pd.DataFrame([
+            {'n': '1', 'doss': '12', 'nom': 'DUPONT', 'prenom': 'Jérôme', 'cat': 'SEH', '0': '06:00:00', '5': '07:12:40'},
+            {'n': '2', 'doss': '7', 'nom': 'MARTIN', 'prenom': 'Ana', 'cat': 'SEF', '0': '06:00:00', '5': '07:30:00', '9': '08:01:02'},
+            {'n': '3', 'doss': '3', 'nom': 'DOE', 'prenom': 'John', 'cat': 'V1H'},
+        ])
+        pd.testing.assert_frame_equal(df, expected)
+        self.assertTrue(scr._parse_table('<d><courses /></d>').empty)
+
+    def test__parse_table_content(self):
+        # raw ISO-8859-1 response bytes, columns grown past their first chunk
+        scr = object.__new__(LiveTrailScraper)
+        with patch('scraper.scraper._TABLE_CHUNK', 2):
+            df = scr._parse_table(self.passages_xml.encode('iso-8859-1'))
+        pd.testing.assert_frame_equal(df, scr._parse_table(self.passages_xml))
+        self.assertEqual(df.loc[0, 'prenom'], 'Jérôme')
+        self.assertEqual(list(df.columns), ['n', 'doss', 'nom', 'prenom', 'cat', '0', '5', '9'])
+
+    def test__parse_races(self):
+        scr = object.__new__(LiveTrailScraper)
+        self.assertEqual(scr._parse_races(self.passages_xml), {'ultra': 'Ultra Trail', 'kv': 'KV Éclair'})
+
+    def test__parse_control_points(self):
+        xml = '''<d><points course="ultra"><pt n="Départ" nc="Depart" km="0" d="0" a="1000" />
+            <pt n="Col" nc="Col" km="10.5" d="800" a="1700" /><pt n="Col bis" nc="Col" km="20" d="900" a="900" /></points>
+            <points course="kv"><pt n="A" nc="A" km="0" d="0" a="10" /><pt n="B" nc="B" km="5.2" d="1000" a="1010" /></points></d>'''
+        scr = object.__new__(LiveTrailScraper)
+        cps, names = scr._parse_control_points(xml)
+        self.assertEqual(cps, {'ultra': {'Depart': (0.0, 0, 0), 'Col': (10.5, 800, -100), '2-Col': (20.0, 900, -1000)},
+                               'kv': {'A': (0.0, 0, 0), 'B': (5.2, 1000, 0)}})
+        self.assertEqual(names['ultra'], {'Depart': 'Départ', 'Col': 'Col', '2-Col': 'Col bis'})
+
+    @patch.object(LiveTrailScraper, 'get_events_years', return_value={'utmb': ['2022', '2023']})
+    @patch.object(LiveTrailScraper, 'get_events', return_value={'utmb': 'UTMB'})
+    def test_map_event_years(self, *_):
+        scr = LiveTrailScraper(events=['utmb'], years=['2022', '2023'])
+        threads = set()
+
+        def unit(scraper, event, year):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return scraper.events, scraper.years, scraper.session is not scr.session
+        results = list(scr.map_event_years(unit, max_workers=2))
+        self.assertEqual(results, [(['utmb'], ['2022'], True), (['utmb'], ['2023'], True)])
+        self.assertEqual(len(threads), 2)
+        # the original scraper is left untouched
+        self.assertEqual(scr.years, ['2022', '2023'])
+
+    @patch.object(LiveTrailScraper, 'get_events_years', return_value={})
+    @patch.object(LiveTrailScraper, 'get_events', return_value={})
+    def test__request_retries_through_limiter(self, *_):
+        scr = LiveTrailScraper()
+        scr.cache = None
+        responses = iter([type('R', (), {'status_code': 503, 'content': b''})(),
+                          type('R', (), {'status_code': 200, 'content': b'<d/>'})()])
+        with patch.object(scr.session, 'request', side_effect=lambda *a, **k: next(responses)), \
+             patch.object(RateLimiter, 'acquire', return_value=0.0) as acquire, \
+             patch('scraper.scraper.time.sleep') as sleep:
+            response = scr._request('GET', 'https://livetrail.net/histo/utmb_2023/passages.php')
+        self.assertEqual(response.status_code, 200)
+        # the retry waits for a token too, after its exponential backoff
+        self.assertEqual(acquire.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertGreaterEqual(sleep.call_args[0][0], LiveTrailScraper._BACKOFF_BASE)
+        # both attempts and the retry are instrumented
+        passages = scr.metrics.to_dict()['passages GET']
+        self.assertEqual((passages['requests'], passages['retries'], passages['bytes']), (2, 1, 4))
+        self.assertEqual(passages['backoff_seconds'], sleep.call_args[0][0])
+        self.assertIs(scr._limiter('https://livetrail.net/a'), scr._limiter('https://livetrail.net/b'))
+
+    @patch.object(LiveTrailScraper, 'get_events_years', return_value={})
+    @patch.object(LiveTrailScraper, 'get_events', return_value={})
+    def test__send_adapts_pace(self, *_):
+        scr = LiveTrailScraper()
+        statuses = iter([200, 200, 429, 200])
+        with patch.dict(LiveTrailScraper._limiters, clear=True), \
+             patch.object(scr.session, 'request', side_effect=lambda *a, **k: type('R', (), {'status_code': next(statuses), 'content': b''})()), \
+             patch.object(RateLimiter, 'acquire', return_value=0.0), \
+             patch('scraper.scraper.time.sleep'):
+            scr._send('GET', 'https://example.org/a')
+            rate = LiveTrailScraper.request_rates()['example.org']
+            scr._send('GET', 'https://example.org/a')
+            self.assertGreater(LiveTrailScraper.request_rates()['example.org'], rate)
+            rate = LiveTrailScraper.request_rates()['example.org']
+            # the 429 is retried: the pace is cut, then grows again
+            scr._send('GET', 'https://example.org/a')
+            limiter = scr._limiter('https://example.org/a')
+            self.assertAlmostEqual(limiter.rate, rate * limiter.decrease + limiter.increase)
+
+    @patch.object(LiveTrailScraper, 'get_events_years', return_value={'utmb': ['2012', '2023']})
+    @patch.object(LiveTrailScraper, 'get_events', return_value={'utmb': 'UTMB'})
+    def test__url_templates(self, *_):
+        with tempfile.TemporaryDirectory() as tmp:
+            scr = LiveTrailScraper(events=['utmb'], years=['2012'],
+                                   cache=ResponseCache(os.path.join(tmp, 'scraper_cache.db')))
+            self.assertEqual(scr._url_templates('utmb', '2012'), [scr.base_url, scr.base_url2])
+            found = requests.Response()
+            found.status_code, found._content, found.encoding = 200, b'<d><courses><c id="ultra" n="Ultra" /></courses></d>', 'utf-8'
+            missing = requests.Response()
+            missing.status_code = 404
+            with patch.object(scr, '_request', side_effect=lambda method, url, **kw: found if 'utmb2012' in url else missing) as request:
+                self.assertEqual(scr.get_races(), {'utmb': {'2012': {'ultra': 'Ultra'}}})
+                self.assertEqual(request.call_count, 2)
+                # learned: the next call (or run) starts with base_url2
+                scr.get_races()
+                self.assertEqual(request.call_count, 3)
+            self.assertEqual(LiveTrailScraper(cache=scr.cache)._url_templates('utmb', '2013'),
+                             [scr.base_url2, scr.base_url])
+
+    @patch.object(LiveTrailScraper, 'get_events_years', return_value={})
+    @patch.object(LiveTrailScraper, 'get_events', return_value={})
+    def test__request_cache(self, *_):
+        url = 'https://livetrail.net/histo/utmb_2023/passages.php'
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(os.path.join(tmp, 'scraper_cache.db'))
+            scr = LiveTrailScraper(cache=cache)
+            fresh = requests.Response()
+            fresh.status_code, fresh._content, fresh.encoding = 200, b'<courses/>', 'utf-8'
+            fresh.headers['ETag'] = '"v1"'
+            with patch.object(scr, '_send', return_value=fresh) as send:
+                self.assertEqual(scr._request('POST', url, data={'course': 'utmb'}).text, '<courses/>')
+                # archived page: served from the cache from now on
+                self.assertEqual(scr._request('POST', url, data={'course': 'utmb'}).text, '<courses/>')
+                self.assertEqual(send.call_count, 1)
+            # stale entries are revalidated, a 304 serves the cached body
+            live_url = 'https://utmb.livetrail.net/passages.php'
+            cache.put('GET', live_url, None, fresh)
+            not_modified = requests.Response()
+            not_modified.status_code = 304
+            entry = cache.get('GET', live_url)
+            entry.fresh = False
+            with patch.object(cache, 'get', return_value=entry), \
+                 patch.object(scr, '_send', return_value=not_modified) as send:
+                self.assertEqual(scr._request('GET', live_url).text, '<courses/>')
+                self.assertEqual(send.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+            # offline: stale entries are served, misses get a 504 without any request
+            cache.cache_only = True
+            with patch.object(cache, 'get', return_value=entry), patch.object(scr, '_send') as send:
+                self.assertEqual(scr._request('GET', live_url).text, '<courses/>')
+            with patch.object(scr, '_send') as send:
+                self.assertEqual(scr._request('GET', url + '?x').status_code, 504)
+                send.assert_not_called()
+            metrics = scr.metrics.to_dict()
+            self.assertEqual(metrics['passages POST']['cache_hits'], 1)
+            self.assertEqual((metrics['passages GET']['cache_revalidated'], metrics['passages GET']['cache_hits'],
+                              metrics['passages GET']['cache_misses']), (1, 1, 1))
+
     def test_implemented_tests(self):
         unused_functions = get_untested_functions(LiveTrailScraper, TestLiveTrailScraper)
         print(unused_functions)
         assert len(unused_functions) == 0, "LiveTrailScraper is not tested enough. pytest -s for details."
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_init(self):
+        with pytest.raises(ValueError):
+            RateLimiter(0)
+        with pytest.raises(ValueError):
+            RateLimiter(1, burst=0)
+        with pytest.raises(ValueError):
+            RateLimiter(1, min_rate=2, max_rate=1)
+        with pytest.raises(ValueError):
+            RateLimiter(1, decrease=0)
+        # the initial rate is kept within the bounds
+        self.assertEqual(RateLimiter(5, min_rate=0.1, max_rate=2).rate, 2)
+
+    def test_acquire(self):
+        limiter = RateLimiter(rate=20, burst=2)
+        start = time.monotonic()
+        waits = [limiter.acquire() for _ in range(4)]
+        elapsed = time.monotonic() - start
+        # the burst goes through, then one token every 1/rate seconds
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertGreater(waits[2], 0)
+        self.assertGreaterEqual(elapsed, 2 / 20 - 0.01)
+
+    def test_record(self):
+        limiter = RateLimiter(1, min_rate=0.25, max_rate=1.5, increase=0.25, decrease=0.5)
+        self.assertEqual([limiter.record(True) for _ in range(3)], [1.25, 1.5, 1.5])
+        self.assertEqual([limiter.record(False) for _ in range(4)], [0.75, 0.375, 0.25, 0.25])
+        self.assertEqual(limiter.record(True), 0.5)
+        # without bounds the rate is fixed
+        fixed = RateLimiter(1, increase=0.25, decrease=0.5)
+        self.assertEqual((fixed.record(True), fixed.record(False)), (1, 1))
+
+    def test_acquire_threads(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # the budget is shared: 6 requests at 50/s take at least 5 intervals
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 - 0.01)
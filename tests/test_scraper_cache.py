@@ -0,0 +1,123 @@
+'''
+Test module for the scraper's ResponseCache
+'''
+import time
+import datetime as dt
+import pytest
+import requests
+from scraper.cache import ResponseCache, TemplateMap, DAY, DEFAULT_TTL
+from tests.tools import get_untested_functions
+
+
+def make_response(content: bytes, status_code=200, headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.encoding = 'utf-8'
+    response._content = content
+    return response
+
+
+class TestResponseCache():
+    url = 'https://livetrail.net/histo/utmb_2023/passages.php'
+
+    @staticmethod
+    @pytest.fixture
+    def cache(tmp_path):
+        return ResponseCache(str(tmp_path / 'cache' / 'scraper_cache.db'))
+
+    def test_key(self):
+        # POST bodies are keyed independently of the dict order
+        assert (ResponseCache.key('post', self.url, {'course': 'utmb', 'cat': 'scratch'})
+                == ResponseCache.key('POST', self.url, {'cat': 'scratch', 'course': 'utmb'}))
+        assert ResponseCache.key('POST', self.url, {'course': 'utmb'}) != ResponseCache.key('POST', self.url, {'course': 'ccc'})
+        assert ResponseCache.key('GET', self.url) != ResponseCache.key('POST', self.url)
+
+    def test_ttl(self):
+        current = dt.date.today().year
+        assert ResponseCache.ttl('GET', self.url, content=b'<d><courses><c id="ultra" /></courses></d>') is None
+        assert ResponseCache.ttl('POST', 'https://livetrail.net/histo/ut4m2019/passages.php', {'course': '160'},
+                                 b'<d><fiches></fiches></d>') is None
+        # LiveTrail's 200 "404" page, maintenance pages: not pinned
+        assert ResponseCache.ttl('GET', self.url, content=b'<html><title>404</title></html>') == DEFAULT_TTL
+        assert ResponseCache.ttl('GET', self.url) == DEFAULT_TTL
+        assert ResponseCache.ttl('GET', f'https://livetrail.net/histo/utmb_{current}/passages.php',
+                                 content=b'<courses/>') == DEFAULT_TTL
+        assert ResponseCache.ttl('POST', 'https://livetrail.net/phpFonctions/homeFunctions.php',
+                                 {'mode': 'dispAllEvents', 'type': 'livetrail.net'}) == DAY
+        assert ResponseCache.ttl('GET', 'https://utmb.livetrail.net/passages.php') == DEFAULT_TTL
+
+    def test_get(self, cache):
+        assert cache.get('GET', self.url) is None
+        cache.put('GET', self.url, None, make_response('<courses/>é'.encode(), headers={'ETag': '"abc"'}))
+        entry = cache.get('GET', self.url)
+        assert entry.fresh
+        assert entry.response.status_code == 200
+        assert entry.response.text == '<courses/>é'
+        assert entry.response.headers['etag'] == '"abc"'
+        assert entry.validators == {'If-None-Match': '"abc"'}
+
+    def test_put(self, cache):
+        cache.put('POST', self.url, {'course': 'utmb'}, make_response(b'error', status_code=500))
+        assert cache.get('POST', self.url, {'course': 'utmb'}) is None
+        cache.put('POST', self.url, {'course': 'utmb'}, make_response(b'<l/>'))
+        assert cache.get('POST', self.url, {'course': 'utmb'}).response.content == b'<l/>'
+        assert cache.get('POST', self.url, {'course': 'ccc'}) is None
+
+    def test_put_error_page(self, cache, monkeypatch):
+        cache.put('GET', self.url, None, make_response(b'<html>404</html>'))
+        cache.put('POST', self.url, {'course': 'utmb'}, make_response(b'<d><fiches></fiches></d>'))
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + DEFAULT_TTL + 1)
+        assert not cache.get('GET', self.url).fresh
+        assert cache.get('POST', self.url, {'course': 'utmb'}).fresh
+
+    def test_touch(self, cache, monkeypatch):
+        url = 'https://utmb.livetrail.net/passages.php'
+        cache.put('GET', url, None, make_response(b'x', headers={'Last-Modified': 'Sat, 02 Sep 2023 10:00:00 GMT'}))
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + DEFAULT_TTL + 1)
+        entry = cache.get('GET', url)
+        assert not entry.fresh
+        assert entry.validators == {'If-Modified-Since': 'Sat, 02 Sep 2023 10:00:00 GMT'}
+        cache.touch('GET', url)
+        assert cache.get('GET', url).fresh
+
+    def test_miss(self):
+        response = ResponseCache.miss(self.url)
+        assert response.status_code == 504
+        assert response.text == ''
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(ResponseCache, TestResponseCache)
+        print(untested)
+        assert len(untested) == 0, "ResponseCache is not tested enough. pytest -s for details."
+
+
+class TestTemplateMap():
+    old = 'https://livetrail.net/histo/{event}{year}'
+    new = 'https://livetrail.net/histo/{event}_{year}'
+
+    def test_get(self):
+        templates = TemplateMap()
+        assert templates.get('utmb', '2015') is None
+        templates.set('utmb', '2010', self.old)
+        templates.set('utmb', '2020', self.new)
+        assert templates.get('utmb', '2010') == self.old
+        # unknown years take the closest known year's template
+        assert templates.get('utmb', '2008') == self.old
+        assert templates.get('utmb', '2018') == self.new
+        assert templates.get('ccc', '2018') is None
+
+    def test_set(self, tmp_path):
+        path = str(tmp_path / 'scraper_cache.db')
+        templates = TemplateMap(path)
+        templates.set('utmb', '2010', self.old)
+        templates.set('utmb', '2010', self.new)
+        # persisted across runs
+        assert TemplateMap(path).get('utmb', '2010') == self.new
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(TemplateMap, TestTemplateMap)
+        print(untested)
+        assert len(untested) == 0, "TemplateMap is not tested enough. pytest -s for details."
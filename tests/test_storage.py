@@ -0,0 +1,155 @@
+'''
+Test module for the results storage (CSV files and event-year stores)
+'''
+import os
+import csv
+import numpy as np
+import pandas as pd
+import pytest
+from scraper import storage
+from scraper.storage import ResultsStore
+from database.loader_LiveTrail import CSV_to_DB_results, CSV_to_DB_timing_points
+from tests.tools import get_untested_functions
+
+
+def results_table() -> pd.DataFrame:
+    # as LiveTrailScraper._parse_table returns it: strings padded with NaN
+    return pd.DataFrame({
+        'n': ['1', '2', np.nan],
+        'doss': ['12', '7', '3'],
+        'nom': ['A', 'B', 'C'],
+        'prenom': ['x', 'y', np.nan],
+        'cat': ['SE H', 'V1 F', 'SE H'],
+        '0': ['Sa. 06:00', 'Sa. 06:00', 'Sa. 06:00'],
+        '1': [np.nan, np.nan, np.nan],
+        '2': ['Sa. 13:20', 'Sa. 14:00\nSa.14:01', np.nan],
+    })
+
+
+@pytest.fixture
+def saved(tmp_path):
+    '''
+        The same race saved as CSV under csv/ and in a store under npy/.
+    '''
+    paths = {}
+    for fmt in storage.FORMATS:
+        paths[fmt] = storage.results_path(str(tmp_path / fmt), 'utmb', 'CCC', '2023')
+        storage.save_results(paths[fmt], results_table(), fmt)
+    return paths
+
+
+class TestResultsStore():
+    @staticmethod
+    @pytest.fixture
+    def store(tmp_path):
+        store = ResultsStore.for_event_year(str(tmp_path), 'utmb', '2023')
+        store.put('CCC', results_table())
+        store.put('OCC', results_table().iloc[:1])
+        return store
+
+    def test_locate(self, tmp_path):
+        store, race = ResultsStore.locate(os.path.join(str(tmp_path), 'mont_blanc', 'mont_blanc_10_km_2023.csv'))
+        assert race == '10_km'
+        assert store.path == os.path.join(str(tmp_path), 'mont_blanc', 'mont_blanc_2023')
+        with pytest.raises(ValueError):
+            ResultsStore.locate(os.path.join(str(tmp_path), 'utmb', 'races.csv'))
+
+    def test_columns(self, store):
+        columns = store.columns('CCC')
+        assert list(columns) == list(results_table().columns)
+        assert columns['doss'].tolist() == ['12', '7', '3']
+        assert columns['n'].tolist() == ['1', '2', '']
+        # views of the memory-mapped file, not copies
+        assert isinstance(columns['doss'], np.memmap) and not columns['doss'].flags.writeable
+        assert list(store.columns('CCC', ['cat'])) == ['cat']
+
+    def test_put(self, store):
+        assert store.races == ['CCC', 'OCC']
+        store.put('CCC', results_table().iloc[:2])
+        reopened = ResultsStore(store.path)
+        assert reopened.races == ['CCC', 'OCC']
+        assert reopened.rows('CCC') == 2
+        assert 'UTMB' not in reopened
+        assert reopened.columns('OCC')['nom'].tolist() == ['A']
+        # one array and its index per event-year, whatever the number of races
+        assert sorted(os.listdir(store.path)) == ['index.json', 'results_3.npy']
+
+    def test_put_many(self, store):
+        short = results_table().iloc[:1, :6]
+        store.put_many({'OCC': results_table(), 'MCC': short, 'TDS': pd.DataFrame()})
+        assert store.races == ['CCC', 'MCC', 'OCC', 'TDS']
+        assert [store.rows(race) for race in store.races] == [3, 1, 3, 0]
+        assert store.column_names('MCC') == ['n', 'doss', 'nom', 'prenom', 'cat', '0']
+        pd.testing.assert_frame_equal(store.frame('OCC'), store.frame('CCC'))
+        assert len(os.listdir(store.path)) == 2
+
+    def test_rows(self, store):
+        assert (store.rows('CCC'), store.rows('OCC')) == (3, 1)
+
+    def test_frame(self, store, saved):
+        pd.testing.assert_frame_equal(store.frame('CCC'), pd.read_csv(saved['csv']))
+        store.put('empty', pd.DataFrame())
+        assert store.frame('empty').empty
+
+    def test_column_names(self, store):
+        assert store.column_names('OCC') == ['n', 'doss', 'nom', 'prenom', 'cat', '0', '1', '2']
+
+    def test_strings(self, store, saved):
+        with open(saved['csv'], newline='', encoding='utf-8') as csvfile:
+            rows = list(csv.reader(csvfile))[1:]
+        assert [list(row) for row in zip(*(values.tolist() for values in store.strings('CCC')))] == rows
+        assert [values.tolist() for values in store.strings('CCC', ['2', 'n'])] == [
+            ['Sa. 13:20', 'Sa. 14:00\nSa.14:01', ''], ['1', '2', '']]
+
+    def test_implemented_tests(self):
+        untested = get_untested_functions(ResultsStore, TestResultsStore)
+        print(untested)
+        assert len(untested) == 0, "ResultsStore is not tested enough. pytest -s for details."
+
+
+def test_read_results(saved):
+    pd.testing.assert_frame_equal(storage.read_results(saved['npy']), storage.read_results(saved['csv']))
+    with pytest.raises(FileNotFoundError):
+        storage.read_results(saved['npy'].replace('CCC', 'OCC'))
+
+
+def test_archived(saved):
+    store, race = storage.archived(saved['npy'])
+    assert race == 'CCC' and race in store
+    with pytest.raises(FileNotFoundError):
+        storage.archived(saved['csv'])
+
+
+def test_has_results(saved):
+    assert storage.has_results(saved['csv']) and storage.has_results(saved['npy'])
+    assert not storage.has_results(saved['npy'].replace('CCC', 'OCC'))
+
+
+def test_list_results(saved):
+    for path in saved.values():
+        assert storage.list_results(os.path.dirname(path)) == ['utmb_CCC_2023.csv']
+
+
+def test_loaders_read_csv(saved):
+    assert CSV_to_DB_results.read_csv(saved['npy']) == CSV_to_DB_results.read_csv(saved['csv'])
+    assert CSV_to_DB_results.read_csv(saved['npy'])[2] == ['', '3', 'C', '', 'SE H', '']
+    archived = CSV_to_DB_timing_points.read_csv(saved['npy'])
+    assert archived == CSV_to_DB_timing_points.read_csv(saved['csv'])
+    assert archived[1][0] == '7'
+
+
+def test_convert_csv_tree(saved):
+    data_path = os.path.dirname(os.path.dirname(saved['csv']))
+    assert storage.convert_csv_tree(data_path, remove=True) == 1
+    assert os.listdir(os.path.join(data_path, 'utmb')) == ['utmb_2023']
+    pd.testing.assert_frame_equal(storage.read_results(saved['csv']), storage.read_results(saved['npy']))
+    assert CSV_to_DB_results.read_csv(saved['csv'])[0] == ['1', '12', 'A', 'x', 'SE H', 'Sa. 13:20']
+
+
+def test_save_all_results(tmp_path):
+    paths = [storage.results_path(str(tmp_path), 'utmb', race, '2023') for race in ['CCC', 'OCC']]
+    for fmt in storage.FORMATS:
+        storage.save_all_results({path: results_table() for path in paths}, fmt)
+    assert storage.list_results(str(tmp_path / 'utmb')) == ['utmb_CCC_2023.csv', 'utmb_OCC_2023.csv']
+    store, _ = ResultsStore.locate(paths[0])
+    assert store.races == ['CCC', 'OCC']
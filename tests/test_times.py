@@ -0,0 +1,72 @@
+'''
+    Tests for results.times
+'''
+import pytest
+import numpy as np
+from results import times
+from results.times import (split_time, time_to_seconds, seconds_to_time, seconds_to_time_over24h,
+                           parse_seconds, weekday_order, parse_weekday_seconds, elapsed_clock_seconds,
+                           split_seconds, format_seconds, format_over24h)
+from tests.tools import get_untested_functions
+
+
+class TestTimes():
+    def test_split_time(self):
+        assert split_time('1:30:00') == (0, 1, 30, 0)
+        assert split_time('3 days, 1:30:00') == (3, 1, 30, 0)
+        assert split_time('-1 day, 23:30') == (-1, 23, 30, 0)
+        with pytest.raises(ValueError):
+            split_time('nan')
+
+    def test_time_to_seconds(self):
+        assert time_to_seconds('01:30:00') == 5400
+        assert time_to_seconds('101:02:03') == 101 * 3600 + 123
+        assert time_to_seconds('1 day, 1:30:00') == 24 * 3600 + 5400
+
+    def test_seconds_to_time(self):
+        assert seconds_to_time(5400.9) == '1:30:00'
+        assert seconds_to_time(24 * 3600 + 5400) == '1 day, 1:30:00'
+
+    def test_seconds_to_time_over24h(self):
+        assert seconds_to_time_over24h(101 * 3600 + 123) == '101:02:03'
+        assert seconds_to_time_over24h(5400, hours_width=1) == '1:30:00'
+
+    def test_parse_seconds(self):
+        seconds = parse_seconds(np.array([['1:30:00', '26:52:00'], ['2 days, 0:00:01', 'nan']], dtype=object))
+        np.testing.assert_array_equal(seconds, [[5400, 26 * 3600 + 52 * 60], [2 * 24 * 3600 + 1, np.nan]])
+        np.testing.assert_array_equal(parse_seconds(['12:00', '', None]), [43200, np.nan, np.nan])
+
+    def test_weekday_order(self):
+        assert weekday_order(5)[:3] == ['Ve.', 'Sa.', 'Di.']
+        assert weekday_order() == ['Di.', 'Lu.', 'Ma.', 'Me.', 'Je.', 'Ve.', 'Sa.']
+
+    def test_parse_weekday_seconds(self):
+        days = weekday_order(5)  # Friday start
+        seconds = parse_weekday_seconds(np.array([['Ve. 23:51', 'Sa.\n08:12:44'],
+                                                  ['Sa. 01:35\nSa.01:37', '.']]), days)
+        expected = np.array([[23 * 3600 + 51 * 60, 24 * 3600 + 8 * 3600 + 12 * 60 + 44],
+                             [25 * 3600 + 35 * 60, np.nan]])
+        np.testing.assert_array_equal(seconds, expected)
+
+    def test_elapsed_clock_seconds(self):
+        clock = parse_seconds(['23:00:00', np.nan, '01:00:00', '00:30:00'])
+        np.testing.assert_array_equal(elapsed_clock_seconds(clock, start=22 * 3600),
+                                      [3600, np.nan, 3 * 3600, 26.5 * 3600])
+
+    def test_split_seconds(self):
+        seconds, valid = split_seconds([1.9999999, 2.5, np.nan])
+        np.testing.assert_array_equal(seconds, [2, 2])
+        np.testing.assert_array_equal(valid, [True, True, False])
+
+    def test_format_seconds(self):
+        assert list(format_seconds([5400, 24 * 3600 + 1, -1800, np.nan])) == \
+            ['1:30:00', '1 day, 0:00:01', '-1 day, 23:30:00', 'nan']
+        assert format_seconds([np.nan], na=None)[0] is None
+
+    def test_format_over24h(self):
+        assert list(format_over24h([5400, 26 * 3600, np.nan])) == ['01:30:00', '26:00:00', 'nan']
+        assert list(format_over24h([5400], hours_width=1)) == ['1:30:00']
+
+    def test_implemented_tests(self):
+        unused_functions = get_untested_functions(times, TestTimes)
+        assert len(unused_functions) == 0, "results.times is not tested enough. pytest -s for details."